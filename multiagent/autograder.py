@@ -21,6 +21,7 @@ import re
 import sys
 import projectParams
 import random
+import util
 random.seed(0)
 try: 
     from pacman import GameState
@@ -75,6 +76,25 @@ def readCommand(argv):
                     dest = 'noGraphics',
                     action = 'store_true',
                     help = 'No graphics display for pacman games.')
+    parser.add_option('--jobs', '-j',
+                    dest = 'jobs',
+                    type = 'int',
+                    default = 1,
+                    help = 'Run test cases in this many worker processes (implies --no-graphics).')
+    parser.add_option('--hard-timeout',
+                    dest = 'hardTimeout',
+                    type = 'float',
+                    default = None,
+                    help = 'With --jobs, kill the worker of a test case still running after this many seconds.')
+    parser.add_option('--no-cache',
+                    dest = 'noCache',
+                    action = 'store_true',
+                    default = False,
+                    help = 'Run every test case instead of replaying results of unchanged ones.')
+    parser.add_option('--cache-directory',
+                    dest = 'cacheRoot',
+                    default = '.autograder_cache',
+                    help = 'Directory holding cached test case results.')
     (options, args) = parser.parse_args(argv)
     return options
 
@@ -239,9 +259,219 @@ def getTestSubdirs(testParser, testRoot, questionToGrade):
     return sorted(os.listdir(testRoot))
 
 
+# test case thunks of the current evaluation, and the state of the shared
+# random generator when they were sent out, inherited by forked workers
+_PARALLEL_THUNKS = []
+_PARALLEL_RANDOM_STATE = None
+
+class TrackedRandom(random.Random):
+    """
+    The shared random generator of a worker, noting whether a test case used
+    the state it started with (drew a number or read the state before seeding
+    or setting the generator) and whether it reset the generator at all.
+    """
+    def __init__(self):
+        random.Random.__init__(self)
+        self.usedStart = False
+        self.reset = False
+
+    def _use(self):
+        if not self.reset: self.usedStart = True
+
+    def random(self):
+        self._use()
+        return random.Random.random(self)
+
+    def getrandbits(self, k):
+        self._use()
+        return random.Random.getrandbits(self, k)
+
+    def getstate(self):
+        self._use()
+        return random.Random.getstate(self)
+
+    def jumpahead(self, n):
+        self._use()
+        random.Random.jumpahead(self, n)
+
+    def seed(self, *args):
+        self.reset = True
+        random.Random.seed(self, *args)
+
+    def setstate(self, state):
+        self.reset = True
+        random.Random.setstate(self, state)
+
+def trackRandom(state):
+    """
+    Replaces the random module's shared generator, behind its module level
+    functions, with a TrackedRandom in the given state, and returns it.
+    """
+    tracked = TrackedRandom()
+    for name in dir(random):
+        if getattr(getattr(random, name), '__self__', None) is random._inst:
+            setattr(random, name, getattr(tracked, name))
+    random._inst = tracked
+    random.Random.setstate(tracked, state)
+    tracked.usedStart = tracked.reset = False
+    return tracked
+
+def runParallelTestCase(index):
+    """
+    Runs a test case from the random state the evaluation had when the test
+    cases were sent out, and returns its index with (events, result, error,
+    start state, whether it used the start state, whether it reset the
+    generator, end state): see runTestCasesInParallel.
+    """
+    thunk, path = _PARALLEL_THUNKS[index]
+    tracked = trackRandom(_PARALLEL_RANDOM_STATE)
+    events, result, error = grading.runRecorded(thunk, grading.QUESTION_TIMEOUT)
+    return index, (events, result, error, _PARALLEL_RANDOM_STATE, tracked.usedStart, tracked.reset,
+                   random.Random.getstate(tracked))
+
+def superviseTestCases(numCases, jobs, hardTimeout):
+    """
+    Runs runParallelTestCase for every test case, each in its own worker
+    process, at most jobs at a time, and kills any worker still running
+    hardTimeout seconds after it started: a move deadline cannot interrupt
+    an agent stuck where signals wait, such as inside a C extension, so this
+    is what stops one that never returns.  Returns {index: recorded run}, as
+    runParallelTestCase gives them.
+    """
+    import multiprocessing, Queue
+    results = multiprocessing.Queue()
+    def work(index):
+        results.put(runParallelTestCase(index))
+    recorded = {}
+    pending = range(numCases)
+    running = {} # index -> (process, util.Deadline)
+    while pending or running:
+        while pending and len(running) < jobs:
+            index = pending.pop(0)
+            process = multiprocessing.Process(target = work, args = (index,))
+            process.start()
+            running[index] = (process, util.Deadline(hardTimeout))
+        try:
+            index, result = results.get(timeout = 0.05)
+            recorded[index] = result
+        except Queue.Empty:
+            pass
+        for index, (process, deadline) in running.items():
+            if index in recorded:
+                process.join()
+                del running[index]
+            elif deadline.expired():
+                process.terminate()
+                process.join()
+                del running[index]
+                recorded[index] = ([], None, ('Test case killed after the hard timeout of %g seconds' % hardTimeout, ''),
+                                   None, False, False, None)
+            elif not process.is_alive() and results.empty():
+                # Give a result on its way through the queue a moment to arrive
+                try:
+                    doneIndex, result = results.get(timeout = 1)
+                    recorded[doneIndex] = result
+                except Queue.Empty:
+                    del running[index]
+                    recorded[index] = ([], None, ('Test case worker died with exit code %s' % process.exitcode, ''),
+                                       None, False, False, None)
+    return recorded
+
+def runTestCasesInParallel(cases, jobs, hardTimeout = None):
+    """
+    Runs the given test cases, (question, test index) pairs, on a pool of
+    worker processes and returns {case: recorded run}, each as
+    runParallelTestCase gives it; makeReplay then stands in for the test.
+    Grading proceeds exactly as usual, in question and test order, so
+    prerequisites are still honoured; test cases of a question that gets
+    skipped have simply run for nothing.
+
+    Every worker starts from the random state the serial run starts with, but
+    a serial run hands each test the state the tests before it left.  So a
+    test that used its start state before seeding the generator is replayed
+    only if that start state is the one the serial run reaches there, and is
+    otherwise run again in order; a test's end state is restored after its
+    replay.  Grades are thus those of a serial run.  With a
+    hardTimeout, a supervisor kills the workers of test cases that overrun
+    it (see superviseTestCases).
+    """
+    global _PARALLEL_THUNKS, _PARALLEL_RANDOM_STATE
+    import multiprocessing
+    if not cases:
+        return {}
+    if not hasattr(os, 'fork'):
+        print 'Note: parallel grading needs fork(); running the tests one at a time.'
+        return {}
+    _PARALLEL_THUNKS = [(question.testCases[i][1], question.testCases[i][0].getPath()) for question, i in cases]
+    _PARALLEL_RANDOM_STATE = random.getstate()
+    print 'Running %d test cases on %d worker processes.' % (len(cases), jobs)
+    if hardTimeout:
+        recorded = superviseTestCases(len(cases), jobs, hardTimeout)
+    else:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            recorded = dict(pool.imap_unordered(runParallelTestCase, range(len(cases))))
+        finally:
+            pool.close()
+            pool.join()
+    _PARALLEL_THUNKS = []
+    return dict([(case, recorded[index]) for index, case in enumerate(cases)])
+
+def runTracked(thunk):
+    "Runs a test case thunk here, and records it as runParallelTestCase does"
+    startState = random.getstate()
+    tracked = trackRandom(startState)
+    events, result, error = grading.runRecorded(thunk)
+    return (events, result, error, startState, tracked.usedStart, tracked.reset, random.Random.getstate(tracked))
+
+def makeReplay(thunk, recorded, resultCache = None, key = None, fromCache = False):
+    """
+    Wraps a test case thunk so that it replays a recorded run, from a worker
+    or from resultCache, and leaves the random generator as the test did.  A
+    run that used its start state is only replayed from that state; otherwise,
+    or without a recorded run, the test runs here.  With a resultCache, runs
+    are stored under key, but for those cut short by a timeout or a killed
+    worker, which have no traceback to their error.
+    """
+    def run(grades):
+        record = recorded
+        fromRecord = fromCache
+        if record == None or (record[4] and record[3] != random.getstate()):
+            # Not run yet, or its result depends on a random state it did not start from
+            if resultCache == None:
+                return thunk(grades)
+            record = runTracked(thunk)
+            fromRecord = False
+        if resultCache != None:
+            if fromRecord:
+                resultCache.hits += 1
+            else:
+                resultCache.misses += 1
+                error = record[2]
+                if error == None or error[1]:
+                    resultCache.put(key, record)
+        events, result, error, startState, usedStart, reset, endState = record
+        if usedStart or reset:
+            random.setstate(endState)
+        return grading.replay(grades, events, result, error)
+    return run
+
+
+def cacheDependencies(codeRoot, studentCode):
+    """
+    The framework modules whose source is part of every result cache key:
+    every .py file in codeRoot but the student's, which are hashed agent by
+    agent.  Any of them can shape a grade (the engine, the test harness, the
+    helpers multiAgents imports), so changing one reruns everything.
+    """
+    codeRoot = codeRoot or os.curdir
+    student = set([os.path.normpath(os.path.join(codeRoot, cp)) for cp in studentCode])
+    paths = [os.path.normpath(os.path.join(codeRoot, f)) for f in os.listdir(codeRoot) if f.endswith('.py')]
+    return sorted([path for path in paths if path not in student])
+
 # evaluate student code
 def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MAP, edxOutput=False, muteOutput=False,
-            printTestCase=False, questionToGrade=None, display=None):
+            printTestCase=False, questionToGrade=None, display=None, jobs=1, resultCache=None, hardTimeout=None):
     # imports of testbench code.  note that the testClasses import must follow
     # the import of student code due to dependencies
     import testParser
@@ -250,7 +480,9 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
         setattr(sys.modules[__name__], module, moduleDict[module])
 
     questions = []
+    questionObjects = []
     questionDicts = {}
+    cachedCases = [] # (question, test index, test case, solution file) of the cases to cache
     test_subdirs = getTestSubdirs(testParser, testRoot, questionToGrade)
     for q in test_subdirs:
         subdir_path = os.path.join(testRoot, q)
@@ -288,6 +520,8 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
                         return lambda grades: printTest(testDict, solutionDict) or testCase.execute(grades, moduleDict, solutionDict)
                     else:
                         return lambda grades: testCase.execute(grades, moduleDict, solutionDict)
+            if resultCache != None and not generateSolutions and not printTestCase:
+                cachedCases.append((question, len(question.testCases), testCase, solution_file))
             question.addTestCase(testCase, makefun(testCase, solution_file))
 
         # Note extra function is necessary for scoping reasons
@@ -295,6 +529,22 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
             return lambda grades: question.execute(grades)
         setattr(sys.modules[__name__], q, makefun(question))
         questions.append((q, question.getMaxPoints()))
+        questionObjects.append(question)
+
+    # Cached results are looked up before anything runs, so only the others go to the workers
+    keys, recorded, fromCache = {}, {}, set()
+    for question, i, testCase, solution_file in cachedCases:
+        keys[(question, i)] = key = resultCache.getKey(testCase, solution_file)
+        recorded[(question, i)] = resultCache.get(key)
+        if recorded[(question, i)] != None: fromCache.add((question, i))
+    if jobs > 1:
+        cases = [(question, i) for question in questionObjects for i in range(len(question.testCases))]
+        recorded.update(runTestCasesInParallel([case for case in cases if case not in fromCache], jobs, hardTimeout))
+    for case in recorded:
+        question, i = case
+        testCase, thunk = question.testCases[i]
+        question.testCases[i] = (testCase, makeReplay(thunk, recorded[case], resultCache if case in keys else None,
+                                                      keys.get(case), case in fromCache))
 
     grades = grading.Grades(projectParams.PROJECT_NAME, questions, edxOutput=edxOutput, muteOutput=muteOutput)
     if questionToGrade == None:
@@ -303,13 +553,16 @@ def evaluate(generateSolutions, testRoot, moduleDict, exceptionMap=ERROR_HINT_MA
                 grades.addPrereq(q, prereq)
 
     grades.grade(sys.modules[__name__], bonusPic = projectParams.BONUS_PIC)
+    if resultCache != None and resultCache.hits:
+        print '\n%d of %d test cases replayed from %s (use --no-cache to rerun them).' % \
+            (resultCache.hits, resultCache.hits + resultCache.misses, resultCache.directory)
     return grades.points
 
 
 
 def getDisplay(graphicsByDefault, options=None):
     graphics = graphicsByDefault
-    if options is not None and options.noGraphics:
+    if options is not None and (options.noGraphics or options.jobs > 1):
         graphics = False
     if graphics:
         try:
@@ -343,9 +596,20 @@ if __name__ == '__main__':
     moduleDict['projectTestClasses'] = loadModuleFile(moduleName, os.path.join(options.codeRoot, options.testCaseCode))
 
 
+    resultCache = None
+    if not options.noCache and not options.generateSolutions:
+        studentSources = {}
+        for cp in codePaths:
+            moduleName = re.match('.*?([^/]*)\.py', cp).group(1)
+            studentSources[moduleName] = readFile(cp, root=options.codeRoot)
+        resultCache = grading.ResultCache(options.cacheRoot, studentSources,
+                                          readFile(options.testCaseCode, root=options.codeRoot),
+                                          cacheDependencies(options.codeRoot, codePaths))
+
     if options.runTest != None:
         runTest(options.runTest, moduleDict, printTestCase=options.printTestCase, display=getDisplay(True, options))
     else:
         evaluate(options.generateSolutions, options.testRoot, moduleDict,
             edxOutput=options.edxOutput, muteOutput=options.muteOutput, printTestCase=options.printTestCase,
-            questionToGrade=options.gradeQuestion, display=getDisplay(options.gradeQuestion!=None, options))
+            questionToGrade=options.gradeQuestion, display=getDisplay(options.gradeQuestion!=None, options),
+            jobs=options.jobs, resultCache=resultCache, hardTimeout=options.hardTimeout)
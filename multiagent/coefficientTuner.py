@@ -0,0 +1,333 @@
+# coefficientTuner.py
+# --------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+# 
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Tunes the coefficients of genericEvaluationFunction (multiAgents.py) by
+self-play instead of by hand.
+
+Every candidate coefficient set is scored by the average score of the same
+games: each layout, against each ghost type, for each of a fixed list of
+seeds.  Using the same seeds for every candidate (common random numbers)
+means differences in fitness come from the coefficients, not from luck.
+Games of a generation run in parallel on a process pool.
+
+    python coefficientTuner.py --method cma --layouts smallClassic,mediumClassic \\
+        --ghosts RandomGhost,DirectionalGhost --generations 20 --output best.json
+
+The best coefficients are written as JSON, which the search agents load
+with -a coefficients=best.json.
+"""
+
+import json
+import math
+import multiprocessing
+import optparse
+import random
+import sys
+import time
+
+import ghostAgents
+import layout
+import multiAgents
+import pacman
+import textDisplay
+
+try:
+    import numpy
+    _NUMPY_ENABLED = True
+except ImportError:
+    _NUMPY_ENABLED = False
+
+#############
+# Self-play #
+#############
+
+def playGame(task):
+    """
+    Plays one quiet game and returns (score, win).  task is a tuple of
+    (coefficients, agentName, depth, layoutName, ghostName, seed, maxMoves);
+    it is a plain tuple so that it can be sent to pool workers.  Each ghost
+    draws from a random stream of its own, seeded from seed and its index,
+    so the ghosts move the same way whatever Pacman's agent draws, and
+    samples its moves by the alias method (see GhostAgent.aliasSampling).
+    """
+    coefficients, agentName, depth, layoutName, ghostName, seed, maxMoves = task
+    random.seed(seed)
+    agent = getattr(multiAgents, agentName)(depth = depth)
+    agent.evaluationFunction = multiAgents.makeLinearEvaluationFunction(coefficients)
+    lay = layout.getLayout(layoutName)
+    ghostType = getattr(ghostAgents, ghostName)
+    ghosts = [ghostType(i + 1) for i in range(lay.getNumGhosts())]
+    for ghost in ghosts:
+        ghost.rng = random.Random('%s-ghost%d' % (seed, ghost.index))
+        ghost.aliasSampling = True
+    rules = pacman.CappedGameRules(maxMoves)
+    game = rules.newGame(lay, agent, ghosts, textDisplay.NullGraphics(), quiet = True, catchExceptions = True)
+    game.muteAgents = True
+    game.run()
+    return game.state.getScore(), game.state.isWin()
+
+class SelfPlayEvaluator:
+    """
+    Scores coefficient sets on a fixed list of (layout, ghost type, seed)
+    scenarios, shared by every candidate.
+    """
+    def __init__(self, layouts, ghosts, seeds, agentName, depth, maxMoves, jobs):
+        self.scenarios = [(l, g, s) for l in layouts for g in ghosts for s in seeds]
+        self.agentName = agentName
+        self.depth = depth
+        self.maxMoves = maxMoves
+        self.pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+        self.gamesPlayed = 0
+
+    def evaluate(self, candidates):
+        "Returns a list of (average score, win rate), one per coefficient dictionary"
+        tasks = [(c, self.agentName, self.depth, l, g, s, self.maxMoves)
+                 for c in candidates for (l, g, s) in self.scenarios]
+        if self.pool != None:
+            results = self.pool.map(playGame, tasks)
+        else:
+            results = map(playGame, tasks)
+        self.gamesPlayed += len(tasks)
+        n = len(self.scenarios)
+        fitness = []
+        for i in range(len(candidates)):
+            games = results[i * n:(i + 1) * n]
+            fitness.append((sum([score for score, win in games]) / float(n),
+                            [win for score, win in games].count(True) / float(n)))
+        return fitness
+
+    def close(self):
+        if self.pool != None:
+            self.pool.close()
+            self.pool.join()
+
+##################
+# Search methods #
+##################
+#
+# The searchers work on a vector x of scaled coefficients: coefficient i is
+# x[i] * scale[i], with the scales taken from the starting point so that a
+# step of 1 means the same relative change for every coefficient.  They all
+# maximize fitness through the same ask() / tell() interface.
+
+class RandomSearch:
+    "Gaussian perturbations of the best point found so far"
+    def __init__(self, start, sigma, populationSize, rng):
+        self.best = list(start)
+        self.bestFitness = None
+        self.sigma = sigma
+        self.populationSize = populationSize
+        self.rng = rng
+
+    def ask(self):
+        return [[x + self.rng.gauss(0, self.sigma) for x in self.best] for i in range(self.populationSize)]
+
+    def tell(self, points, fitness):
+        for point, f in zip(points, fitness):
+            if self.bestFitness == None or f > self.bestFitness:
+                self.best, self.bestFitness = point, f
+
+class CrossEntropySearch:
+    """
+    The cross-entropy method: sample from independent Gaussians, then refit
+    their means and deviations to the elite fraction of the samples.
+    """
+    def __init__(self, start, sigma, populationSize, rng, eliteFraction = 0.25, smoothing = 0.7, minSigma = 0.01):
+        self.mean = list(start)
+        self.sigmas = [sigma for x in start]
+        self.populationSize = populationSize
+        self.numElites = max(2, int(populationSize * eliteFraction))
+        self.smoothing = smoothing
+        self.minSigma = minSigma
+        self.rng = rng
+
+    def ask(self):
+        return [[self.rng.gauss(m, s) for m, s in zip(self.mean, self.sigmas)] for i in range(self.populationSize)]
+
+    def tell(self, points, fitness):
+        ranked = sorted(zip(fitness, range(len(points))), reverse = True)
+        elites = [points[i] for f, i in ranked[:self.numElites]]
+        for d in range(len(self.mean)):
+            values = [e[d] for e in elites]
+            mean = sum(values) / len(values)
+            sigma = math.sqrt(sum([(v - mean) ** 2 for v in values]) / len(values))
+            a = self.smoothing
+            self.mean[d] = a * mean + (1 - a) * self.mean[d]
+            self.sigmas[d] = max(self.minSigma, a * sigma + (1 - a) * self.sigmas[d])
+
+class CMAES:
+    """
+    (mu/mu_w, lambda)-CMA-ES with rank-one and rank-mu covariance updates and
+    cumulative step-size adaptation, following Hansen's tutorial
+    (arXiv:1604.00772).  Needs NumPy.
+    """
+    def __init__(self, start, sigma, populationSize, rng):
+        if not _NUMPY_ENABLED:
+            raise Exception('CMA-ES requires NumPy, which is not installed; use --method cem or random')
+        n = len(start)
+        self.n = n
+        self.mean = numpy.array(start, dtype = float)
+        self.sigma = sigma
+        self.populationSize = populationSize or 4 + int(3 * math.log(n))
+        self.mu = self.populationSize // 2
+        weights = numpy.log(self.mu + 0.5) - numpy.log(numpy.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1.0 / (self.weights ** 2).sum()
+
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0, math.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chiN = math.sqrt(n) * (1 - 1.0 / (4 * n) + 1.0 / (21 * n ** 2))
+
+        self.pc = numpy.zeros(n)
+        self.ps = numpy.zeros(n)
+        self.C = numpy.eye(n)
+        self.generation = 0
+        self.random = numpy.random.RandomState(rng.randint(0, 2 ** 31 - 1))
+
+    def ask(self):
+        eigenvalues, self.B = numpy.linalg.eigh(self.C)
+        self.D = numpy.sqrt(numpy.maximum(eigenvalues, 1e-20))
+        z = self.random.standard_normal((self.populationSize, self.n))
+        self.y = (z * self.D).dot(self.B.T)
+        return [list(x) for x in self.mean + self.sigma * self.y]
+
+    def tell(self, points, fitness):
+        order = numpy.argsort(-numpy.array(fitness, dtype = float))[:self.mu]
+        yw = self.weights.dot(self.y[order])
+        self.mean = self.mean + self.sigma * yw
+
+        invSqrtC = self.B.dot(numpy.diag(1 / self.D)).dot(self.B.T)
+        self.ps = (1 - self.cs) * self.ps + math.sqrt(self.cs * (2 - self.cs) * self.mueff) * invSqrtC.dot(yw)
+        self.generation += 1
+        psNorm = numpy.linalg.norm(self.ps)
+        hsig = psNorm / math.sqrt(1 - (1 - self.cs) ** (2 * self.generation)) / self.chiN < 1.4 + 2.0 / (self.n + 1)
+        self.pc = (1 - self.cc) * self.pc + hsig * math.sqrt(self.cc * (2 - self.cc) * self.mueff) * yw
+
+        rankMu = (self.y[order].T * self.weights).dot(self.y[order])
+        self.C = (1 - self.c1 - self.cmu) * self.C + \
+                 self.c1 * (numpy.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C) + \
+                 self.cmu * rankMu
+        self.sigma *= math.exp((self.cs / self.damps) * (psNorm / self.chiN - 1))
+
+SEARCH_METHODS = {'random': RandomSearch, 'cem': CrossEntropySearch, 'cma': CMAES}
+
+##########
+# Driver #
+##########
+
+def loadStartingCoefficients(name):
+    "'better', 'reflex' or the path of a JSON coefficient file"
+    if name == 'better':
+        return dict(multiAgents.BETTER_COEFFICIENTS)
+    if name == 'reflex':
+        return dict(multiAgents.REFLEX_COEFFICIENTS)
+    return multiAgents.loadCoefficients(name)
+
+def tune(evaluator, start, method, generations, populationSize, sigma, seed, output, tuned = None):
+    """
+    Runs the search and returns (best coefficients, (score, win rate)).  Only
+    the coefficients named in tuned (by default all of them) are changed.
+    The best set is written to output after every generation that improves it.
+    """
+    names = sorted(tuned or start.keys())
+    scales = [abs(start[name]) or 1.0 for name in names]
+    def toCoefficients(x):
+        coefficients = dict(start)
+        for name, value, scale in zip(names, x, scales):
+            coefficients[name] = value * scale
+        return coefficients
+
+    best = dict(start)
+    bestFitness = evaluator.evaluate([start])[0]
+    print 'Start: average score %.1f, win rate %.2f' % bestFitness
+    searcher = SEARCH_METHODS[method]([start[name] / scale for name, scale in zip(names, scales)],
+                                      sigma, populationSize, random.Random(seed))
+    for generation in range(generations):
+        startTime = time.time()
+        points = searcher.ask()
+        candidates = [toCoefficients(x) for x in points]
+        fitness = evaluator.evaluate(candidates)
+        searcher.tell(points, [score for score, winRate in fitness])
+        generationBest = max(range(len(fitness)), key = lambda i: fitness[i][0])
+        if fitness[generationBest][0] > bestFitness[0]:
+            best, bestFitness = candidates[generationBest], fitness[generationBest]
+            saveCoefficients(best, output)
+        print 'Generation %d: best %.1f (win rate %.2f), overall best %.1f, %d games in %.1fs' % \
+            (generation + 1, fitness[generationBest][0], fitness[generationBest][1], bestFitness[0],
+             len(candidates) * len(evaluator.scenarios), time.time() - startTime)
+    saveCoefficients(best, output)
+    return best, bestFitness
+
+def saveCoefficients(coefficients, fileName):
+    with open(fileName, 'w') as f:
+        json.dump(coefficients, f, indent = 4, sort_keys = True)
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Tune the genericEvaluationFunction coefficients by self-play')
+    parser.add_option('--method', dest = 'method', default = 'cem', choices = sorted(SEARCH_METHODS.keys()),
+                      help = 'Search method: cma, cem (cross-entropy) or random [Default: %default]')
+    parser.add_option('--start', dest = 'start', default = 'better',
+                      help = 'Starting coefficients: better, reflex or a JSON file [Default: %default]')
+    parser.add_option('--tune', dest = 'tune', default = None,
+                      help = 'Comma separated coefficients to tune [Default: all]')
+    parser.add_option('--layouts', dest = 'layouts', default = 'smallClassic',
+                      help = 'Comma separated layouts to play on [Default: %default]')
+    parser.add_option('--ghosts', dest = 'ghosts', default = 'RandomGhost',
+                      help = 'Comma separated ghost types to play against [Default: %default]')
+    parser.add_option('--games', dest = 'games', type = 'int', default = 5,
+                      help = 'Seeded games per layout and ghost type [Default: %default]')
+    parser.add_option('--agent', dest = 'agent', default = 'ExpectimaxAgent',
+                      help = 'Search agent from multiAgents.py [Default: %default]')
+    parser.add_option('--depth', dest = 'depth', type = 'int', default = 2,
+                      help = 'Search depth of the agent [Default: %default]')
+    parser.add_option('--generations', dest = 'generations', type = 'int', default = 10,
+                      help = 'Number of generations [Default: %default]')
+    parser.add_option('--population', dest = 'population', type = 'int', default = 12,
+                      help = 'Candidates per generation [Default: %default]')
+    parser.add_option('--sigma', dest = 'sigma', type = 'float', default = 0.5,
+                      help = 'Initial step size, relative to each starting coefficient [Default: %default]')
+    parser.add_option('--max-moves', dest = 'maxMoves', type = 'int', default = 2000,
+                      help = 'Agent moves after which a game is stopped [Default: %default]')
+    parser.add_option('--jobs', '-j', dest = 'jobs', type = 'int', default = multiprocessing.cpu_count(),
+                      help = 'Worker processes [Default: %default]')
+    parser.add_option('--seed', dest = 'seed', type = 'int', default = 0,
+                      help = 'Seed of the games and of the search [Default: %default]')
+    parser.add_option('--output', '-o', dest = 'output', default = 'best-coefficients.json',
+                      help = 'File to write the best coefficients to [Default: %default]')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    rng = random.Random(options.seed)
+    seeds = [rng.randint(0, 2 ** 31 - 1) for i in range(options.games)]
+    evaluator = SelfPlayEvaluator(options.layouts.split(','), options.ghosts.split(','), seeds,
+                                  options.agent, options.depth, options.maxMoves, options.jobs)
+    try:
+        start = loadStartingCoefficients(options.start)
+        tuned = options.tune.split(',') if options.tune else None
+        best, (score, winRate) = tune(evaluator, start, options.method, options.generations,
+                                      options.population, options.sigma, options.seed, options.output, tuned)
+    finally:
+        evaluator.close()
+    print 'Best: average score %.1f, win rate %.2f, after %d games' % (score, winRate, evaluator.gamesPlayed)
+    print 'Coefficients written to %s:' % options.output
+    for name in sorted(best):
+        print '    %-32s %g' % (repr(name) + ':', best[name])
@@ -0,0 +1,74 @@
+# distanceCalculator.py
+# ---------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+# 
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Maze distances: the length of the shortest path between two cells when
+walls have to be walked around.  Distances from a cell are found by a
+breadth-first search the first time that cell is used as a source and are
+kept for the life of its Distancer, which is shared by every layout with
+the same walls.
+"""
+
+from game import Actions
+from util import nearestPoint
+
+# Returned for cells that cannot reach each other
+DEFAULT_DISTANCE = 10000
+
+DISTANCER_CACHE = {}
+
+def getDistancer(layout):
+    """
+    Returns the shared Distancer for the walls of layout.  Layout.getDistancer
+    keeps it on the layout, which saves hashing the walls on every call.
+    """
+    walls = layout.walls
+    key = (walls.width, walls.height, walls.asBitmask())
+    if key not in DISTANCER_CACHE:
+        DISTANCER_CACHE[key] = Distancer(walls)
+    return DISTANCER_CACHE[key]
+
+class Distancer:
+    def __init__(self, walls):
+        self.walls = walls
+        self._distances = {} # source cell -> {cell: maze distance}
+
+    def getDistance(self, pos1, pos2):
+        """
+        Maze distance between two positions.  Positions between cells (scared
+        ghosts move at half speed) are rounded to the nearest cell.
+        """
+        return self.getDistancesFrom(pos1).get(nearestPoint(pos2), DEFAULT_DISTANCE)
+
+    def getDistancesFrom(self, source):
+        "Dictionary from every reachable cell to its maze distance from source"
+        source = nearestPoint(source)
+        if source not in self._distances:
+            self._distances[source] = self._breadthFirstSearch(source)
+        return self._distances[source]
+
+    def _breadthFirstSearch(self, source):
+        distances = {source: 0}
+        frontier = [source]
+        depth = 0
+        while frontier:
+            depth += 1
+            nextFrontier = []
+            for cell in frontier:
+                for neighbor in Actions.getLegalNeighbors(cell, self.walls):
+                    if neighbor not in distances:
+                        distances[neighbor] = depth
+                        nextFrontier.append(neighbor)
+            frontier = nextFrontier
+        return distances
@@ -0,0 +1,152 @@
+# featureExtractors.py
+# --------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+# 
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Batch feature extraction: turns a list of GameStates (for example all the
+leaves below one search node) into a NumPy matrix with one row per state,
+so that a linear evaluation becomes a single matrix-vector product.
+
+The columns of FEATURE_NAMES are the features of genericEvaluationFunction
+in multiAgents.py, computed the same way; MAZE_FEATURE_NAMES are optional
+extra columns using maze distances instead of Manhattan distances.
+"""
+
+import sys
+import distanceCalculator
+
+try:
+    import numpy
+    _NUMPY_ENABLED = True
+except ImportError:
+    _NUMPY_ENABLED = False
+
+INF = sys.maxint
+NEGATIVE_INF = -sys.maxint - 1
+
+FEATURE_NAMES = ['gameScore', 'distClosestFood', 'distClosestUnscaredGhost',
+                 'distClosestScaredGhost', 'foodLeft', 'capsulesLeft']
+MAZE_FEATURE_NAMES = ['mazeDistClosestFood', 'mazeDistClosestGhost']
+
+def _checkNumpy():
+    if not _NUMPY_ENABLED:
+        raise Exception('featureExtractors requires NumPy, which is not installed')
+
+def extractFeatures(gameStates, mazeDistances=False):
+    """
+    Returns an array of shape (len(gameStates), F) whose columns are
+    FEATURE_NAMES, followed by MAZE_FEATURE_NAMES if mazeDistances is set.
+    All the states must be on the same layout.
+    """
+    _checkNumpy()
+    n = len(gameStates)
+    numColumns = len(FEATURE_NAMES) + (len(MAZE_FEATURE_NAMES) if mazeDistances else 0)
+    if n == 0:
+        return numpy.zeros((0, numColumns))
+    walls = gameStates[0].getWalls()
+    width, height = walls.width, walls.height
+
+    food = numpy.array([s.getFood().data for s in gameStates], dtype=bool) # (n, width, height)
+    pacman = numpy.array([s.getPacmanPosition() for s in gameStates], dtype=float) # (n, 2)
+
+    features = numpy.zeros((n, numColumns))
+    features[:, 0] = [s.getScore() for s in gameStates]
+
+    # Manhattan distance from Pacman to every cell, masked by food
+    xs = numpy.arange(width).reshape(1, width, 1)
+    ys = numpy.arange(height).reshape(1, 1, height)
+    toCells = numpy.abs(xs - pacman[:, 0].reshape(n, 1, 1)) + numpy.abs(ys - pacman[:, 1].reshape(n, 1, 1))
+    features[:, 1] = _maskedMin(toCells, food)
+
+    # Ghosts, padded to the largest number of ghosts with infinitely far ghosts
+    numGhosts = max([1] + [s.getNumAgents() - 1 for s in gameStates])
+    ghostDistances = numpy.empty((n, numGhosts))
+    ghostDistances.fill(INF)
+    scaredTimers = numpy.zeros((n, numGhosts))
+    for i, s in enumerate(gameStates):
+        for j, ghost in enumerate(s.getGhostStates()):
+            gx, gy = ghost.getPosition()
+            ghostDistances[i, j] = abs(pacman[i, 0] - gx) + abs(pacman[i, 1] - gy)
+            scaredTimers[i, j] = ghost.scaredTimer
+    features[:, 2], features[:, 3] = _closestGhosts(ghostDistances, scaredTimers)
+
+    features[:, 4] = food.reshape(n, -1).sum(axis=1)
+    features[:, 5] = [len(s.getCapsules()) for s in gameStates]
+
+    if mazeDistances:
+        distancer = gameStates[0].data.layout.getDistancer()
+        toCells = numpy.array([_mazeDistanceArray(distancer, s.getPacmanPosition()) for s in gameStates])
+        base = len(FEATURE_NAMES)
+        features[:, base] = _maskedMin(toCells, food)
+        mazeGhost = numpy.empty(n)
+        mazeGhost.fill(INF)
+        for i, s in enumerate(gameStates):
+            for position in s.getGhostPositions():
+                mazeGhost[i] = min(mazeGhost[i], distancer.getDistance(s.getPacmanPosition(), position))
+        features[:, base + 1] = mazeGhost
+    return features
+
+# (Distancer, cell) -> array of the maze distances from cell to every cell
+_MAZE_DISTANCE_ARRAYS = {}
+
+def _mazeDistanceArray(distancer, cell):
+    key = (distancer, cell)
+    if key not in _MAZE_DISTANCE_ARRAYS:
+        walls = distancer.walls
+        array = numpy.empty((walls.width, walls.height))
+        array.fill(distanceCalculator.DEFAULT_DISTANCE)
+        for (x, y), distance in distancer.getDistancesFrom(cell).items():
+            array[x, y] = distance
+        _MAZE_DISTANCE_ARRAYS[key] = array
+    return _MAZE_DISTANCE_ARRAYS[key]
+
+def _maskedMin(distances, mask):
+    "Per-row minimum of distances where mask is set; INF for rows with nothing set"
+    n = distances.shape[0]
+    masked = numpy.where(mask, distances, INF).reshape(n, -1)
+    return masked.min(axis=1)
+
+def _closestGhosts(distances, scaredTimers):
+    """
+    Column versions of getDistClosestGhost: a ghost scared for longer than
+    its distance can be caught and counts as scared, any other as unscared,
+    and a kind with no ghost (the padding ghosts are unscared and INF away)
+    gets 0.
+    """
+    inRange = scaredTimers > distances
+    unscared = numpy.where(inRange, INF, distances).min(axis=1)
+    scared = numpy.where(inRange, distances, INF).min(axis=1)
+    return numpy.where(unscared == INF, 0, unscared), numpy.where(scared == INF, 0, scared)
+
+def coefficientVector(coefficients, names=FEATURE_NAMES):
+    "The 'COEF_<name>' entries of a coefficient dictionary, in column order"
+    _checkNumpy()
+    return numpy.array([coefficients.get('COEF_' + name, 0) for name in names], dtype=float)
+
+def evaluateLinear(gameStates, coefficients):
+    """
+    genericEvaluationFunction(state, coefficients) for every state at once.
+    Wins and losses get INF and NEGATIVE_INF as in the one-state version.
+    """
+    _checkNumpy()
+    mazeDistances = any(['COEF_' + name in coefficients for name in MAZE_FEATURE_NAMES])
+    names = FEATURE_NAMES + (MAZE_FEATURE_NAMES if mazeDistances else [])
+    features = extractFeatures(gameStates, mazeDistances)
+    # Same feature transform as genericEvaluationFunction
+    scared = features[:, 3]
+    features[:, 3] = numpy.where(scared != 0, 1.0 / numpy.where(scared != 0, scared, 1), 0)
+    values = features.dot(coefficientVector(coefficients, names))
+    for i, s in enumerate(gameStates):
+        if s.isWin(): values[i] = INF
+        elif s.isLose(): values[i] = NEGATIVE_INF
+    return values
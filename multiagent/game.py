@@ -194,14 +194,16 @@ class Grid:
 
     def __hash__(self):
         # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(self.asBitmask())
+
+    def asBitmask(self):
+        """
+        Returns the grid as one integer in which bit (x * height + y) is set
+        for every True cell.  Two grids of the same size have the same bitmask
+        exactly when they are equal, so it makes a compact, collision-free key.
+        """
+        bits = ['1' if cell else '0' for column in reversed(self.data) for cell in reversed(column)]
+        return int(''.join(bits) or '0', 2)
 
     def copy(self):
         g = Grid(self.width, self.height)
@@ -383,6 +385,11 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            # Spanning tree over the food of an ancestor, if an agent attached one
+            # (see FoodMST in multiAgents.py); kept as a starting point for updates
+            self.foodMST = prevState.foodMST
+        else:
+            self.foodMST = None
 
         self._foodEaten = None
         self._foodAdded = None
@@ -432,6 +439,19 @@ class GameStateData:
                 #hash(state)
         return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
 
+    def stateKey( self, foodBitmask=None ):
+        """
+        Returns an exact, hashable description of the state.  __hash__ folds
+        the state into 20 bits and collides often; two states share a key only
+        when they are the same position, so keys are safe for caches shared
+        across many moves.  A caller that already knows food.asBitmask() can
+        pass it in.
+        """
+        agents = tuple([(s.configuration.pos, s.configuration.direction, s.scaredTimer) for s in self.agentStates])
+        if foodBitmask == None:
+            foodBitmask = self.food.asBitmask()
+        return (agents, foodBitmask, tuple(self.capsules), self.score, self._win, self._lose)
+
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
         map = Grid(width, height)
@@ -515,7 +535,7 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
+    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False, preemptMoves=False ):
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -524,9 +544,14 @@ class Game:
         self.gameOver = False
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        # Interrupt agents at their deadline (see _callAgent)
+        self.preemptMoves = preemptMoves
         self.moveHistory = []
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
+        # Every move's time, timed out moves included, and the moves over the warning time
+        self.agentMoveTimes = [LatencyHistogram() for agent in agents]
+        self.agentSlowMoves = [0 for agent in agents]
         self.agentTimeout = False
         import cStringIO
         self.agentOutput = [cStringIO.StringIO() for agent in agents]
@@ -544,6 +569,33 @@ class Game:
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
 
+    def _recordMoveTime( self, agentIndex, moveTime ):
+        self.agentMoveTimes[agentIndex].add(moveTime)
+        if moveTime > self.rules.getMoveWarningTime(agentIndex):
+            self.agentSlowMoves[agentIndex] += 1
+
+    def _callAgent( self, function, state, deadline, enforce=True ):
+        """
+        Calls an agent's function.  Unless enforce is False, the deadline is
+        published for the agent to check (see util.getMoveDeadline), and the
+        agent has timed out if it stops at the deadline or returns after it:
+        either way DeadlineExceeded is raised.  With preemptMoves the agent
+        is also interrupted at the deadline where util.callWithDeadline can
+        do so; otherwise a hung agent is left to the enclosing timeouts.
+        """
+        if not enforce:
+            return function(state)
+        setMoveDeadline(deadline)
+        try:
+            if self.preemptMoves:
+                result = callWithDeadline(deadline, function, state)
+            else:
+                result = function(state)
+        finally:
+            setMoveDeadline(None)
+        deadline.check()
+        return result
+
     OLD_STDOUT = None
     OLD_STDERR = None
 
@@ -587,24 +639,26 @@ class Game:
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
+                        deadline = Deadline(self.rules.getMaxStartupTime(i))
                         try:
-                            start_time = time.time()
-                            timed_func(self.state.deepCopy())
-                            time_taken = time.time() - start_time
-                            self.totalAgentTimes[i] += time_taken
-                        except TimeoutFunctionException:
+                            self._callAgent(agent.registerInitialState, self.state.deepCopy(), deadline)
+                            self.totalAgentTimes[i] += deadline.elapsed()
+                        except DeadlineExceeded:
                             print >>sys.stderr, "Agent %d ran out of time on startup!" % i
                             self.unmute()
                             self.agentTimeout = True
                             self._agentCrash(i, quiet=True)
                             return
+                    except TimeoutFunctionException:
+                        # An enclosing timeout, not the agent's
+                        self.unmute()
+                        raise
                     except Exception,data:
                         self._agentCrash(i, quiet=False)
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    self._callAgent(agent.registerInitialState, self.state.deepCopy(), Deadline(self.rules.getMaxStartupTime(i)), enforce=False)
                 ## TODO: could this exceed the total time
                 self.unmute()
 
@@ -614,27 +668,28 @@ class Game:
         while not self.gameOver:
             # Fetch the next agent
             agent = self.agents[agentIndex]
-            move_time = 0
+            # One deadline covers the observation and the action
+            deadline = Deadline(self.rules.getMoveTimeout(agentIndex))
             skip_action = False
             # Generate an observation of the state
             if 'observationFunction' in dir( agent ):
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
                         try:
-                            start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
-                        except TimeoutFunctionException:
+                            observation = self._callAgent(agent.observationFunction, self.state.deepCopy(), deadline)
+                        except DeadlineExceeded:
                             skip_action = True
-                        move_time += time.time() - start_time
                         self.unmute()
+                    except TimeoutFunctionException:
+                        self.unmute()
+                        raise
                     except Exception,data:
                         self._agentCrash(agentIndex, quiet=False)
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(self.state.deepCopy())
+                    observation = self._callAgent(agent.observationFunction, self.state.deepCopy(), deadline, enforce=False)
                 self.unmute()
             else:
                 observation = self.state.deepCopy()
@@ -644,20 +699,20 @@ class Game:
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                     try:
-                        start_time = time.time()
                         if skip_action:
-                            raise TimeoutFunctionException()
-                        action = timed_func( observation )
-                    except TimeoutFunctionException:
+                            raise DeadlineExceeded()
+                        action = self._callAgent(agent.getAction, observation, deadline)
+                    except DeadlineExceeded:
+                        self._recordMoveTime(agentIndex, deadline.elapsed())
                         print >>sys.stderr, "Agent %d timed out on a single move!" % agentIndex
                         self.agentTimeout = True
                         self._agentCrash(agentIndex, quiet=True)
                         self.unmute()
                         return
 
-                    move_time += time.time() - start_time
+                    move_time = deadline.elapsed()
+                    self._recordMoveTime(agentIndex, move_time)
 
                     if move_time > self.rules.getMoveWarningTime(agentIndex):
                         self.totalAgentTimeWarnings[agentIndex] += 1
@@ -678,12 +733,18 @@ class Game:
                         self.unmute()
                         return
                     self.unmute()
+                except TimeoutFunctionException:
+                    self.unmute()
+                    raise
                 except Exception,data:
                     self._agentCrash(agentIndex)
                     self.unmute()
                     return
             else:
-                action = agent.getAction(observation)
+                action = self._callAgent(agent.getAction, observation, deadline, enforce=False)
+                move_time = deadline.elapsed()
+                self._recordMoveTime(agentIndex, move_time)
+                self.totalAgentTimes[agentIndex] += move_time
             self.unmute()
 
             # Execute the action
@@ -0,0 +1,195 @@
+# gameRecording.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A compact binary format for recorded games, many games to a file.
+
+A recording starts with MAGIC and is followed by records, each starting
+with a one letter type:
+
+  'L'  a layout: the SHA-1 hash of its text, then the text itself.  Each
+       layout is written once per file, before the first game played on it.
+  'G'  a game: the hash of its layout, the seed it was played with, the
+       number of agents, the final score and outcome, then the moves, one
+       byte each: the agent index in the high five bits and the direction
+       in the low three.
+
+Games are appended as they finish, and the file is flushed after each one,
+so a recording can be read while the run writing it is still going, and a
+crash loses at most the game being played.
+
+    writer = RecordingWriter('games.rec', seed = 'cs188')
+    writer.writeGame(game)        # after each game.run()
+    writer.close()
+
+    for recorded in readRecording('games.rec'):
+        pacman.replayGame(display = display, **recorded.replayArguments())
+"""
+
+import os
+import struct
+
+from game import Directions
+import layout
+
+MAGIC = 'PACREC\x00\x01'
+
+# Direction codes of the move bytes
+DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+DIRECTION_CODES = dict([(direction, code) for code, direction in enumerate(DIRECTIONS)])
+MAX_AGENTS = 32
+
+LAYOUT_HEADER = struct.Struct('>20sI')     # hash, length of the text
+GAME_HEADER = struct.Struct('>20sHBdBI')   # layout hash, length of the seed, agents, score, outcome, moves
+WIN, LOSE = 1, 2
+
+def layoutHash(lay):
+    "The SHA-1 digest identifying a layout by its text"
+    return layout.contentHash(lay.layoutText)
+
+def packMoves(moveHistory):
+    "Packs a list of (agentIndex, action) into a string of one byte per move"
+    moves = []
+    for agentIndex, action in moveHistory:
+        if not 0 <= agentIndex < MAX_AGENTS:
+            raise ValueError('Cannot record agent %d: at most %d agents fit a move byte' % (agentIndex, MAX_AGENTS))
+        moves.append(chr(agentIndex << 3 | DIRECTION_CODES[action]))
+    return ''.join(moves)
+
+def unpackMoves(moves):
+    "The list of (agentIndex, action) packed by packMoves"
+    return [(ord(move) >> 3, DIRECTIONS[ord(move) & 7]) for move in moves]
+
+class RecordedGame:
+    """
+    One game read from a recording: its layout, the seed it was played with
+    (see pacman.runGames), its number of agents, final score and outcome,
+    and its moves as the (agentIndex, action) pairs of Game.moveHistory.
+    """
+    def __init__(self, layout, seed, numAgents, score, win, lose, actions):
+        self.layout = layout
+        self.seed = seed
+        self.numAgents = numAgents
+        self.score = score
+        self.win = win
+        self.lose = lose
+        self.actions = actions
+
+    def replayArguments(self):
+        "The keyword arguments of pacman.replayGame, but for the display"
+        return {'layout': self.layout, 'actions': self.actions, 'numGhosts': self.numAgents - 1}
+
+    def __str__(self):
+        outcome = 'Win' if self.win else 'Loss' if self.lose else 'Unfinished'
+        return '%d moves, %d agents, score %s, %s' % (len(self.actions), self.numAgents, self.score, outcome)
+
+class RecordingWriter:
+    """
+    Appends games to a recording, creating it if needed.  Layouts already in
+    an existing file are not written again.
+    """
+    def __init__(self, fileName, seed = None):
+        self.fileName = fileName
+        self.seed = '' if seed == None else str(seed)
+        self.layoutHashes = set()
+        if os.path.exists(fileName) and os.path.getsize(fileName) > 0:
+            for recordType, header, body in readRecords(fileName):
+                if recordType == 'L':
+                    self.layoutHashes.add(header[0])
+            self.file = open(fileName, 'ab')
+        else:
+            self.file = open(fileName, 'wb')
+            self.file.write(MAGIC)
+        self.numGames = 0
+
+    def writeGame(self, game, seed = None):
+        "Appends a finished game.Game, then flushes the file"
+        state = game.state
+        self.write(state.data.layout, game.moveHistory, state.getNumAgents(),
+                   state.getScore(), state.isWin(), state.isLose(), seed)
+
+    def write(self, lay, moveHistory, numAgents, score, win = False, lose = False, seed = None):
+        "Appends a game given by its parts, then flushes the file"
+        digest = layoutHash(lay)
+        if digest not in self.layoutHashes:
+            text = '\n'.join(lay.layoutText)
+            self.file.write('L' + LAYOUT_HEADER.pack(digest, len(text)) + text)
+            self.layoutHashes.add(digest)
+        seed = self.seed if seed == None else str(seed)
+        moves = packMoves(moveHistory)
+        outcome = (WIN if win else 0) | (LOSE if lose else 0)
+        self.file.write('G' + GAME_HEADER.pack(digest, len(seed), numAgents, score, outcome, len(moves)) + seed + moves)
+        self.file.flush()
+        self.numGames += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        self.close()
+
+def readRecords(fileName):
+    """
+    Generates the records of a recording as (type, header fields, body):
+    for a layout the header is (hash, length) and the body the text; for a
+    game the header is GAME_HEADER's fields and the body is (seed, moves).
+    """
+    f = open(fileName, 'rb')
+    try:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('%s is not a game recording' % fileName)
+        while True:
+            recordType = f.read(1)
+            if recordType == '': break
+            if recordType == 'L':
+                header = LAYOUT_HEADER.unpack(readExactly(f, LAYOUT_HEADER.size, fileName))
+                body = readExactly(f, header[1], fileName)
+            elif recordType == 'G':
+                header = GAME_HEADER.unpack(readExactly(f, GAME_HEADER.size, fileName))
+                seed = readExactly(f, header[1], fileName)
+                body = (seed, readExactly(f, header[5], fileName))
+            else:
+                raise ValueError('Unknown record type %r in %s' % (recordType, fileName))
+            yield recordType, header, body
+    finally:
+        f.close()
+
+def readExactly(f, size, fileName):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError('%s ends in the middle of a record' % fileName)
+    return data
+
+def readRecording(fileName):
+    "Generates the RecordedGames of a recording, in the order they were played"
+    layouts = {}
+    for recordType, header, body in readRecords(fileName):
+        if recordType == 'L':
+            layouts[header[0]] = layout.registerLayout(body.split('\n'))
+            continue
+        digest, seedLength, numAgents, score, outcome, numMoves = header
+        seed, moves = body
+        if digest not in layouts:
+            raise ValueError('A game in %s refers to a layout the file does not contain' % fileName)
+        yield RecordedGame(layouts[digest], seed, numAgents, score,
+                           bool(outcome & WIN), bool(outcome & LOSE), unpackMoves(moves))
+
+def isRecording(fileName):
+    "Whether fileName is in this format, rather than a pickled game"
+    f = open(fileName, 'rb')
+    try: return f.read(len(MAGIC)) == MAGIC
+    finally: f.close()
@@ -0,0 +1,209 @@
+# gameReplay.py
+# -------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Replays recorded games (see gameRecording.py) without a display, jumping
+to any move, and checks recordings against the engine.
+
+An IndexedReplay keeps a keyframe, a compact snapshot of the state with the
+food packed by Grid.packBits, every few moves.  Seeking to a move restores
+the nearest keyframe before it and replays only the moves in between, so
+once a game has been indexed any move is at most one keyframe interval of
+replay away.  Keyframes are taken as the replay first passes them.
+
+    python gameReplay.py games.rec --list
+    python gameReplay.py games.rec --game 3 --seek 2000     # print a position
+    python gameReplay.py games.rec --verify                 # on every core
+
+--verify replays every game and compares the final score and outcome with
+the recorded ones, exiting with status 1 if any differ.  The same move can
+be shown with graphics with pacman.py --replay games.rec --replayIndex 3
+--replayFrom 2000.
+"""
+
+import multiprocessing
+import optparse
+import sys
+
+from game import Configuration, reconstituteGrid
+import gameRecording
+from pacman import GameState
+
+KEYFRAME_INTERVAL = 100
+
+def packState(state):
+    "A keyframe of a GameState: the parts of its data that change during a game"
+    data = state.data
+    agents = tuple([(s.configuration.pos, s.configuration.direction, s.scaredTimer, s.numCarrying, s.numReturned)
+                    for s in data.agentStates])
+    return (data.food.packBits(), tuple(data.capsules), agents, data.score,
+            tuple(data._eaten), data._win, data._lose)
+
+def unpackState(keyframe, layout, numGhosts):
+    "The GameState of a keyframe taken in a game on layout with numGhosts ghosts"
+    food, capsules, agents, score, eaten, win, lose = keyframe
+    state = GameState()
+    state.initialize(layout, numGhosts)
+    data = state.data
+    data.food = reconstituteGrid(food)
+    data.capsules = list(capsules)
+    for agentState, (pos, direction, scaredTimer, numCarrying, numReturned) in zip(data.agentStates, agents):
+        agentState.configuration = Configuration(pos, direction)
+        agentState.scaredTimer = scaredTimer
+        agentState.numCarrying = numCarrying
+        agentState.numReturned = numReturned
+    data.score = score
+    data._eaten = list(eaten)
+    data._win = win
+    data._lose = lose
+    return state
+
+class IndexedReplay:
+    """
+    Random access to the states of a recorded game.  seek(i) is the state
+    after the first i moves; seek(0) is the start and seek(len(actions)) the
+    end of the game.
+    """
+    def __init__(self, layout, actions, numGhosts = None, keyframeInterval = KEYFRAME_INTERVAL):
+        if numGhosts == None: numGhosts = layout.getNumGhosts()
+        self.layout = layout
+        self.actions = actions
+        self.numGhosts = numGhosts
+        self.keyframeInterval = keyframeInterval
+        start = GameState()
+        start.initialize(layout, numGhosts)
+        self.keyframes = [packState(start)]
+
+    def fromRecording(recorded, keyframeInterval = KEYFRAME_INTERVAL):
+        "An IndexedReplay of a gameRecording.RecordedGame"
+        return IndexedReplay(recorded.layout, recorded.actions, recorded.numAgents - 1, keyframeInterval)
+    fromRecording = staticmethod(fromRecording)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def seek(self, moveIndex):
+        "The GameState after the first moveIndex moves"
+        if not 0 <= moveIndex <= len(self.actions):
+            raise IndexError('Move %d is outside a game of %d moves' % (moveIndex, len(self.actions)))
+        frame = min(moveIndex / self.keyframeInterval, len(self.keyframes) - 1)
+        state = unpackState(self.keyframes[frame], self.layout, self.numGhosts)
+        return self.step(state, frame * self.keyframeInterval, moveIndex)
+
+    def finalState(self):
+        return self.seek(len(self.actions))
+
+    def step(self, state, moveIndex, targetIndex):
+        """
+        Plays the moves from moveIndex up to targetIndex on state, keeping a
+        keyframe at every interval passed for the first time.
+        """
+        stateClass = state.__class__
+        explored = stateClass.explored
+        stateClass.explored = set() # Replayed states are not search nodes
+        try:
+            while moveIndex < targetIndex:
+                state = state.generateSuccessor(*self.actions[moveIndex])
+                moveIndex += 1
+                if moveIndex % self.keyframeInterval == 0 and moveIndex / self.keyframeInterval == len(self.keyframes):
+                    self.keyframes.append(packState(state))
+        finally:
+            stateClass.explored = explored
+        return state
+
+def verifyGame(recorded):
+    """
+    Replays a RecordedGame and returns (replayed score, replayed win, replayed
+    lose, error), error being None unless the moves could not be replayed.
+    """
+    try:
+        state = IndexedReplay.fromRecording(recorded).finalState()
+    except Exception, e:
+        return None, None, None, '%s: %s' % (type(e).__name__, e)
+    return state.getScore(), state.isWin(), state.isLose(), None
+
+def _verifyTask(task):
+    index, recorded = task
+    return (index,) + verifyGame(recorded)
+
+def verifyRecording(fileName, processes = None):
+    """
+    Replays every game of a recording on a pool of processes, one per core
+    unless processes is given.  Returns the number of games and the list of
+    (game index, recorded game, replayed score, win, lose, error) of those
+    that do not match their recording.
+    """
+    games = list(gameRecording.readRecording(fileName))
+    tasks = list(enumerate(games))
+    if processes == 1 or len(tasks) < 2:
+        results = map(_verifyTask, tasks)
+    else:
+        if processes == None: processes = multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_verifyTask, tasks, chunksize = max(1, len(tasks) / (4 * processes)))
+        finally:
+            pool.close()
+            pool.join()
+    mismatches = []
+    for index, score, win, lose, error in results:
+        recorded = games[index]
+        if error != None or (score, win, lose) != (recorded.score, recorded.win, recorded.lose):
+            mismatches.append((index, recorded, score, win, lose, error))
+    return len(games), mismatches
+
+def readCommand(argv):
+    parser = optparse.OptionParser(usage = 'python gameReplay.py RECORDING [options]',
+                                   description = 'Inspect and verify recorded games')
+    parser.add_option('--list', action = 'store_true', default = False,
+                      help = 'List the games of the recording')
+    parser.add_option('--game', type = 'int', default = 0,
+                      help = 'Index of the game to inspect, counting from 0 (default %default)')
+    parser.add_option('--seek', type = 'int', default = None,
+                      help = 'Print the state after this many moves of the game')
+    parser.add_option('--keyframes', type = 'int', default = KEYFRAME_INTERVAL,
+                      help = 'Moves between keyframes (default %default)')
+    parser.add_option('--verify', action = 'store_true', default = False,
+                      help = 'Replay every game and check its final score and outcome')
+    parser.add_option('--processes', type = 'int', default = None,
+                      help = 'Processes replaying games with --verify [Default: one per core]')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 1:
+        parser.error('Expected one recording, not %s' % otherjunk)
+    return otherjunk[0], options
+
+if __name__ == '__main__':
+    fileName, options = readCommand(sys.argv[1:])
+    if options.list:
+        for index, recorded in enumerate(gameRecording.readRecording(fileName)):
+            print '%5d  %s' % (index, recorded)
+    if options.seek != None:
+        for index, recorded in enumerate(gameRecording.readRecording(fileName)):
+            if index == options.game: break
+        else:
+            print 'The recording has no game %d' % options.game
+            sys.exit(2)
+        replay = IndexedReplay.fromRecording(recorded, options.keyframes)
+        print 'Game %d after %d of %d moves:' % (options.game, options.seek, len(replay))
+        print replay.seek(options.seek)
+    if options.verify:
+        numGames, mismatches = verifyRecording(fileName, options.processes)
+        for index, recorded, score, win, lose, error in mismatches:
+            if error != None:
+                print 'Game %d: recorded %s; replay failed with %s' % (index, recorded, error)
+            else:
+                outcome = 'Win' if win else 'Loss' if lose else 'Unfinished'
+                print 'Game %d: recorded %s; replayed score %s, %s' % (index, recorded, score, outcome)
+        print '%d of %d games match their recording' % (numGames - len(mismatches), numGames)
+        if mismatches: sys.exit(1)
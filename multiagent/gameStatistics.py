@@ -0,0 +1,284 @@
+# gameStatistics.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Statistics of many games, gathered as the games finish rather than by
+keeping them.
+
+Given aggregators, pacman.runGames reduces each finished game to a small
+GameSummary, passes it to every aggregator and drops the game, so running
+ten thousand games keeps no more than a score and an outcome per game (for
+the Scores: and Record: lines), and nothing per game with keepScores and
+keepRecord off:
+
+    scores, outcomes = ScoreStatistics(), OutcomeCounter()
+    pacman.runGames(..., aggregators = [scores, outcomes, CsvWriter('games.csv')])
+    print scores.mean(), scores.standardError(), outcomes.wins
+
+An aggregator is any object with add(summary), close() and report()
+methods; Aggregator has them all doing nothing.  From the command line:
+
+    python pacman.py -p ReflexAgent -q -n 10000 --stream --summaryFile games.jsonl
+"""
+
+import csv
+import json
+import math
+
+import util
+
+class GameSummary:
+    """
+    What is left of a finished game.Game: its index in the run, final score,
+    outcome, number of moves, whether an agent timed out or crashed, and per
+    agent the time used, the time allowed (rules.getMaxTotalTime), the
+    util.LatencyHistogram of its moves and the number of slow moves.
+    """
+    FIELDS = ['index', 'score', 'win', 'lose', 'moves', 'timeout', 'crashed', 'agentTimes', 'agentSlowMoves']
+
+    def __init__(self, index, score, win, lose, moves, timeout, crashed,
+                 agentTimes, agentTimeLimits, agentMoveTimes, agentSlowMoves):
+        self.index = index
+        self.score = score
+        self.win = win
+        self.lose = lose
+        self.moves = moves
+        self.timeout = timeout
+        self.crashed = crashed
+        self.agentTimes = agentTimes
+        self.agentTimeLimits = agentTimeLimits
+        self.agentMoveTimes = agentMoveTimes
+        self.agentSlowMoves = agentSlowMoves
+
+    def fromGame(game, index = 0):
+        state = game.state
+        numAgents = len(game.agents)
+        return GameSummary(index, state.getScore(), state.isWin(), state.isLose(), len(game.moveHistory),
+                           game.agentTimeout, game.agentCrashed, tuple(game.totalAgentTimes),
+                           tuple([game.rules.getMaxTotalTime(i) for i in range(numAgents)]),
+                           tuple(game.agentMoveTimes), tuple(game.agentSlowMoves))
+    fromGame = staticmethod(fromGame)
+
+    def asDict(self):
+        "The FIELDS of the summary, as written by the writers"
+        return dict([(field, getattr(self, field)) for field in self.FIELDS])
+
+class Aggregator:
+    "The methods of an aggregator, doing nothing"
+    def add(self, summary):
+        pass
+
+    def close(self):
+        pass
+
+    def report(self):
+        pass
+
+class ScoreStatistics(Aggregator):
+    """
+    The mean and variance of the scores, updated one score at a time
+    (Welford's method), with the lowest and highest, and the list of scores
+    unless keepScores is False.
+
+    >>> scores = ScoreStatistics()
+    >>> for score in [2, 4, 4, 4, 5, 5, 7, 9]: scores.addScore(score)
+    >>> scores.count, scores.mean(), scores.variance(), scores.min, scores.max
+    (8, 5.0, 4.571428571428571, 2, 9)
+    """
+    def __init__(self, keepScores = True):
+        self.scores = None
+        if keepScores: self.scores = []
+        self.count = 0
+        self.total = 0.0
+        self._mean = 0.0
+        self._squares = 0.0 # Sum of squared differences from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, summary):
+        self.addScore(summary.score)
+
+    def addScore(self, score):
+        if self.scores != None: self.scores.append(score)
+        self.count += 1
+        self.total += score
+        delta = score - self._mean
+        self._mean += delta / self.count
+        self._squares += delta * (score - self._mean)
+        if self.min == None or score < self.min: self.min = score
+        if self.max == None or score > self.max: self.max = score
+
+    def mean(self):
+        "The plain sum over count, exactly as averaging a list would give"
+        if self.count == 0: return 0.0
+        return self.total / self.count
+
+    def variance(self):
+        "The sample variance, 0.0 for fewer than two scores"
+        if self.count < 2: return 0.0
+        return self._squares / (self.count - 1)
+
+    def stdDev(self):
+        return math.sqrt(self.variance())
+
+    def standardError(self):
+        if self.count == 0: return 0.0
+        return self.stdDev() / math.sqrt(self.count)
+
+    def confidenceInterval(self, z = 1.96):
+        "The normal confidence interval of the mean, 95% by default"
+        margin = z * self.standardError()
+        return self._mean - margin, self._mean + margin
+
+    def report(self):
+        if self.count == 0: return
+        low, high = self.confidenceInterval()
+        print 'Average Score: %s (95%% CI %.1f to %.1f, std dev %.1f)' % (self.mean(), low, high, self.stdDev())
+        if self.scores != None:
+            print 'Scores:       ', ', '.join([str(score) for score in self.scores])
+        print 'Score range:   %s to %s' % (self.min, self.max)
+
+class OutcomeCounter(Aggregator):
+    "The number of games, wins, losses, timeouts and crashes, and whether each game was won unless keepRecord is False"
+    def __init__(self, keepRecord = True):
+        self.record = None
+        if keepRecord: self.record = []
+        self.games = 0
+        self.wins = 0
+        self.losses = 0
+        self.timeouts = 0
+        self.crashes = 0
+
+    def add(self, summary):
+        if self.record != None: self.record.append(summary.win)
+        self.games += 1
+        self.wins += int(summary.win)
+        self.losses += int(summary.lose)
+        self.timeouts += int(summary.timeout)
+        self.crashes += int(summary.crashed)
+
+    def winRate(self):
+        if self.games == 0: return 0.0
+        return self.wins / float(self.games)
+
+    def report(self):
+        if self.games == 0: return
+        print 'Win Rate:      %d/%d (%.2f)' % (self.wins, self.games, self.winRate())
+        if self.record != None:
+            print 'Record:       ', ', '.join([['Loss', 'Win'][int(win)] for win in self.record])
+        if self.timeouts or self.crashes:
+            print 'Timeouts:      %d, crashes: %d' % (self.timeouts, self.crashes)
+
+class ScoreHistogram(Aggregator):
+    "The number of scores in each bin of binWidth points"
+    def __init__(self, binWidth = 100):
+        self.binWidth = binWidth
+        self.bins = util.Counter() # Lowest score of the bin -> number of scores
+
+    def add(self, summary):
+        self.bins[int(math.floor(summary.score / float(self.binWidth))) * self.binWidth] += 1
+
+    def report(self, width = 50):
+        if not self.bins: return
+        largest = max(self.bins.values())
+        print 'Score histogram:'
+        for low in range(min(self.bins), max(self.bins) + self.binWidth, self.binWidth):
+            count = self.bins[low]
+            print '  %7d to %-7d %6d %s' % (low, low + self.binWidth, count, '#' * int(math.ceil(width * count / float(largest))))
+
+class LatencyAggregator(Aggregator):
+    """
+    How long each agent's moves took over all the games: the moves' merged
+    util.LatencyHistogram, the number of slow moves, and the most time used
+    in one game against the time allowed.
+    """
+    def __init__(self):
+        self.agents = []
+
+    def add(self, summary):
+        for agentIndex, moveTimes in enumerate(summary.agentMoveTimes):
+            if agentIndex == len(self.agents):
+                self.agents.append({'moves': util.LatencyHistogram(), 'slowMoves': 0, 'peakTotal': 0.0,
+                                    'maxTotal': summary.agentTimeLimits[agentIndex]})
+            entry = self.agents[agentIndex]
+            entry['moves'].merge(moveTimes)
+            entry['slowMoves'] += summary.agentSlowMoves[agentIndex]
+            entry['peakTotal'] = max(entry['peakTotal'], summary.agentTimes[agentIndex])
+
+    def summary(self):
+        "A list with a dictionary per agent: 'moves', 'slowMoves', 'peakTotal' and 'maxTotal'"
+        return self.agents
+
+    def report(self):
+        if self.agents: printLatencyReport(self.agents)
+
+def printLatencyReport(summary):
+    print 'Move latency:   %7s %9s %9s %9s %9s %6s  %s' % ('Moves', 'p50', 'p95', 'p99', 'max', 'Slow', 'Peak time per game')
+    for agentIndex, entry in enumerate(summary):
+        moves = entry['moves']
+        name = 'Pacman' if agentIndex == 0 else 'Ghost %d' % agentIndex
+        print '  %-13s %7d %7.1fms %7.1fms %7.1fms %7.1fms %6d  %.2fs of %gs (%.1f%%)' % \
+            (name, moves.count, 1000 * moves.percentile(50), 1000 * moves.percentile(95), 1000 * moves.percentile(99),
+             1000 * moves.max, entry['slowMoves'], entry['peakTotal'], entry['maxTotal'],
+             100.0 * entry['peakTotal'] / entry['maxTotal'])
+
+class CsvWriter(Aggregator):
+    "Writes one line per game, with the GameSummary.FIELDS as columns, agent values separated by spaces"
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.file = open(fileName, 'wb')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(GameSummary.FIELDS)
+        self.count = 0
+
+    def add(self, summary):
+        row = []
+        for field in GameSummary.FIELDS:
+            value = getattr(summary, field)
+            if isinstance(value, tuple): value = ' '.join([str(v) for v in value])
+            elif isinstance(value, bool): value = int(value)
+            row.append(value)
+        self.writer.writerow(row)
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def report(self):
+        print 'Wrote %d game summaries to %s' % (self.count, self.fileName)
+
+class JsonLinesWriter(CsvWriter):
+    "Writes one JSON object per line and game, with the GameSummary.FIELDS as keys"
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.file = open(fileName, 'w')
+        self.count = 0
+
+    def add(self, summary):
+        self.file.write(json.dumps(summary.asDict(), sort_keys = True) + '\n')
+        self.file.flush()
+        self.count += 1
+
+def summaryWriter(fileName):
+    "A JsonLinesWriter for a .json or .jsonl file, otherwise a CsvWriter"
+    if fileName.endswith('.json') or fileName.endswith('.jsonl'):
+        return JsonLinesWriter(fileName)
+    return CsvWriter(fileName)
+
+def defaultAggregators(summaryFile = None):
+    "Score statistics and histogram, outcomes and latency, and a writer if summaryFile is given"
+    aggregators = [ScoreStatistics(), OutcomeCounter(), ScoreHistogram(), LatencyAggregator()]
+    if summaryFile != None: aggregators.append(summaryWriter(summaryFile))
+    return aggregators
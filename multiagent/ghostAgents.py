@@ -16,24 +16,91 @@ from game import Agent
 from game import Actions
 from game import Directions
 import random
+import inspect
 from util import manhattanDistance
+import distanceCalculator
 import util
 
+# Distributions kept per layout by GhostAgent.getCachedDistribution
+DISTRIBUTION_CACHE_SIZE = 100000
+
 class GhostAgent( Agent ):
+    # Where the ghost's random numbers come from; set it to a random.Random
+    # to give the ghost a stream of its own
+    rng = random
+    # Sample cached distributions by the alias method (see
+    # util.DiscreteDistribution.aliasSample).  The moves are as likely, but
+    # not the same for the same random numbers, so games played under a
+    # seed, such as the autograder's, change: off unless set
+    aliasSampling = False
+
     def __init__( self, index ):
         self.index = index
 
     def getAction( self, state ):
-        dist = self.getDistribution(state)
+        dist = self.getCachedDistribution(state)
         if len(dist) == 0:
             return Directions.STOP
+        elif self.aliasSampling and isinstance(dist, util.DiscreteDistribution):
+            return dist.aliasSample( self.rng )
         else:
-            return util.chooseFromDistribution( dist )
+            return util.chooseFromDistribution( dist, self.rng )
 
     def getDistribution(self, state):
         "Returns a Counter encoding a distribution over actions from the provided state."
         util.raiseNotDefined()
 
+    def getDistributionKey(self, state):
+        """
+        Returns a hashable key such that any two states with the same key on
+        the same layout give the same distribution, or None if the
+        distribution cannot be cached.  The key only holds for the
+        distribution of the class defining it: a subclass overriding
+        getDistribution or getActionDistribution must define its own key to
+        have its distributions cached (see distributionKeyApplies).
+        """
+        return None
+
+    def getCachedDistribution(self, state):
+        """
+        The distribution of getDistribution as a util.DiscreteDistribution,
+        kept in a cache shared by all ghosts of the same type and settings on
+        the same layout.  Each cache holds at most DISTRIBUTION_CACHE_SIZE
+        distributions; beyond that new ones are computed every time.
+        """
+        key = self.getDistributionKey(state)
+        if key == None or not distributionKeyApplies(self.__class__):
+            return self.getDistribution(state)
+        cache = state.data.layout.getDerived('ghostDistributions', lambda layout: {})
+        key = (self.__class__, key)
+        dist = cache.get(key)
+        if dist == None:
+            if hasattr(self, 'getActionDistribution'):
+                dist = util.DiscreteDistribution(self.getActionDistribution(state))
+            else:
+                dist = util.DiscreteDistribution(self.getDistribution(state))
+            if len(cache) < DISTRIBUTION_CACHE_SIZE:
+                cache[key] = dist
+        return dist
+
+_keyApplies = {} # Ghost class -> whether its getDistributionKey covers its distribution
+
+def distributionKeyApplies( ghostClass ):
+    """
+    Whether the getDistributionKey of ghostClass was defined with its
+    distribution in mind: neither getDistribution nor getActionDistribution
+    is overridden in a subclass of the class defining the key.
+    """
+    if ghostClass not in _keyApplies:
+        def definingClass( name ):
+            for c in inspect.getmro( ghostClass ):
+                if name in c.__dict__: return c
+        keyClass = definingClass( 'getDistributionKey' )
+        _keyApplies[ghostClass] = all([issubclass( keyClass, definingClass( name ) )
+                                       for name in ('getDistribution', 'getActionDistribution')
+                                       if hasattr( ghostClass, name )])
+    return _keyApplies[ghostClass]
+
 class RandomGhost( GhostAgent ):
     "A ghost that chooses a legal action uniformly at random."
     def getDistribution( self, state ):
@@ -42,6 +109,11 @@ class RandomGhost( GhostAgent ):
         dist.normalize()
         return dist
 
+    def getDistributionKey( self, state ):
+        # The legal actions depend only on the position and heading
+        conf = state.getGhostState( self.index ).configuration
+        return (conf.pos, conf.direction)
+
 class DirectionalGhost( GhostAgent ):
     "A ghost that prefers to rush Pacman, or flee when scared."
     def __init__( self, index, prob_attack=0.8, prob_scaredFlee=0.8 ):
@@ -79,3 +151,99 @@ class DirectionalGhost( GhostAgent ):
         for a in legalActions: dist[a] += ( 1-bestProb ) / len(legalActions)
         dist.normalize()
         return dist
+
+    def getDistributionKey( self, state ):
+        ghostState = state.getGhostState( self.index )
+        conf = ghostState.configuration
+        return (conf.pos, conf.direction, ghostState.scaredTimer > 0, state.getPacmanPosition(),
+                self.prob_attack, self.prob_scaredFlee)
+
+class MazeDirectionalGhost( DirectionalGhost ):
+    """
+    A DirectionalGhost measuring its distance to Pacman through the maze, as
+    the layout's shared distance table gives it, rather than as the crow
+    flies.  Its distribution is a tuple of (probability, action) pairs in
+    the order of the legal actions, which util.chooseFromDistribution samples
+    directly; getDistribution still returns a Counter.  getAction samples the
+    cached distribution (see GhostAgent.getCachedDistribution).
+    """
+    def getDistribution( self, state ):
+        dist = util.Counter()
+        for prob, action in self.getActionDistribution( state ): dist[action] = prob
+        return dist
+
+    def getActionDistribution( self, state ):
+        ghostState = state.getGhostState( self.index )
+        legalActions = state.getLegalActions( self.index )
+        if len(legalActions) == 0: return ()
+        x, y = ghostState.getPosition()
+        isScared = ghostState.scaredTimer > 0
+        speed = 0.5 if isScared else 1
+
+        distances = state.data.layout.getDistancer().getDistancesFrom( state.getPacmanPosition() )
+        vectors = Actions._directions
+        distancesToPacman = [mazeDistance( distances, ( x + vectors[a][0] * speed, y + vectors[a][1] * speed ) )
+                             for a in legalActions]
+        if isScared:
+            bestScore = max( distancesToPacman )
+            bestProb = self.prob_scaredFlee
+        else:
+            bestScore = min( distancesToPacman )
+            bestProb = self.prob_attack
+
+        numBest = distancesToPacman.count( bestScore )
+        otherProb = ( 1 - bestProb ) / len(legalActions)
+        return tuple([( otherProb + ( bestProb / numBest if distance == bestScore else 0 ), action )
+                      for action, distance in zip( legalActions, distancesToPacman )])
+
+    def getDistributionKey( self, state ):
+        # Maze distances from Pacman's position depend on nothing else
+        return DirectionalGhost.getDistributionKey( self, state )
+
+def mazeDistance( distances, pos ):
+    """
+    Distance of pos in a table of maze distances from one cell (see
+    distanceCalculator.Distancer.getDistancesFrom).  A position half way
+    between two cells is half a step further than the nearer of them.
+    """
+    x, y = pos
+    cell = ( int(x), int(y) )
+    if cell == pos:
+        return distances.get( cell, distanceCalculator.DEFAULT_DISTANCE )
+    return min( distances.get( cell, distanceCalculator.DEFAULT_DISTANCE ),
+                distances.get( ( int(x + 0.5), int(y + 0.5) ), distanceCalculator.DEFAULT_DISTANCE ) ) + 0.5
+
+def getActionDistribution( ghost, state ):
+    "The distribution of a ghost's action, as a tuple of (probability, action) pairs"
+    if isinstance( ghost, GhostAgent ):
+        dist = ghost.getCachedDistribution( state )
+        if isinstance( dist, util.DiscreteDistribution ):
+            return tuple(zip( dist.probabilities, dist.values ))
+    if hasattr( ghost, 'getActionDistribution' ):
+        return ghost.getActionDistribution( state )
+    return tuple([( prob, action ) for action, prob in sorted( ghost.getDistribution( state ).items() )])
+
+def getJointSuccessors( state, ghosts, generateSuccessor = None ):
+    """
+    The states after every ghost has moved, as a tuple of (probability,
+    state) pairs, for the chance nodes of ExpectimaxAgent's ghostModel.
+    Each ghost's distribution is taken on the state it moves from, and a
+    move ending the game leaves the ghosts after it unmoved.  Successors
+    come from generateSuccessor(state, agentIndex, action) if given.
+    """
+    successors = []
+    frontier = [( 1.0, state )]
+    for ghost in ghosts:
+        nextFrontier = []
+        for prob, current in frontier:
+            if current.isWin() or current.isLose():
+                successors.append(( prob, current ))
+                continue
+            for p, action in getActionDistribution( ghost, current ):
+                if generateSuccessor == None:
+                    successor = current.generateSuccessor( ghost.index, action )
+                else:
+                    successor = generateSuccessor( current, ghost.index, action )
+                nextFrontier.append(( prob * p, successor ))
+        frontier = nextFrontier
+    return tuple(successors + frontier)
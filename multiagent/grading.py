@@ -14,7 +14,12 @@
 
 "Common code for autograders"
 
+import ast
 import cgi
+import cPickle
+import hashlib
+import os
+import re
 import time
 import sys
 import traceback
@@ -22,6 +27,9 @@ import pdb
 from collections import defaultdict
 import util
 
+# Seconds a question (or, with parallel grading, a test case) may run
+QUESTION_TIMEOUT = 300
+
 class Grades:
   "A data structure for project grades, along with formatting code to display them"
   def __init__(self, projectName, questionsAndMaxesList, edxOutput=False, muteOutput=False):
@@ -72,7 +80,7 @@ class Grades:
 
       if self.mute: util.mutePrint()
       try:
-        util.TimeoutFunction(getattr(gradingModule, q),300)(self) # Call the question's function
+        util.TimeoutFunction(getattr(gradingModule, q),QUESTION_TIMEOUT)(self) # Call the question's function
         #TimeoutFunction(getattr(gradingModule, q),1200)(self) # Call the question's function
       except Exception, inst:
         self.addExceptionMessage(q, inst, traceback)
@@ -143,7 +151,9 @@ to follow your instructor's guidelines to receive credit on your project.
     """
     self.fail('FAIL: Exception raised: %s' % inst)
     self.addMessage('')
-    for line in traceback.format_exc().split('\n'):
+    # Exceptions from worker processes carry the traceback of the worker
+    trace = getattr(inst, 'remoteTraceback', None) or traceback.format_exc()
+    for line in trace.split('\n'):
         self.addMessage(line)
 
   def addErrorHints(self, exceptionMap, errorInstance, questionNum):
@@ -262,6 +272,187 @@ to follow your instructor's guidelines to receive credit on your project.
 
 
 
+class RecordingGrades:
+  """
+  Stands in for Grades while a test case runs in a worker process.  It
+  records, in order, each call the test case makes on its grades object and
+  everything printed meanwhile (it is also installed as sys.stdout), so that
+  replay() can apply them to the real Grades in the parent process.
+  """
+  def __init__(self, muteOutput=False):
+    self.events = []
+    self.mute = muteOutput
+
+  def write(self, text):
+    self.events.append(('output', text))
+
+  def flush(self):
+    pass
+
+  def _record(self, method, *args):
+    self.events.append(('call', method, args))
+
+  def addMessage(self, message, raw=False): self._record('addMessage', message, raw)
+  def addPoints(self, amt): self._record('addPoints', amt)
+  def deductPoints(self, amt): self._record('deductPoints', amt)
+  def assignZeroCredit(self): self._record('assignZeroCredit')
+  def assignFullCredit(self, message="", raw=False): self._record('assignFullCredit', message, raw)
+  def fail(self, message, raw=False): self._record('fail', message, raw)
+  def addMessageToEmail(self, message): self._record('addMessageToEmail', message)
+
+
+class RemoteTestException(Exception):
+  "An exception raised by a test case in a worker process"
+  def __init__(self, message, remoteTraceback):
+    Exception.__init__(self, message)
+    self.remoteTraceback = remoteTraceback
+
+
+def runRecorded(thunk, timeout=None, muteOutput=False):
+  """
+  Runs a test case thunk against a RecordingGrades, with its output captured,
+  and returns (events, result, error); error is None or the pair (message,
+  traceback).  Everything returned can be pickled back to the parent.
+  Without a timeout the thunk runs under whatever timeout is already active.
+  """
+  recorder = RecordingGrades(muteOutput)
+  oldStdout = sys.stdout
+  sys.stdout = recorder
+  result, error = None, None
+  try:
+    if timeout:
+      thunk = util.TimeoutFunction(thunk, timeout)
+    result = thunk(recorder)
+  except util.TimeoutFunctionException:
+    if not timeout:
+      raise
+    error = ('Test case timed out after %d seconds' % timeout, '')
+  except Exception, inst:
+    error = (str(inst), traceback.format_exc())
+  finally:
+    sys.stdout = oldStdout
+  return recorder.events, result, error
+
+
+def replay(grades, events, result, error):
+  """
+  Applies what runRecorded captured to grades, then returns the test's
+  result or re-raises its exception, as if the test had run here.
+  """
+  for event in events:
+    if event[0] == 'output':
+      sys.stdout.write(event[1])
+    else:
+      getattr(grades, event[1])(*event[2])
+  if error != None:
+    raise RemoteTestException(*error)
+  return result
+
+
+class ResultCache:
+  """
+  Stores recorded test case runs on disk, keyed on a hash of everything the
+  result depends on: the student code, the .test and .solution files, the
+  project test classes and the framework files listed in dependencies.  A
+  test whose key is unchanged can be replayed instead of run again.  The
+  random generator's state is not part of the key: a recorded run notes
+  whether the test used the state it started from, and the caller replays
+  it only from that state (see autograder.makeReplay).
+
+  When a test names the agent it grades (the 'alg' or 'agentName' field),
+  only the part of the student module that agent can use is hashed: the
+  agent's class, and every class or function it mentions by name, directly
+  or through the classes and functions it reaches, plus all other module
+  level statements and what they mention.  Editing one agent thus only
+  invalidates that agent's tests.
+  """
+  def __init__(self, directory, studentSources, testClassesSource, dependencies=()):
+    self.directory = directory
+    self.studentSources = studentSources
+    common = hashlib.sha1(testClassesSource)
+    for path in dependencies:
+      with open(path) as f:
+        common.update(path + '\0' + f.read())
+    self.commonDigest = common.hexdigest()
+    self.hits = 0
+    self.misses = 0
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+
+  def getKey(self, testCase, solutionPath):
+    digest = hashlib.sha1(self.commonDigest)
+    agentName = testCase.testDict.get('alg', testCase.testDict.get('agentName'))
+    for moduleName in sorted(self.studentSources):
+      digest.update('\0' + moduleName + '\0' +
+                    agentSource(self.studentSources[moduleName], agentName, repr(sorted(testCase.testDict.items()))))
+    for path in [testCase.getPath(), solutionPath]:
+      digest.update('\0' + path + '\0')
+      if os.path.exists(path):
+        with open(path) as f:
+          digest.update(f.read())
+    return digest.hexdigest()
+
+  def get(self, key):
+    """
+    The run recorded for key, or None.  Callers count the runs they replay
+    and those they record in hits and misses.
+    """
+    path = os.path.join(self.directory, key)
+    if not os.path.exists(path):
+      return None
+    try:
+      with open(path, 'rb') as f:
+        return cPickle.load(f)
+    except Exception:
+      return None
+
+  def put(self, key, recorded):
+    "Stores a recorded result; written to a temporary file first so readers never see half of it"
+    path = os.path.join(self.directory, key)
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    with open(temporary, 'wb') as f:
+      cPickle.dump(recorded, f, cPickle.HIGHEST_PROTOCOL)
+    os.rename(temporary, path)
+
+
+def agentSource(source, agentName, context=''):
+  """
+  The parts of a module's source that agentName can depend on (see
+  ResultCache), or the whole source if agentName is not a class defined in
+  it.  Classes and functions named in context, such as an evaluation
+  function given in the test's agent arguments, are kept too.
+  """
+  if not agentName:
+    return source
+  try:
+    nodes = ast.parse(source).body
+  except SyntaxError:
+    return source
+  lines = source.split('\n')
+  # Each top level statement owns the lines up to the next one
+  segments = []
+  for i, node in enumerate(nodes):
+    end = nodes[i + 1].lineno - 1 if i + 1 < len(nodes) else len(lines)
+    name = node.name if isinstance(node, (ast.ClassDef, ast.FunctionDef)) else None
+    segments.append((name, '\n'.join(lines[node.lineno - 1:end])))
+  definitions = dict([(name, text) for name, text in segments if name != None])
+  if agentName not in [node.name for node in nodes if isinstance(node, ast.ClassDef)]:
+    return source
+
+  def mentioned(text):
+    return [other for other in definitions if other not in needed and re.search(r'\b%s\b' % re.escape(other), text)]
+  # Follow names from the agent, the context and every statement always kept
+  needed = set([agentName])
+  frontier = [agentName]
+  for text in [context] + [text for name, text in segments if name == None]:
+    for other in mentioned(text):
+      needed.add(other)
+      frontier.append(other)
+  while frontier:
+    for other in mentioned(definitions[frontier.pop()]):
+      needed.add(other)
+      frontier.append(other)
+  return '\n'.join([text for name, text in segments if name == None or name in needed])
 
 
 class Counter(dict):
@@ -13,15 +13,30 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Actions, Grid
+import hashlib
 import os
 import random
 
+try:
+    import numpy
+    _NUMPY_ENABLED = True
+except ImportError:
+    _NUMPY_ENABLED = False
+
 VISIBILITY_MATRIX_CACHE = {}
 
+# Shared layouts: content hash -> Layout, and layout file -> Layout
+LAYOUT_REGISTRY = {}
+LAYOUT_FILES = {}
+
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are never changed once parsed, so a single instance can be shared
+    by every game and state using the board (see registerLayout), and data
+    derived from the board is computed once and kept on it (see getDerived).
     """
 
     def __init__(self, layoutText):
@@ -35,31 +50,47 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
-        # self.initializeVisibilityMatrix()
+        self.contentHash = contentHash(layoutText)
+        self._derived = {}
 
     def getNumGhosts(self):
         return self.numGhosts
 
     def initializeVisibilityMatrix(self):
-        global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
-            from game import Directions
-            vecs = [(-0.5,0), (0.5,0),(0,-0.5),(0,0.5)]
-            dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH:set(), Directions.SOUTH:set(), Directions.EAST:set(), Directions.WEST:set(), Directions.STOP:set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if self.walls[x][y] == False:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)] :
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
+        "Sets self.visibility to the VisibilityMatrix of this layout, shared through VISIBILITY_MATRIX_CACHE"
+        if self.contentHash not in VISIBILITY_MATRIX_CACHE:
+            VISIBILITY_MATRIX_CACHE[self.contentHash] = VisibilityMatrix(self.walls)
+        self.visibility = VISIBILITY_MATRIX_CACHE[self.contentHash]
+
+    def getDerived(self, name, compute):
+        """
+        Returns compute(self), computed on the first call for this name and
+        kept on the layout afterwards.
+        """
+        derived = self.__dict__.setdefault('_derived', {})
+        if name not in derived:
+            derived[name] = compute(self)
+        return derived[name]
+
+    def getLegalActions(self, config):
+        """
+        Same as Actions.getPossibleActions(config, self.walls), from a table
+        of the actions possible on each cell.  Returns a new list.
+        """
+        x, y = config.pos
+        x_int, y_int = int(x + 0.5), int(y + 0.5)
+        # In between grid points, all agents must continue straight
+        if (abs(x - x_int) + abs(y - y_int) > Actions.TOLERANCE):
+            return [config.getDirection()]
+        possible = self.getDerived('legalActions', legalActionTable).get((x_int, y_int))
+        if possible == None:
+            return Actions.getPossibleActions(config, self.walls)
+        return possible[:]
+
+    def getDistancer(self):
+        "The distanceCalculator.Distancer for this layout's walls"
+        import distanceCalculator
+        return self.getDerived('distancer', distanceCalculator.getDistancer)
 
     def isWall(self, pos):
         x, col = pos
@@ -83,14 +114,23 @@ class Layout:
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
-        row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        if 'visibility' not in self.__dict__:
+            self.initializeVisibilityMatrix()
+        return self.visibility.isVisible(ghostPos, pacPos, pacDirection)
 
     def __str__(self):
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        "Layouts are immutable, so a copy is the layout itself"
+        return self
+
+    def __getstate__(self):
+        # Derived data is cheaper to recompute than to send to other processes
+        state = self.__dict__.copy()
+        state['_derived'] = {}
+        state.pop('visibility', None)
+        return state
 
     def processLayoutText(self, layoutText):
         """
@@ -128,22 +168,158 @@ class Layout:
         elif layoutChar in  ['1', '2', '3', '4']:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
-def getLayout(name, back = 2):
-    if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None: layout = tryToLoad(name)
-    else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None: layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back -1)
-        os.chdir(curdir)
+class VisibilityMatrix:
+    """
+    Line of sight on a board.  Looking in a direction from a cell, an agent
+    sees every position, whole or half way between cells, up to the first
+    wall; looking nowhere (Directions.STOP) it sees nothing.
+
+    For every direction the matrix holds the number of steps from each cell
+    to the first wall, so a visibility test is a few comparisons.
+    """
+    def __init__(self, walls):
+        from game import Directions
+        self.width = walls.width
+        self.height = walls.height
+        self.directions = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+        if _NUMPY_ENABLED:
+            steps = _wallStepsArray(walls)
+        else:
+            steps = _wallStepsLists(walls)
+        # steps[direction][x][y]: steps from (x, y) to the first wall that way
+        self.steps = dict(zip(self.directions, steps))
+
+    def isVisible(self, position, viewpoint, direction):
+        "Whether position is in sight from the cell viewpoint, looking in direction"
+        steps = self.steps.get(direction)
+        if steps == None: return False
+        x, y = [int(c) for c in viewpoint]
+        dx, dy = Actions._directions[direction]
+        px, py = position
+        if dx == 0:
+            if px != x: return False
+            distance = (py - y) * dy
+        else:
+            if py != y: return False
+            distance = (px - x) * dx
+        return 0 < distance < steps[x][y]
+
+    def getVisiblePositions(self, viewpoint, direction):
+        "The set of positions in sight from viewpoint, every half step up to the wall"
+        steps = self.steps.get(direction)
+        if steps == None: return set()
+        x, y = [int(c) for c in viewpoint]
+        dx, dy = Actions._directions[direction]
+        return set([(x + dx * 0.5 * k, y + dy * 0.5 * k) for k in range(1, 2 * steps[x][y])])
+
+def _wallStepsArray(walls):
+    """
+    Steps to the first wall north, south, east and west of every cell, as
+    four width x height nested lists, computed with running minima and
+    maxima of the wall coordinates along each row and column.
+    """
+    isWall = numpy.array(walls.data, dtype = bool)
+    width, height = isWall.shape
+    xs = numpy.arange(width)[:, None] + numpy.zeros((1, height), dtype = int)
+    ys = numpy.arange(height)[None, :] + numpy.zeros((width, 1), dtype = int)
+
+    def nextWall(coordinates, axis, size):
+        # Coordinate of the first wall strictly after each cell along axis
+        found = numpy.where(isWall, coordinates, size)
+        found = numpy.flip(numpy.minimum.accumulate(numpy.flip(found, axis), axis), axis)
+        after = numpy.full(found.shape, size)
+        if axis == 0: after[:-1] = found[1:]
+        else: after[:, :-1] = found[:, 1:]
+        return after
+
+    def previousWall(coordinates, axis):
+        # Coordinate of the last wall strictly before each cell along axis
+        found = numpy.maximum.accumulate(numpy.where(isWall, coordinates, -1), axis)
+        before = numpy.full(found.shape, -1)
+        if axis == 0: before[1:] = found[:-1]
+        else: before[:, 1:] = found[:, :-1]
+        return before
+
+    north = nextWall(ys, 1, height) - ys
+    south = ys - previousWall(ys, 1)
+    east = nextWall(xs, 0, width) - xs
+    west = xs - previousWall(xs, 0)
+    return [steps.tolist() for steps in (north, south, east, west)]
+
+def _wallStepsLists(walls):
+    "Same as _wallStepsArray, with a sweep of every row and column"
+    width, height = walls.width, walls.height
+    north = [[0] * height for x in range(width)]
+    south = [[0] * height for x in range(width)]
+    east = [[0] * height for x in range(width)]
+    west = [[0] * height for x in range(width)]
+    for x in range(width):
+        column = walls.data[x]
+        wall = height
+        for y in range(height - 1, -1, -1):
+            north[x][y] = wall - y
+            if column[y]: wall = y
+        wall = -1
+        for y in range(height):
+            south[x][y] = y - wall
+            if column[y]: wall = y
+    for y in range(height):
+        wall = width
+        for x in range(width - 1, -1, -1):
+            east[x][y] = wall - x
+            if walls.data[x][y]: wall = x
+        wall = -1
+        for x in range(width):
+            west[x][y] = x - wall
+            if walls.data[x][y]: wall = x
+    return [north, south, east, west]
+
+def legalActionTable(layout):
+    "Dictionary from every open cell of layout to the actions possible on it"
+    from game import Configuration, Directions
+    table = {}
+    walls = layout.walls
+    for x in range(1, layout.width - 1):
+        for y in range(1, layout.height - 1):
+            if not walls[x][y]:
+                table[(x, y)] = Actions.getPossibleActions(Configuration((x, y), Directions.STOP), walls)
+    return table
+
+def contentHash(layoutText):
+    "The SHA-1 digest identifying a layout by its text"
+    return hashlib.sha1('\n'.join(layoutText)).digest()
+
+def registerLayout(layoutText):
+    """
+    Returns the shared Layout for layoutText, parsing it only the first time
+    text with the same content is registered.
+    """
+    key = contentHash(layoutText)
+    layout = LAYOUT_REGISTRY.get(key)
+    if layout == None:
+        layout = LAYOUT_REGISTRY.setdefault(key, Layout(layoutText))
     return layout
 
+def getLayout(name, back = 2):
+    """
+    Returns the shared Layout of a layout file, looking for name, with or
+    without its .lay extension, in layouts/ and in the current directory,
+    then in up to back + 1 of their parents.  Returns None if there is none.
+    """
+    fileName = name if name.endswith('.lay') else name + '.lay'
+    directory = ''
+    for level in range(back + 2):
+        for path in [os.path.join(directory, 'layouts', fileName), os.path.join(directory, fileName)]:
+            layout = tryToLoad(path)
+            if layout != None: return layout
+        directory = os.path.join(directory, os.pardir)
+    return None
+
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
-    f = open(fullname)
-    try: return Layout([line.strip() for line in f])
-    finally: f.close()
+    fullname = os.path.abspath(fullname)
+    if fullname not in LAYOUT_FILES:
+        f = open(fullname)
+        try: LAYOUT_FILES[fullname] = registerLayout([line.strip() for line in f])
+        finally: f.close()
+    return LAYOUT_FILES[fullname]
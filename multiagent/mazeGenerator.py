@@ -0,0 +1,140 @@
+# mazeGenerator.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Generates Pacman mazes of any size, for testing how the engine and the
+agents scale beyond the hand-made boards in layouts/.
+
+A maze starts as a perfect maze (one path between any two cells) carved by
+a randomized depth-first search, then walls are knocked out at random until
+the requested wall density is reached; removing walls adds loops but never
+disconnects anything, so every open cell stays reachable.  Pacman, ghosts,
+capsules and food are then scattered over the open cells.  The same seed
+always gives the same maze.
+
+    python mazeGenerator.py --width 80 --height 41 --ghosts 4 --seed 1 -o layouts/big.lay
+    python pacman.py -l big -p ExpectimaxAgent
+"""
+
+import optparse
+import random
+
+import layout
+
+def generateMaze(width, height, wallDensity = 0.3, foodDensity = 0.5, numCapsules = 4, numGhosts = 2, seed = None):
+    """
+    Returns the rows of a width x height layout, in the text format read by
+    layout.Layout.  wallDensity is the fraction of the inside of the maze
+    that is wall; it cannot exceed that of a perfect maze (about one half).
+    foodDensity is the fraction of the remaining open cells holding food.
+    """
+    if width < 5 or height < 5:
+        raise ValueError('Mazes must be at least 5x5, not %dx%d' % (width, height))
+    rng = random.Random(seed)
+    cells = [['%'] * width for y in range(height)]
+
+    # Carve a perfect maze through the cells with odd coordinates
+    start = (1, 1)
+    cells[1][1] = ' '
+    stack = [start]
+    while stack:
+        x, y = stack[-1]
+        neighbors = [(x + dx, y + dy) for dx, dy in [(2, 0), (-2, 0), (0, 2), (0, -2)]
+                     if 0 < x + dx < width - 1 and 0 < y + dy < height - 1 and cells[y + dy][x + dx] == '%']
+        if not neighbors:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(neighbors)
+        cells[(y + ny) / 2][(x + nx) / 2] = ' '
+        cells[ny][nx] = ' '
+        stack.append((nx, ny))
+
+    # Open it up to the requested wall density.  Only walls next to an open
+    # cell are removed, so no unreachable pocket is ever opened
+    inside = [(x, y) for y in range(1, height - 1) for x in range(1, width - 1)]
+    walls = [(x, y) for x, y in inside if cells[y][x] == '%']
+    excess = len(walls) - int(wallDensity * len(inside))
+    while excess > 0 and walls:
+        rng.shuffle(walls)
+        remaining = []
+        for x, y in walls:
+            if excess > 0 and ' ' in (cells[y][x - 1], cells[y][x + 1], cells[y - 1][x], cells[y + 1][x]):
+                cells[y][x] = ' '
+                excess -= 1
+            else:
+                remaining.append((x, y))
+        walls = remaining
+
+    # Scatter the pieces: Pacman, then ghosts, capsules and food
+    free = [(x, y) for x, y in inside if cells[y][x] == ' ']
+    if len(free) < 2 + numGhosts + numCapsules:
+        raise ValueError('A %dx%d maze with wall density %s has no room for %d ghosts and %d capsules'
+                         % (width, height, wallDensity, numGhosts, numCapsules))
+    rng.shuffle(free)
+    pacman = free.pop()
+    cells[pacman[1]][pacman[0]] = 'P'
+    # Ghosts start in the half of the maze furthest from Pacman
+    free.sort(key = lambda p: abs(p[0] - pacman[0]) + abs(p[1] - pacman[1]))
+    far = free[len(free) / 2:]
+    rng.shuffle(far)
+    for x, y in far[:numGhosts]:
+        cells[y][x] = 'G'
+    free = [(x, y) for x, y in free if cells[y][x] == ' ']
+    rng.shuffle(free)
+    for x, y in free[:numCapsules]:
+        cells[y][x] = 'o'
+    free = free[numCapsules:]
+    numFood = max(1, int(foodDensity * len(free)))
+    for x, y in free[:numFood]:
+        cells[y][x] = '.'
+    return [''.join(row) for row in cells]
+
+def generateLayout(width, height, **options):
+    "A layout.Layout for generateMaze(width, height, **options)"
+    return layout.Layout(generateMaze(width, height, **options))
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Generate a random Pacman maze')
+    parser.add_option('--width', type = 'int', default = 40,
+                      help = 'Width of the maze, walls included (default %default)')
+    parser.add_option('--height', type = 'int', default = 21,
+                      help = 'Height of the maze, walls included (default %default)')
+    parser.add_option('--wall-density', dest = 'wallDensity', type = 'float', default = 0.3,
+                      help = 'Fraction of the inside that is wall, at most about 0.5 (default %default)')
+    parser.add_option('--food-density', dest = 'foodDensity', type = 'float', default = 0.5,
+                      help = 'Fraction of the open cells with food (default %default)')
+    parser.add_option('--capsules', dest = 'numCapsules', type = 'int', default = 4,
+                      help = 'Number of capsules (default %default)')
+    parser.add_option('--ghosts', dest = 'numGhosts', type = 'int', default = 2,
+                      help = 'Number of ghosts (default %default)')
+    parser.add_option('--seed', type = 'int', default = None,
+                      help = 'Random seed; the same seed gives the same maze')
+    parser.add_option('--output', '-o', dest = 'output', default = None,
+                      help = 'Write the maze to this .lay file instead of printing it')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    import sys
+    options = readCommand(sys.argv[1:])
+    rows = generateMaze(options.width, options.height, options.wallDensity, options.foodDensity,
+                        options.numCapsules, options.numGhosts, options.seed)
+    if options.output == None:
+        print '\n'.join(rows)
+    else:
+        f = open(options.output, 'w')
+        try: f.write('\n'.join(rows) + '\n')
+        finally: f.close()
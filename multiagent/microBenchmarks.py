@@ -0,0 +1,268 @@
+# microBenchmarks.py
+# ------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Times the hot paths of the engine: successor generation, legal actions,
+state hashing and comparison, Grid and Counter operations (with their
+ArrayCounter counterparts when NumPy is installed), the evaluation
+functions, ghost moves and whole games.
+
+Every benchmark runs on the same fixed positions, one per shipped layout:
+the position reached after a seeded random walk of a few moves.  Results
+are printed in operations per second and can be saved as JSON; a later run
+compared against saved results flags every benchmark that got slower by
+more than the threshold, and exits with status 1 if any did.
+
+    python microBenchmarks.py --output before.json
+    ... change the engine ...
+    python microBenchmarks.py --compare before.json --threshold 0.1
+"""
+
+import json
+import optparse
+import os
+import platform
+import random
+import re
+import sys
+import time
+
+import ghostAgents
+import layout
+import multiAgents
+import pacman
+import pacmanAgents
+import textDisplay
+import util
+from pacman import GameState
+
+WALK_LENGTH = 10 # Moves of the random walk leading to each fixed position
+LAYOUT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts')
+
+def fixedPositions(seed = 0):
+    """
+    Returns a list of (layout name, GameState), one position per layout in
+    LAYOUT_DIRECTORY: the state after WALK_LENGTH random moves of every agent
+    from the start, or the last one before a move that would end the game.
+    """
+    positions = []
+    names = sorted([f[:-4] for f in os.listdir(LAYOUT_DIRECTORY) if f.endswith('.lay')])
+    for name in names:
+        rng = random.Random('%s-%s' % (seed, name))
+        state = GameState()
+        state.initialize(layout.getLayout(os.path.join(LAYOUT_DIRECTORY, name + '.lay')), 2)
+        gameOver = False
+        for move in range(WALK_LENGTH):
+            for agentIndex in range(state.getNumAgents()):
+                actions = state.getLegalActions(agentIndex)
+                successor = state.generateSuccessor(agentIndex, rng.choice(actions))
+                gameOver = successor.isWin() or successor.isLose()
+                if gameOver: break
+                state = successor
+            if gameOver: break
+        positions.append((name, state))
+    return positions
+
+##############
+# Benchmarks #
+##############
+
+# Each benchmark is (name, setup): setup takes a fixed position and returns
+# a function of no arguments performing one operation on it.
+
+def foodCounter(state):
+    "A Counter with an entry per food dot, as agents often build"
+    counter = util.Counter()
+    for x, y in state.getFood().asList():
+        counter[(x, y)] = x + y
+    return counter
+
+def gameSetup(state):
+    "One whole, capped game of GreedyAgent against random ghosts on the position's layout"
+    lay = state.data.layout
+    def playGame():
+        random.seed(0)
+        ghosts = [ghostAgents.RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+        rules = pacman.CappedGameRules(1000)
+        game = rules.newGame(lay, pacmanAgents.GreedyAgent(), ghosts, textDisplay.NullGraphics(), quiet = True)
+        game.run()
+    return playGame
+
+def successorSetup(state):
+    action = state.getLegalActions(0)[0]
+    return lambda: state.generateSuccessor(0, action)
+
+def equalitySetup(state):
+    other = state.deepCopy().data
+    return lambda: state.data == other
+
+def reflexSetup(state):
+    agent = multiAgents.ReflexAgent(evalCache = '0')
+    action = state.getLegalActions(0)[0]
+    return lambda: agent.evaluationFunction(state, action)
+
+def ghostSetup(ghostType):
+    def setup(state):
+        ghost = ghostType(1)
+        return lambda: ghost.getAction(state)
+    return setup
+
+def counterSetup(operation):
+    def setup(state):
+        counter = foodCounter(state)
+        return lambda: operation(counter)
+    return setup
+
+def arrayCounterSetup(operation):
+    "As counterSetup, on the same counter as a util.ArrayCounter"
+    def setup(state):
+        counter = util.ArrayCounter.fromCounter(foodCounter(state))
+        return lambda: operation(counter)
+    return setup
+
+BENCHMARKS = [
+    ('GameState.generateSuccessor', successorSetup),
+    ('GameState.getLegalActions', lambda state: lambda: state.getLegalActions(0)),
+    ('GameStateData.__hash__', lambda state: lambda: hash(state.data)),
+    ('GameStateData.__eq__', equalitySetup),
+    ('Grid.copy', lambda state: state.getFood().copy),
+    ('Grid.count', lambda state: state.getFood().count),
+    ('Grid.asList', lambda state: state.getFood().asList),
+    ('Counter.copy', counterSetup(lambda c: c.copy())),
+    ('Counter.__add__', counterSetup(lambda c: c + c)),
+    ('Counter.__mul__', counterSetup(lambda c: c * c)),
+    ('Counter.argMax', counterSetup(lambda c: c.argMax())),
+    ('Counter.totalCount', counterSetup(lambda c: c.totalCount())),
+    ('util.normalize', counterSetup(util.normalize)),
+    ('scoreEvaluationFunction', lambda state: lambda: multiAgents.scoreEvaluationFunction(state)),
+    ('betterEvaluationFunction', lambda state: lambda: multiAgents.betterEvaluationFunction(state)),
+    ('ReflexAgent.evaluationFunction', reflexSetup),
+    ('RandomGhost.getAction', ghostSetup(ghostAgents.RandomGhost)),
+    ('DirectionalGhost.getAction', ghostSetup(ghostAgents.DirectionalGhost)),
+    ('Game.run', gameSetup),
+]
+
+if util._NUMPY_ENABLED:
+    BENCHMARKS += [
+        ('ArrayCounter.copy', arrayCounterSetup(lambda c: c.copy())),
+        ('ArrayCounter.__add__', arrayCounterSetup(lambda c: c + c)),
+        ('ArrayCounter.__mul__', arrayCounterSetup(lambda c: c * c)),
+        ('ArrayCounter.argMax', arrayCounterSetup(lambda c: c.argMax())),
+        ('ArrayCounter.totalCount', arrayCounterSetup(lambda c: c.totalCount())),
+        ('ArrayCounter.normalize', arrayCounterSetup(lambda c: c.copy().normalize())),
+    ]
+
+##########
+# Timing #
+##########
+
+def timeOperations(operations, minTime, repeats):
+    """
+    Returns the operations per second of a list of operations, each run the
+    same number of times.  The number of rounds is doubled until a round
+    takes at least minTime, then the best of repeats timings is kept, the
+    one least disturbed by the rest of the machine.
+    """
+    rounds = 1
+    while True:
+        elapsed = timeRounds(operations, rounds)
+        if elapsed >= minTime: break
+        rounds *= 2
+    best = min([elapsed] + [timeRounds(operations, rounds) for i in range(repeats - 1)])
+    return rounds * len(operations) / best
+
+def timeRounds(operations, rounds):
+    start = time.time()
+    for i in xrange(rounds):
+        for operation in operations:
+            operation()
+    return time.time() - start
+
+def runBenchmarks(positions, pattern = None, minTime = 0.2, repeats = 3):
+    "Returns a dictionary of benchmark name to operations per second"
+    results = {}
+    for name, setup in BENCHMARKS:
+        if pattern != None and not re.search(pattern, name): continue
+        operations = [setup(state) for layoutName, state in positions]
+        results[name] = timeOperations(operations, minTime, repeats)
+        print '%-32s %14.1f ops/s' % (name, results[name])
+        sys.stdout.flush()
+    return results
+
+def compareResults(results, baseline, threshold):
+    """
+    Prints each benchmark's change from the baseline and returns the names
+    of those that slowed down by more than the threshold fraction.
+    """
+    regressions = []
+    print
+    print '%-32s %14s %14s %9s' % ('Benchmark', 'Baseline', 'Now', 'Change')
+    for name in sorted(results):
+        if name not in baseline: continue
+        change = results[name] / baseline[name] - 1
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print '%-32s %14.1f %14.1f %+8.1f%%%s' % (name, baseline[name], results[name], 100 * change, flag)
+    return regressions
+
+def saveResults(results, fileName):
+    report = {'benchmarks': results,
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+    f = open(fileName, 'w')
+    try: json.dump(report, f, indent = 2, sort_keys = True)
+    finally: f.close()
+
+def loadResults(fileName):
+    f = open(fileName)
+    try: return json.load(f)['benchmarks']
+    finally: f.close()
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Time the hot paths of the Pacman engine')
+    parser.add_option('--filter', '-k', dest = 'pattern', default = None,
+                      help = 'Only run benchmarks whose name matches this regular expression')
+    parser.add_option('--min-time', dest = 'minTime', type = 'float', default = 0.2,
+                      help = 'Seconds each timing should last at least (default %default)')
+    parser.add_option('--repeats', type = 'int', default = 3,
+                      help = 'Timings per benchmark, of which the best is kept (default %default)')
+    parser.add_option('--seed', type = 'int', default = 0,
+                      help = 'Seed of the random walks leading to the fixed positions (default %default)')
+    parser.add_option('--output', '-o', dest = 'output', default = None,
+                      help = 'Save the results to this JSON file')
+    parser.add_option('--compare', '-c', dest = 'compare', default = None,
+                      help = 'Compare the results with those saved in this JSON file')
+    parser.add_option('--threshold', type = 'float', default = 0.1,
+                      help = 'Slowdown, as a fraction, flagged as a regression (default %default)')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    positions = fixedPositions(options.seed)
+    print 'Fixed positions from %d layouts: %s' % (len(positions), ', '.join([name for name, state in positions]))
+    results = runBenchmarks(positions, options.pattern, options.minTime, options.repeats)
+    if options.output != None:
+        saveResults(results, options.output)
+    if options.compare != None:
+        regressions = compareResults(results, loadResults(options.compare), options.threshold)
+        if regressions:
+            print '\n%d benchmark(s) slower than the baseline by more than %d%%: %s' % \
+                (len(regressions), 100 * options.threshold, ', '.join(regressions))
+            sys.exit(1)
@@ -15,13 +15,58 @@
 from util import manhattanDistance
 from game import Directions
 import random, util, sys
+import featureExtractors
+import ghostAgents
 
 from game import Agent
+from pacman import SuccessorCache
 
 # To simulate infinity and negative infinity
 INF = sys.maxint
 NEGATIVE_INF = -sys.maxint - 1
 
+# Weights of the features combined by genericEvaluationFunction
+# To improve the coefficients we could have used some machine learning algorithms (genetic programming, svm, etc.)
+REFLEX_COEFFICIENTS = {
+    'COEF_gameScore': 1,
+    'COEF_distClosestFood': -2,
+    'COEF_distClosestUnscaredGhost': 1.5,
+    'COEF_distClosestScaredGhost': 2000,
+    'COEF_foodLeft': -20,
+    'COEF_capsulesLeft': -50,
+}
+
+BETTER_COEFFICIENTS = {
+    'COEF_gameScore': 1,
+    'COEF_distClosestFood': -2,
+    'COEF_distClosestUnscaredGhost': 1.5,
+    'COEF_distClosestScaredGhost': 2000,
+    'COEF_foodLeft': -20,
+    'COEF_capsulesLeft': -30,
+}
+
+def getStateKey(gameState):
+    """
+    Exact cache key for a state.  Game states provide one; other state types
+    (e.g. the autograder's tree states) are used as their own key.
+    """
+    if hasattr(gameState, 'getStateKey'):
+        return gameState.getStateKey()
+    return gameState
+
+def memoizeEvaluationFunction(evaluationFunction, cacheSize):
+    """
+    Wraps a state evaluation function in an LRU cache of cacheSize entries
+    keyed on the exact state, so leaves reached again (later in the same
+    move or on the next one) are not evaluated twice.  The wrapper keeps the
+    function's batch version, if it has one.  A cacheSize of 0 returns the
+    function unchanged.
+    """
+    cacheSize = int(cacheSize)
+    if cacheSize <= 0:
+        return evaluationFunction
+    return util.MemoizedFunction(evaluationFunction, cacheSize, getStateKey)
+
 def minimumSpanningTree(gameState):
     """
     Return the minimum spanning tree
@@ -29,38 +74,35 @@ def minimumSpanningTree(gameState):
     Edges values are manhattanDistance between vertex
     """
     pos = gameState.getPacmanPosition()
-    food = gameState.getFood()
-
+    foodList = gameState.getFood().asList()
 
     # Initialize Prim algorithm
-    pqueue = util.PriorityQueue()
-    G = set()
+    # The indexed queue lowers a vertex's priority in place instead of queueing it again
+    pqueue = util.IndexedPriorityQueue()
+    inTree = set()
     cost = {}
     pred = {}
 
     cost[pos] = 0
-    G.add(pos)
-
-    for x in range(food.width):
-        for y in range(food.height):
-            if (food[x][y]):
-                posFood = (x,y)
-                G.add(posFood)
-                cost[posFood] = INF # Infinity value
-                pred[posFood] = None
+    pqueue.push(pos, 0)
 
-    for v in G:
-        pqueue.push(v, cost[v])
+    for posFood in foodList:
+        cost[posFood] = INF # Infinity value
+        pred[posFood] = None
+        pqueue.push(posFood, INF)
 
     # Main loop Prim
     while (not pqueue.isEmpty()):
         t = pqueue.pop()
-        for u in G:
+        inTree.add(t)
+        for u in foodList:
+            if u in inTree:
+                continue
             w = util.manhattanDistance(u, t)
-            if (u != t) and (cost[u] > w):
+            if (cost[u] > w):
                 pred[u] = t
                 cost[u] = w
-                pqueue.push(u, cost[u]) # Update the priority queue with the new value
+                pqueue.decreaseKey(u, w)
 
     return pred
 
@@ -74,6 +116,199 @@ def getValueMST(pred, gameState):
     return totalWeight
 
 
+class FoodMST:
+    """
+    A minimum spanning tree over the food positions, stored as an adjacency
+    map so that the tree of a state with one pellet less can be derived from
+    it: removing a vertex only splits the tree into as many components as
+    the vertex had neighbours, and only those components are reconnected.
+
+    distance is any symmetric function of two positions, e.g.
+    util.manhattanDistance or a Distancer's getDistance for maze distances.
+    Instances are never modified once built, so they can be shared between
+    states.
+    """
+    def __init__(self, foodList, distance = util.manhattanDistance):
+        self.distance = distance
+        self.adjacency = dict([(food, {}) for food in foodList])
+        self.weight = 0
+
+        # Prim algorithm over the food only
+        pqueue = util.IndexedPriorityQueue()
+        cost = {}
+        pred = {}
+        for food in foodList:
+            cost[food] = INF
+            pqueue.push(food, INF)
+        while (not pqueue.isEmpty()):
+            t = pqueue.pop()
+            if t in pred:
+                self._addEdge(self.adjacency, t, pred[t], cost[t])
+                self.weight += cost[t]
+            for u in pqueue.position:
+                w = distance(u, t)
+                if (cost[u] > w):
+                    pred[u] = t
+                    cost[u] = w
+                    pqueue.decreaseKey(u, w)
+
+    def getVertices(self):
+        return self.adjacency.keys()
+
+    def getWeight(self):
+        "Weight of the tree over the food alone"
+        return self.weight
+
+    def getWeightWithRoot(self, pos):
+        """
+        Weight of the minimum spanning tree over the food and pos, i.e. the
+        value of getValueMST(minimumSpanningTree(state)) for a state where
+        Pacman is at pos.  The new tree only uses edges of this tree or edges
+        from pos, so Kruskal only has to look at 2V edges.
+        """
+        if len(self.adjacency) == 0:
+            return 0
+        edges = [(self.distance(pos, food), pos, food) for food in self.adjacency]
+        for u, neighbors in self.adjacency.items():
+            for v, w in neighbors.items():
+                if u < v:
+                    edges.append((w, u, v))
+        edges.sort()
+
+        parent = {}
+        def find(x):
+            root = x
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while x != root:
+                x, parent[x] = parent.get(x, x), root
+            return root
+
+        totalWeight = 0
+        joined = 0
+        for w, u, v in edges:
+            ru, rv = find(u), find(v)
+            if ru != rv:
+                parent[ru] = rv
+                totalWeight += w
+                joined += 1
+                if joined == len(self.adjacency):
+                    break
+        return totalWeight
+
+    def withoutVertex(self, vertex):
+        """
+        Returns the FoodMST of the same food minus vertex.  Edges of this tree
+        are reused; the components left by the removal are joined with the
+        shortest edges between them.
+        """
+        neighbors = self.adjacency[vertex]
+        child = FoodMST([], self.distance)
+        # Neighbour maps are shared with this tree until the child changes them
+        child.adjacency = dict(self.adjacency)
+        del child.adjacency[vertex]
+        child.weight = self.weight - sum(neighbors.values())
+        for u in neighbors:
+            child.adjacency[u] = dict(child.adjacency[u])
+            del child.adjacency[u][vertex]
+        if len(neighbors) <= 1:
+            return child
+
+        # Label the components hanging off each former neighbour
+        components = []
+        for start in neighbors:
+            component = [start]
+            seen = set(component)
+            for u in component:
+                for v in child.adjacency[u]:
+                    if v not in seen:
+                        seen.add(v)
+                        component.append(v)
+            components.append(component)
+
+        # Shortest edge between every pair of components
+        candidates = []
+        for i in range(len(components)):
+            for j in range(i + 1, len(components)):
+                best = None
+                for u in components[i]:
+                    for v in components[j]:
+                        w = self.distance(u, v)
+                        if best == None or w < best[0]:
+                            best = (w, u, v)
+                candidates.append((best, i, j))
+        candidates.sort()
+
+        # Kruskal over the components
+        label = range(len(components))
+        for (w, u, v), i, j in candidates:
+            if label[i] == label[j]:
+                continue
+            old = label[j]
+            label = [label[i] if l == old else l for l in label]
+            for endpoint in (u, v):
+                if child.adjacency[endpoint] is self.adjacency.get(endpoint):
+                    child.adjacency[endpoint] = dict(child.adjacency[endpoint])
+            self._addEdge(child.adjacency, u, v, w)
+            child.weight += w
+        return child
+
+    def _addEdge(self, adjacency, u, v, w):
+        adjacency[u][v] = w
+        adjacency[v][u] = w
+
+
+def getFoodMST(gameState, distance = util.manhattanDistance):
+    """
+    Returns the FoodMST for the food left in gameState and attaches it to the
+    state, from where its successors inherit it.  If the state (or one of its
+    ancestors) already carries a tree, it is updated by removing the pellets
+    eaten since, instead of being rebuilt.
+    """
+    food = gameState.getFood()
+    foodMST = gameState.data.foodMST
+    if foodMST == None or foodMST.distance != distance or len(foodMST.adjacency) < food.count():
+        foodMST = FoodMST(food.asList(), distance)
+    else:
+        for vertex in foodMST.getVertices():
+            if not food[vertex[0]][vertex[1]]:
+                foodMST = foodMST.withoutVertex(vertex)
+        if len(foodMST.adjacency) != food.count():
+            # Food appeared that the tree doesn't cover
+            foodMST = FoodMST(food.asList(), distance)
+    gameState.data.foodMST = foodMST
+    return foodMST
+
+def getIncrementalValueMST(gameState, distance = util.manhattanDistance):
+    """
+    Same value as getValueMST(minimumSpanningTree(gameState), gameState), but
+    derived from the tree attached to the state or its ancestors.
+    """
+    return getFoodMST(gameState, distance).getWeightWithRoot(gameState.getPacmanPosition())
+
+# MST weights already computed, keyed on the food left and Pacman's cell
+MST_CACHE = util.LRUCache(50000)
+
+def getCachedValueMST(gameState):
+    """
+    Weight of the minimum spanning tree over the food and Pacman's cell,
+    computed at most once for each combination of remaining food and Pacman
+    position, and then from the tree the state inherited (see
+    getIncrementalValueMST) rather than by a new Prim's run.
+    """
+    food = gameState.getFood()
+    key = (food.height, food.asBitmask(), gameState.getPacmanPosition())
+    weight = MST_CACHE.get(key)
+    if weight == None:
+        weight = getIncrementalValueMST(gameState)
+        MST_CACHE.put(key, weight)
+    return weight
+
+def getMazeDistanceFunction(gameState):
+    "Maze distance on the layout of gameState, to pass as distance above"
+    return gameState.data.layout.getDistancer().getDistance
+
+
 def getDistClosestFood(gameState):
     pos = gameState.getPacmanPosition()
     food = gameState.getFood()
@@ -95,21 +330,21 @@ def getDistClosestGhost(gameState):
     ghostStates = gameState.getGhostStates()
 
     distClosestUnscaredGhost = INF
-    distClosestScaredGhost = NEGATIVE_INF
+    distClosestScaredGhost = INF
 
     for ghost in ghostStates:
         distToGhost = util.manhattanDistance(pos, ghost.getPosition())
 
-        if (ghost.scaredTimer > distToGhost) and (distToGhost < distClosestScaredGhost):
+        if ghost.scaredTimer > distToGhost:
             # We are in range, try to beat him !
-            distClosestScaredGhost = distToGhost
+            distClosestScaredGhost = min(distClosestScaredGhost, distToGhost)
         elif (distToGhost < distClosestUnscaredGhost):
             # Runaway
             distClosestUnscaredGhost = distToGhost
 
     # Because we don't want to consider those parameters if they are not representative
-    distClosestUnscaredGhost = max(0, distClosestUnscaredGhost)
-    distClosestScaredGhost = max(0, distClosestScaredGhost)
+    if distClosestUnscaredGhost == INF: distClosestUnscaredGhost = 0
+    if distClosestScaredGhost == INF: distClosestScaredGhost = 0
 
     return (distClosestUnscaredGhost, distClosestScaredGhost)
 
@@ -124,6 +359,12 @@ class ReflexAgent(Agent):
       headers.
     """
 
+    def __init__(self, evalCache = '1'):
+        Agent.__init__(self)
+        # The current state is scored once per legal action: cache it
+        self.currentEvaluation = memoizeEvaluationFunction(
+            lambda state: genericEvaluationFunction(state, REFLEX_COEFFICIENTS), evalCache)
+
     def getAction(self, gameState):
         """
         You do not need to change this method, but you're welcome to.
@@ -173,18 +414,9 @@ class ReflexAgent(Agent):
         if (action == 'Stop'):
             return NEGATIVE_INF
 
-        # To improve the coefficients we could have used some machine learning algorithms (genetic programming, svm, etc.)
-        coefficients = {}
-        coefficients['COEF_gameScore'] = 1
-        coefficients['COEF_distClosestFood'] = -2
-        coefficients['COEF_distClosestUnscaredGhost'] = 1.5
-        coefficients['COEF_distClosestScaredGhost'] = 2000
-        coefficients['COEF_foodLeft'] = -20
-        coefficients['COEF_capsulesLeft'] = -50
-
         # betterEvaluationFunction is evaluationFunction with some features improved
         # So we prefer to call it directly to improve readability and code factorisation
-        return genericEvaluationFunction(successorGameState, coefficients) - genericEvaluationFunction(currentGameState, coefficients)
+        return genericEvaluationFunction(successorGameState, REFLEX_COEFFICIENTS) - self.currentEvaluation(currentGameState)
 
 
 def scoreEvaluationFunction(currentGameState):
@@ -198,6 +430,9 @@ def scoreEvaluationFunction(currentGameState):
     return currentGameState.getScore()
 
 
+# How many successors the search agents expand between looks at the move deadline
+DEADLINE_POLL_INTERVAL = 64
+
 class MultiAgentSearchAgent(Agent):
     """
       This class provides some common elements to all of your
@@ -213,10 +448,63 @@ class MultiAgentSearchAgent(Agent):
       is another abstract class.
     """
 
-    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2'): #scoreEvaluationFunction
+    def __init__(self, evalFn = 'scoreEvaluationFunction', depth = '2', evalCache = '0', batchEval = 'False', coefficients = None,
+                 successorCache = '0'): #scoreEvaluationFunction
         self.index = 0 # Pacman is always agent index 0
-        self.evaluationFunction = util.lookup(evalFn, globals())
+        if coefficients != None:
+            # coefficients=FILE replaces evalFn by genericEvaluationFunction with the weights
+            # stored in FILE (a JSON dictionary, as written by coefficientTuner.py)
+            evaluationFunction = makeLinearEvaluationFunction(loadCoefficients(coefficients))
+        else:
+            evaluationFunction = util.lookup(evalFn, globals())
+        # evalCache=N memoizes the evaluation of up to N leaves across moves
+        self.evaluationFunction = memoizeEvaluationFunction(evaluationFunction, evalCache)
         self.depth = int(depth)
+        # batchEval=True scores sibling leaves together when the evaluation function has a batch version
+        self.batchEval = batchEval == True or batchEval == 'True'
+        # successorCache=N reuses the N successors built most recently, on this move or earlier ones (see pacman.SuccessorCache)
+        self.successorCache = None
+        if int(successorCache) > 0:
+            self.successorCache = SuccessorCache(int(successorCache))
+            self.getAction = self.successorCache.wrap(self.getAction)
+        self.expansions = 0
+
+    def successor(self, gameState, agentIndex, action):
+        """
+        gameState.generateSuccessor(agentIndex, action), through the successor
+        cache if there is one.  Every DEADLINE_POLL_INTERVAL calls it checks the
+        move deadline, so a search that runs out of time stops with
+        util.DeadlineExceeded instead of running on.
+        """
+        self.expansions += 1
+        if self.expansions % DEADLINE_POLL_INTERVAL == 0:
+            self.checkDeadline()
+        if self.successorCache == None:
+            return gameState.generateSuccessor(agentIndex, action)
+        return self.successorCache.successor(gameState, agentIndex, action)
+
+    def checkDeadline(self):
+        "Raises util.DeadlineExceeded if the game's deadline for this move has passed"
+        deadline = util.getMoveDeadline()
+        if deadline != None:
+            deadline.check()
+
+    def evaluateLeaves(self, gameStates):
+        """
+        Evaluates a list of leaf states, in one call to the batch version of the
+        evaluation function (see featureExtractors.py) when batchEval is on.
+        With evalCache on, the batch holds only the leaves not in the cache.
+        """
+        batch = getattr(self.evaluationFunction, 'batch', None)
+        if self.batchEval and batch != None:
+            return list(batch(gameStates))
+        return [self.evaluationFunction(gameState) for gameState in gameStates]
+
+    def final(self, state):
+        if isinstance(self.evaluationFunction, util.MemoizedFunction):
+            print 'Evaluation cache:', self.evaluationFunction.cache
+        if self.successorCache != None:
+            print 'Successor cache:', self.successorCache
 
 
 class MinimaxAgent(MultiAgentSearchAgent):
@@ -266,7 +554,7 @@ class MinimaxAgent(MultiAgentSearchAgent):
         maxAction = None
 
         for action in legal:
-            successor = gameState.generateSuccessor(agentIndex, action)
+            successor = self.successor(gameState, agentIndex, action)
             (score, oldAction) = self.DFSMiniMax(successor, 1, currentDepth)
 
             if score > maxScore:
@@ -283,11 +571,21 @@ class MinimaxAgent(MultiAgentSearchAgent):
         minScore = INF
         minAction = None
 
-        for action in legal:
-            successor = gameState.generateSuccessor(agentIndex, action)
-            nextDepth = (currentDepth + 1) if (agentIndex == self.numGhosts) else currentDepth
-            nextAgent = (agentIndex + 1) % (self.numGhosts + 1)
-            (score, oldAction) = self.DFSMiniMax(successor, nextAgent, nextDepth)
+        nextDepth = (currentDepth + 1) if (agentIndex == self.numGhosts) else currentDepth
+        nextAgent = (agentIndex + 1) % (self.numGhosts + 1)
+        if self.batchEval and nextDepth > self.depth:
+            # Every successor is a leaf: evaluate them together
+            successors = [self.successor(gameState, agentIndex, action) for action in legal]
+            scores = self.evaluateLeaves(successors)
+        else:
+            scores = None
+
+        for i, action in enumerate(legal):
+            if scores != None:
+                score = scores[i]
+            else:
+                successor = self.successor(gameState, agentIndex, action)
+                (score, oldAction) = self.DFSMiniMax(successor, nextAgent, nextDepth)
 
             if score < minScore:
                 minScore = score
@@ -330,7 +628,7 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
         maxAction = None
 
         for action in legal:
-            successor = gameState.generateSuccessor(agentIndex, action)
+            successor = self.successor(gameState, agentIndex, action)
             (score, oldAction) = self.alphaBetaPruning(successor, 1, currentDepth, alpha, beta)
 
             # Beta cut
@@ -354,7 +652,7 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
         minAction = None
 
         for action in legal:
-            successor = gameState.generateSuccessor(agentIndex, action)
+            successor = self.successor(gameState, agentIndex, action)
             nextDepth = (currentDepth + 1) if (agentIndex == self.numGhosts) else currentDepth
             nextAgent = (agentIndex + 1) % (self.numGhosts + 1)
             (score, oldAction) = self.alphaBetaPruning(successor, nextAgent, nextDepth, alpha, beta)
@@ -375,8 +673,19 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
 class ExpectimaxAgent(MultiAgentSearchAgent):
     """
       Your expectimax agent (question 4)
+
+      With ghostModel=TYPE (a ghost agent in ghostAgents.py, e.g.
+      DirectionalGhost), the ghosts are instead modeled as agents of that
+      type: all of them move in one chance node, whose value is the expected
+      value of their joint successors (see ghostAgents.getJointSuccessors).
     """
 
+    def __init__(self, ghostModel = None, **args):
+        MultiAgentSearchAgent.__init__(self, **args)
+        self.ghostModel = None
+        if ghostModel != None:
+            self.ghostModel = getattr(ghostAgents, ghostModel)
+
     def getAction(self, gameState):
         """
           Returns the expectimax action using self.depth and self.evaluationFunction
@@ -386,6 +695,8 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         """
         "*** YOUR CODE HERE ***"
         self.numGhosts = gameState.getNumAgents() - 1
+        if self.ghostModel != None:
+            self.ghostModels = [self.ghostModel(i + 1) for i in range(self.numGhosts)]
         (maxScore, maxAction) = self.expectiMax(gameState, 0, 1)
         return maxAction
 
@@ -397,6 +708,8 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
 
         if agentIndex == 0: # Pacman
             return self.getMaxSuccessor(gameState, agentIndex, currentDepth)
+        elif self.ghostModel != None: # All the ghosts at once
+            return self.getExpectedSuccessor(gameState, currentDepth)
         else: # Ghost
             return self.getRandomSuccessor(gameState, agentIndex, currentDepth)
 
@@ -409,7 +722,7 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         maxAction = None
 
         for action in legal:
-            successor = gameState.generateSuccessor(agentIndex, action)
+            successor = self.successor(gameState, agentIndex, action)
             (score, oldAction) = self.expectiMax(successor, 1, currentDepth)
 
             if score > maxScore:
@@ -427,13 +740,23 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         legal = gameState.getLegalActions(agentIndex)
         if Directions.STOP in legal: legal.remove(Directions.STOP)
 
+        nextDepth = (currentDepth + 1) if (agentIndex == self.numGhosts) else currentDepth
+        nextAgent = (agentIndex + 1) % (self.numGhosts + 1)
+        if self.batchEval and nextDepth > self.depth:
+            # Every successor is a leaf: evaluate them together
+            successors = [self.successor(gameState, agentIndex, action) for action in legal]
+            scores = self.evaluateLeaves(successors)
+        else:
+            scores = None
+
         # NB : we browse this loop to expand all the gameState but it's not optimal
         # In practise we can just expand call expectiMax on the action selected previously
-        for action in legal:
-            successor = gameState.generateSuccessor(agentIndex, action)
-            nextDepth = (currentDepth + 1) if (agentIndex == self.numGhosts) else currentDepth
-            nextAgent = (agentIndex + 1) % (self.numGhosts + 1)
-            (score, oldAction) = self.expectiMax(successor, nextAgent, nextDepth)
+        for i, action in enumerate(legal):
+            if scores != None:
+                score = scores[i]
+            else:
+                successor = self.successor(gameState, agentIndex, action)
+                (score, oldAction) = self.expectiMax(successor, nextAgent, nextDepth)
 
             # Check if the action is the one who was randomly selected
             if action == selectedAction:
@@ -442,6 +765,15 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         return (selectedScore, selectedAction)
 
 
+    def getExpectedSuccessor(self, gameState, currentDepth):
+        # Expected value over the joint moves of the modeled ghosts
+        successors = ghostAgents.getJointSuccessors(gameState, self.ghostModels, self.successor)
+        if self.batchEval and currentDepth + 1 > self.depth:
+            scores = self.evaluateLeaves([successor for prob, successor in successors])
+        else:
+            scores = [self.expectiMax(successor, 0, currentDepth + 1)[0] for prob, successor in successors]
+        return (sum([prob * score for (prob, successor), score in zip(successors, scores)]), None)
+
     def getDistribution(self, agentIndex, gameState):
         dist = util.Counter()
         for a in gameState.getLegalActions(agentIndex): dist[a] = 1.0
@@ -483,6 +815,11 @@ def genericEvaluationFunction(currentGameState, coefficients):
             coefficients['COEF_foodLeft'] * foodLeft + \
             coefficients['COEF_capsulesLeft'] * capsulesLeft
 
+    # Optional: weight of the spanning tree over the food and Pacman, a lower
+    # bound on the moves left to eat everything
+    if coefficients.get('COEF_foodMST', 0):
+        score += coefficients['COEF_foodMST'] * getCachedValueMST(currentGameState)
+
     return score
 
 
@@ -494,16 +831,39 @@ def betterEvaluationFunction(currentGameState):
       DESCRIPTION: <write something here so we know what you did>
     """
     "*** YOUR CODE HERE ***"
-    # To improve the coefficients we could have used some machine learning algorithms (genetic programming, svm, etc.)
-    coefficients = {}
-    coefficients['COEF_gameScore'] = 1
-    coefficients['COEF_distClosestFood'] = -2
-    coefficients['COEF_distClosestUnscaredGhost'] = 1.5
-    coefficients['COEF_distClosestScaredGhost'] = 2000
-    coefficients['COEF_foodLeft'] = -20
-    coefficients['COEF_capsulesLeft'] = -30
-
-    return genericEvaluationFunction(currentGameState, coefficients)
+    return genericEvaluationFunction(currentGameState, BETTER_COEFFICIENTS)
+
+def makeLinearEvaluationFunction(coefficients):
+    """
+    Returns genericEvaluationFunction with the given coefficients as an
+    evaluation function of the state alone, with a batch version.
+    """
+    def linearEvaluationFunction(currentGameState):
+        return genericEvaluationFunction(currentGameState, coefficients)
+    linearEvaluationFunction.batch = lambda gameStates: evaluateLinear(gameStates, coefficients)
+    return linearEvaluationFunction
+
+def evaluateLinear(gameStates, coefficients):
+    """
+    genericEvaluationFunction(state, coefficients) for every state at once:
+    featureExtractors.evaluateLinear, plus the optional COEF_foodMST term.
+    """
+    values = featureExtractors.evaluateLinear(gameStates, coefficients)
+    if coefficients.get('COEF_foodMST', 0):
+        for i, gameState in enumerate(gameStates):
+            if not (gameState.isWin() or gameState.isLose()):
+                values[i] += coefficients['COEF_foodMST'] * getCachedValueMST(gameState)
+    return values
+
+def loadCoefficients(fileName):
+    "Reads a coefficient dictionary saved as JSON"
+    import json
+    with open(fileName) as f:
+        return json.load(f)
+
+# Batch versions, used by the search agents with batchEval=True
+scoreEvaluationFunction.batch = lambda gameStates: [gameState.getScore() for gameState in gameStates]
+betterEvaluationFunction.batch = lambda gameStates: evaluateLinear(gameStates, BETTER_COEFFICIENTS)
 
 # Abbreviation
 better = betterEvaluationFunction
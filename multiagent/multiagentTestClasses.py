@@ -27,11 +27,11 @@ from collections import defaultdict
 from pprint import PrettyPrinter
 pp = PrettyPrinter()
 
-from game import Agent
+from game import Agent, Configuration
 from pacman import GameState
 from ghostAgents import RandomGhost, DirectionalGhost
 import random, math, traceback, sys, os
-import layout, pacman
+import layout, pacman, gameStatistics
 import autograder
 # import grading
 
@@ -128,6 +128,142 @@ def parseTreeProblem(testDict):
     return MultiagentTreeProblem(numAgents, startState, winStates, loseStates, successors, evaluation)
 
 
+class SyntheticTreeState(object):
+    """
+    A node of a SyntheticTreeProblem.  It interfaces like MultiagentTreeState
+    but has no VERBOSE tracing, so timings measure the search and not the
+    checks.  Nodes are numbered like a heap: the children of node n are
+    n * branching + 1 ... n * branching + branching.
+    """
+    __slots__ = ['problem', 'node', 'ply', 'value']
+
+    def __init__(self, problem, node, ply, value):
+        self.problem = problem
+        self.node = node
+        self.ply = ply
+        self.value = value
+
+    def generateSuccessor(self, agentIndex, action):
+        problem = self.problem
+        index = problem.actionIndex[action]
+        problem.generatedCount += 1
+        return SyntheticTreeState(problem, self.node * problem.branching + index + 1, self.ply + 1,
+                                  problem.childValues(self)[index])
+
+    def getScore(self):
+        if self.ply < self.problem.plies:
+            raise Exception('getScore() called on non-terminal state or before maximum depth achieved.')
+        self.problem.evaluatedCount += 1
+        return self.value
+
+    def getLegalActions(self, agentIndex=0):
+        if self.ply >= self.problem.plies:
+            return []
+        return list(self.problem.actions)
+
+    def isWin(self):
+        return False
+
+    def isLose(self):
+        return False
+
+    def getNumAgents(self):
+        return self.problem.numAgents
+
+
+class SyntheticTreeProblem(object):
+    """
+    A large seeded random game tree, for timing and node-counting the search
+    agents far beyond the hand-written trees of the .test files.
+
+    Agent 0 maximizes and the other agents minimize, in turn; with depth d
+    (as the agents count it) the leaves are branching ** (d * numAgents)
+    plies deep.  Nothing is stored: every node carries its exact minimax
+    value, and the values of its children are derived from the node number
+    and the seed.  One child has the node's value and the others are worse
+    by amounts drawn from the chosen distribution ('uniform', 'exponential'
+    or 'normal', scaled by spread), so the tree can have millions of leaves
+    and still be generated in constant memory.
+
+    ordering places the children of every node: 'best' puts them from best
+    to worst for the player to move, which is ideal for alpha-beta, 'worst'
+    the reverse, and 'random' shuffles them.  getBestAction and getValue give
+    the right minimax answer to check agents against.
+    """
+    ORDERINGS = ['best', 'random', 'worst']
+    DISTRIBUTIONS = ['uniform', 'exponential', 'normal']
+
+    def __init__(self, branching, depth, numAgents=2, ordering='random', distribution='uniform', spread=100.0, seed=0):
+        if ordering not in self.ORDERINGS:
+            raise Exception('Unknown ordering %s, expected one of %s' % (ordering, ', '.join(self.ORDERINGS)))
+        if distribution not in self.DISTRIBUTIONS:
+            raise Exception('Unknown distribution %s, expected one of %s' % (distribution, ', '.join(self.DISTRIBUTIONS)))
+        self.branching = branching
+        self.depth = depth
+        self.numAgents = numAgents
+        self.plies = depth * numAgents
+        self.ordering = ordering
+        self.distribution = distribution
+        self.spread = spread
+        self.seed = seed
+        self.actions = ['a%d' % i for i in range(branching)]
+        self.actionIndex = dict([(action, i) for i, action in enumerate(self.actions)])
+        self.startState = SyntheticTreeState(self, 0, 0, self.draw(0, branching))
+        self.reset()
+
+    def reset(self):
+        self.generatedCount = 0
+        self.evaluatedCount = 0
+
+    def getLeafCount(self):
+        return self.branching ** self.plies
+
+    def uniform(self, node, slot):
+        "A uniform number in [0, 1) that only depends on the seed, node and slot"
+        # 64-bit mixing function (splitmix64's finalizer)
+        x = ((node + 1) * 0x9E3779B97F4A7C15 + slot * 0xBF58476D1CE4E5B9 + self.seed * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        x ^= x >> 31
+        return (x >> 11) / float(1 << 53)
+
+    def draw(self, node, slot):
+        "A non-negative amount from the distribution, scaled by spread"
+        u = self.uniform(node, slot)
+        if self.distribution == 'uniform':
+            return self.spread * u
+        if self.distribution == 'exponential':
+            return -self.spread * math.log(1.0 - u)
+        # Half-normal, by Box-Muller
+        v = self.uniform(node, slot + self.branching + 1)
+        return self.spread * abs(math.sqrt(-2.0 * math.log(1.0 - u)) * math.cos(2 * math.pi * v))
+
+    def childValues(self, state):
+        """
+        The values of a node's children: one equal to the node's value, the
+        others worse for the agent to move, placed according to the ordering.
+        """
+        branching = self.branching
+        margins = sorted([0.0] + [self.draw(state.node, i) for i in range(branching - 1)])
+        if self.ordering == 'worst':
+            margins.reverse()
+        elif self.ordering == 'random':
+            keys = [self.uniform(state.node, 2 * branching + 2 + i) for i in range(branching)]
+            margins = [margin for key, margin in sorted(zip(keys, margins))]
+        if state.ply % self.numAgents == 0:
+            return [state.value - margin for margin in margins]
+        return [state.value + margin for margin in margins]
+
+    def getValue(self):
+        "The minimax value of the tree"
+        return self.startState.value
+
+    def getBestAction(self):
+        "Pacman's minimax action at the root"
+        values = self.childValues(self.startState)
+        return self.actions[values.index(max(values))]
+
+
 
 def run(lay, layName, pac, ghosts, disp, nGames=1, name='games'):
     """
@@ -135,11 +271,18 @@ def run(lay, layName, pac, ghosts, disp, nGames=1, name='games'):
     """
     starttime = time.time()
     print '*** Running %s on' % name, layName, '%d time(s).' % nGames
-    games = pacman.runGames(lay, pac, ghosts, disp, nGames, False, catchExceptions=True, timeout=120)
+    scores, outcomes, latency = gameStatistics.ScoreStatistics(), gameStatistics.OutcomeCounter(), gameStatistics.LatencyAggregator()
+    pacman.runGames(lay, pac, ghosts, disp, nGames, False, catchExceptions=True, timeout=120,
+                    aggregators=[scores, outcomes, latency])
     print '*** Finished running %s on' % name, layName, 'after %d seconds.' % (time.time() - starttime)
-    stats = {'time': time.time() - starttime, 'wins': [g.state.isWin() for g in games].count(True), 'games': games, 'scores': [g.state.getScore() for g in games],
-             'timeouts': [g.agentTimeout for g in games].count(True), 'crashes': [g.agentCrashed for g in games].count(True)}
-    print '*** Won %d out of %d games. Average score: %f ***' % (stats['wins'], len(games), sum(stats['scores']) * 1.0 / len(games))
+    stats = {'time': time.time() - starttime, 'wins': outcomes.wins, 'scores': scores.scores, 'averageScore': scores.mean(),
+             'timeouts': outcomes.timeouts, 'crashes': outcomes.crashes, 'latency': latency.summary()}
+    print '*** Won %d out of %d games. Average score: %f ***' % (stats['wins'], outcomes.games, stats['averageScore'])
+    pacmanLatency = stats['latency'][0]
+    print '*** Pacman move latency: p50 %.1fms, p95 %.1fms, p99 %.1fms, max %.1fms; %d slow moves; peak %.1f%% of the time allowed ***' % \
+        tuple([1000 * pacmanLatency['moves'].percentile(p) for p in (50, 95, 99)] +
+              [1000 * pacmanLatency['moves'].max, pacmanLatency['slowMoves'],
+               100.0 * pacmanLatency['peakTotal'] / pacmanLatency['maxTotal']])
     return stats
 
 class GradingAgent(Agent):
@@ -423,6 +566,134 @@ class GraphGameTreeTest(testClasses.TestCase):
         return True
 
 
+def positionToState(board, agents, score):
+    """
+    Rebuilds a mid-game GameState from its serialized form (see
+    stateToPosition): board holds the rows of walls, food and capsules, and
+    agents one tuple of (x, y, direction, scaredTimer, startX, startY) per
+    agent, Pacman first.
+    """
+    lay = layout.Layout(board)
+    lay.agentPositions = [(i == 0, (startX, startY)) for i, (x, y, direction, scaredTimer, startX, startY) in enumerate(agents)]
+    lay.numGhosts = len(agents) - 1
+    state = GameState()
+    state.initialize(lay, lay.numGhosts)
+    for agentState, (x, y, direction, scaredTimer, startX, startY) in zip(state.data.agentStates, agents):
+        agentState.configuration = Configuration((x, y), direction)
+        agentState.scaredTimer = scaredTimer
+    state.data.score = score
+    return state
+
+def parseCoordinate(text):
+    "Scared ghosts move half a square at a time; other coordinates must stay ints to index grids"
+    value = float(text)
+    if value == int(value): return int(value)
+    return value
+
+def stateToPosition(state):
+    "The (board, agents, score) describing state, as read by positionToState"
+    walls, food, capsules = state.getWalls(), state.getFood(), state.getCapsules()
+    board = []
+    for y in range(walls.height - 1, -1, -1):
+        row = ''
+        for x in range(walls.width):
+            if walls[x][y]: row += '%'
+            elif food[x][y]: row += '.'
+            elif (x, y) in capsules: row += 'o'
+            else: row += ' '
+        board.append(row)
+    agents = []
+    for agentState in state.data.agentStates:
+        x, y = agentState.configuration.getPosition()
+        startX, startY = agentState.start.getPosition()
+        agents.append(tuple([parseCoordinate(c) for c in (x, y)]) + (agentState.configuration.getDirection(), agentState.scaredTimer) +
+                      tuple([parseCoordinate(c) for c in (startX, startY)]))
+    return board, agents, state.getScore()
+
+class FixedPositionTest(testClasses.TestCase):
+    """
+    One serialized mid-game position of the fixed-position suite (see
+    positionSuite.py), searched by each algorithm at each depth.  The
+    solution holds, for every algorithm, the best action and the number of
+    states explored at each depth.  The test fails if an agent chooses a
+    different action; node counts are reported against the baseline but do
+    not fail the test, since pruning and ordering work is meant to lower them.
+    """
+
+    def __init__(self, question, testDict):
+        super(FixedPositionTest, self).__init__(question, testDict)
+        self.layoutName = testDict['layoutName']
+        self.board = [row for row in testDict['board'].split('\n') if row]
+        self.agents = []
+        for line in testDict['agents'].split('\n'):
+            if not line.strip(): continue
+            x, y, direction, scaredTimer, startX, startY = line.split()
+            self.agents.append((parseCoordinate(x), parseCoordinate(y), direction, int(scaredTimer),
+                                parseCoordinate(startX), parseCoordinate(startY)))
+        self.score = float(testDict['score'])
+        self.algs = testDict.get('algs', 'MinimaxAgent AlphaBetaAgent ExpectimaxAgent').split()
+        self.depths = [int(d) for d in testDict.get('depths', '1 2 3 4').split()]
+        self.seed = int(testDict.get('seed', '0'))
+
+    def getState(self):
+        return positionToState(self.board, self.agents, self.score)
+
+    def search(self, multiAgents, alg, depth):
+        """
+        Runs one search from the position and returns (action, number of
+        states explored, seconds taken).
+        """
+        state = self.getState()
+        agent = getattr(multiAgents, alg)(depth = str(depth))
+        random.seed(self.seed)
+        GameState.getAndResetExplored()
+        start = time.time()
+        action = agent.getAction(state)
+        seconds = time.time() - start
+        return action, len(GameState.getAndResetExplored()), seconds
+
+    def parseSolution(self, solutionDict):
+        "Returns {(alg, depth): (best action, baseline node count)}"
+        baseline = {}
+        for alg in self.algs:
+            for line in solutionDict.get(alg, '').split('\n'):
+                if not line.strip(): continue
+                depth, action, nodes = line.split()
+                baseline[(alg, int(depth))] = (action, int(nodes))
+        return baseline
+
+    def execute(self, grades, moduleDict, solutionDict):
+        multiAgents = moduleDict['multiAgents']
+        baseline = self.parseSolution(solutionDict)
+        fail = False
+        for alg in self.algs:
+            for depth in self.depths:
+                if (alg, depth) not in baseline: continue
+                goldAction, goldNodes = baseline[(alg, depth)]
+                action, nodes, seconds = self.search(multiAgents, alg, depth)
+                if action != goldAction:
+                    self.addMessage('%s depth %d: chose %s, best is %s' % (alg, depth, action, goldAction))
+                    fail = True
+                elif VERBOSE or nodes != goldNodes:
+                    self.addMessage('%s depth %d: %d states explored (baseline %d) in %.3fs' % (alg, depth, nodes, goldNodes, seconds))
+        if fail:
+            return self.testFail(grades)
+        return self.testPass(grades)
+
+    def writeSolution(self, moduleDict, filePath):
+        multiAgents = moduleDict['multiAgents']
+        with open(filePath, 'w') as handle:
+            handle.write('# This is the solution file for %s.\n' % self.path)
+            handle.write('# Each line: depth, best action, states explored.\n')
+            for alg in self.algs:
+                handle.write('%s: """\n' % alg)
+                for depth in self.depths:
+                    action, nodes, seconds = self.search(multiAgents, alg, depth)
+                    handle.write('%d %s %d\n' % (depth, action, nodes))
+                handle.write('"""\n')
+        return True
+
+
 import time
 from util import TimeoutFunction
 
@@ -462,14 +733,15 @@ class EvalAgentTest(testClasses.TestCase):
         disp = self.question.getDisplay()
 
         random.seed(self.seed)
-        games = pacman.runGames(lay, agent, self.ghosts, disp, self.numGames, False, catchExceptions=True, timeout=self.maxTime)
+        scores, outcomes = gameStatistics.ScoreStatistics(), gameStatistics.OutcomeCounter()
+        pacman.runGames(lay, agent, self.ghosts, disp, self.numGames, False, catchExceptions=True, timeout=self.maxTime,
+                        aggregators=[scores, outcomes])
         totalTime = time.time() - startTime
 
-        stats = {'time': totalTime, 'wins': [g.state.isWin() for g in games].count(True),
-                 'games': games, 'scores': [g.state.getScore() for g in games],
-                 'timeouts': [g.agentTimeout for g in games].count(True), 'crashes': [g.agentCrashed for g in games].count(True)}
+        stats = {'time': totalTime, 'wins': outcomes.wins, 'scores': scores.scores, 'averageScore': scores.mean(),
+                 'timeouts': outcomes.timeouts, 'crashes': outcomes.crashes}
 
-        averageScore = sum(stats['scores']) / float(len(stats['scores']))
+        averageScore = stats['averageScore']
         nonTimeouts = self.numGames - stats['timeouts']
         wins = stats['wins']
 
@@ -45,7 +45,7 @@ from game import Directions
 from game import Actions
 from util import nearestPoint
 from util import manhattanDistance
-import util, layout
+import util, layout, gameStatistics
 import sys, types, time, random, os
 
 ###################################################
@@ -206,6 +206,13 @@ class GameState:
     def hasWall(self, x, y):
         return self.data.layout.walls[x][y]
 
+    def getStateKey( self ):
+        """
+        Returns an exact, hashable key for this state, suitable for caching
+        values computed from it (see GameStateData.stateKey in game.py).
+        """
+        return self.data.stateKey()
+
     def isLose( self ):
         return self.data._lose
 
@@ -253,6 +260,116 @@ class GameState:
         """
         self.data.initialize(layout, numGhostAgents)
 
+class SuccessorCache:
+    """
+    Memoizes the successors an agent generates, by (state key, agent, action).
+
+    A search on one move rebuilds most of the tree the search on the move
+    before built below the state the game went to, and different orders of
+    moves can reach equal states within a search.  Agents that generate
+    successors with successor() instead of generateSuccessor (see
+    MultiAgentSearchAgent.successor) have them looked up first while the
+    cache is active, as a context manager or around a function wrapped with
+    wrap, so each distinct successor is built once.  Unlike a transposition
+    table this memoizes states, not values, so it helps any search, including
+    expectimax and searches that would be confused by stored value bounds.
+    Nothing else is affected: GameState itself is left alone.
+
+    The maxSize most recently used successors are kept from move to move, and
+    the cache is emptied when a state of another layout comes in.  States are
+    still added to GameState.explored on every call, so explored-state counts
+    are unchanged.  Successors are shared, so agents must not modify them.
+    """
+    moves = 0 # Numbers the moves of all caches, to tag remembered keys
+
+    def __init__( self, maxSize=100000 ):
+        self.successors = util.LRUCache(maxSize)
+        self.layout = None
+        self.hits = 0
+        self.misses = 0
+        self.foodBitmasks = {}
+        self.scope = None
+        self.depth = 0
+
+    def __enter__( self ):
+        self.depth += 1
+        if self.depth > 1: return self
+        SuccessorCache.moves += 1
+        self.scope = SuccessorCache.moves
+        return self
+
+    def __exit__( self, *exceptionInfo ):
+        self.depth -= 1
+        if self.depth == 0:
+            self.foodBitmasks.clear()
+            self.scope = None
+        return False
+
+    def successor( self, state, agentIndex, action ):
+        """
+        state.generateSuccessor(agentIndex, action), built once while it stays
+        in the cache.
+        """
+        if self.depth == 0:
+            return state.generateSuccessor(agentIndex, action)
+        if state.data.layout is not self.layout:
+            # State keys leave out the walls
+            self.successors.clear()
+            self.layout = state.data.layout
+        successorKey = (self.key(state), agentIndex, action)
+        entry = self.successors.get(successorKey)
+        # The explored set of the state's own class: pacman.py run as a script
+        # has a second GameState class
+        explored = state.__class__.explored
+        if entry is None:
+            self.misses += 1
+            entry = [state.generateSuccessor(agentIndex, action), explored]
+            self.successors.put(successorKey, entry)
+            return entry[0]
+        self.hits += 1
+        if entry[1] is not explored:
+            # Explored was reset since the successor was built
+            explored.add(state)
+            explored.add(entry[0])
+            entry[1] = explored
+        return entry[0]
+
+    def key( self, state ):
+        """
+        The state's key, computed once per move: it is remembered on the state
+        and tagged with the current move, so a later move never trusts it.
+        """
+        memo = state.__dict__.get('_successorCacheKey')
+        if memo is not None and memo[0] == self.scope:
+            return memo[1]
+        # Successors share their food grid's rows until food is eaten, and
+        # nothing changes them during a move, so bitmasks are kept per rows
+        # (which the memo keeps alive, so their id cannot be reused)
+        food = state.data.food.data
+        foodMemo = self.foodBitmasks.get(id(food))
+        if foodMemo is None:
+            foodMemo = self.foodBitmasks[id(food)] = (food, state.data.food.asBitmask())
+        key = state.data.stateKey(foodMemo[1])
+        state._successorCacheKey = (self.scope, key)
+        return key
+
+    def wrap( self, getAction ):
+        "Returns an agent's getAction running with this cache active"
+        def cachedGetAction( state ):
+            with self:
+                return getAction(state)
+        return cachedGetAction
+
+    def hitRate( self ):
+        "Fraction of successor calls answered from the cache"
+        calls = self.hits + self.misses
+        if calls == 0: return 0.0
+        return float(self.hits) / calls
+
+    def __str__( self ):
+        return "%d hits, %d misses (%.1f%% hit rate), %d evicted (limit %d successors)" % \
+            (self.hits, self.misses, 100 * self.hitRate(), self.successors.evictions, self.successors.maxSize)
+
 ############################################################################
 #                     THE HIDDEN SECRETS OF PACMAN                         #
 #                                                                          #
@@ -268,14 +385,15 @@ class ClassicGameRules:
     These game rules manage the control flow of a game, deciding when
     and how the game starts and ends.
     """
-    def __init__(self, timeout=30):
+    def __init__(self, timeout=30, preemptMoves=False):
         self.timeout = timeout
+        self.preemptMoves = preemptMoves
 
     def newGame( self, layout, pacmanAgent, ghostAgents, display, quiet = False, catchExceptions=False):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize( layout, len(ghostAgents) )
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions, preemptMoves=self.preemptMoves)
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -320,6 +438,27 @@ class ClassicGameRules:
     def getMaxTimeWarnings(self, agentIndex):
         return 0
 
+class CappedGameRules(ClassicGameRules):
+    """
+    Classic rules that also stop the game, at its current score, after
+    maxMoves agent moves, since a weak agent can stall Pacman forever.
+    Crashes (e.g. an agent returning no action) end the game quietly.  Used
+    by the tuning, benchmark and tournament scripts.
+    """
+    def __init__(self, maxMoves, timeout = 3600):
+        ClassicGameRules.__init__(self, timeout)
+        self.maxMoves = maxMoves
+        self.moves = 0
+
+    def process(self, state, game):
+        ClassicGameRules.process(self, state, game)
+        self.moves += 1
+        if self.moves >= self.maxMoves:
+            game.gameOver = True
+
+    def agentCrash(self, game, agentIndex):
+        pass
+
 class PacmanRules:
     """
     These functions govern how pacman interacts with his environment under
@@ -331,7 +470,7 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        return state.data.layout.getLegalActions( state.getPacmanState().configuration )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action ):
@@ -389,7 +528,7 @@ class GhostRules:
         reach a dead end, but can turn 90 degrees at intersections.
         """
         conf = state.getGhostState( ghostIndex ).configuration
-        possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
+        possibleActions = state.data.layout.getLegalActions( conf )
         reverse = Actions.reverseDirection( conf.direction )
         if Directions.STOP in possibleActions:
             possibleActions.remove( Directions.STOP )
@@ -509,10 +648,18 @@ def readCommand( argv ):
                       help=default('Zoom the size of the graphics window'), default=1.0)
     parser.add_option('-f', '--fixRandomSeed', action='store_true', dest='fixRandomSeed',
                       help='Fixes the random seed to always play the same game', default=False)
+    parser.add_option('--seed', dest='seed',
+                      help='Seeds the random numbers of the run, and is written to recordings [Default: cs188 with -f, else a new one]', default=None)
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
-                      help='Writes game histories to a file (named by the time they were played)', default=False)
+                      help='Appends game histories to a recording (see gameRecording.py)', default=False)
+    parser.add_option('--recordFile', dest='recordFile',
+                      help='The recording -r appends to [Default: named by the time of the run]', default=None)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A recording, or a recorded game pickle, to replay', default=None)
+    parser.add_option('--replayIndex', dest='replayIndex', type='int',
+                      help='Replay only this game of the recording, counting from 0 [Default: all]', default=None)
+    parser.add_option('--replayFrom', dest='replayFrom', type='int',
+                      help=default('Start replays after this many moves (see gameReplay.py)'), default=0)
     parser.add_option('-a','--agentArgs',dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
@@ -521,16 +668,24 @@ def readCommand( argv ):
                       help=default('Time to delay between frames; <0 means keyboard'), default=0.1)
     parser.add_option('-c', '--catchExceptions', action='store_true', dest='catchExceptions',
                       help='Turns on exception handling and timeouts during games', default=False)
-    parser.add_option('--timeout', dest='timeout', type='int',
+    parser.add_option('--timeout', dest='timeout', type='float',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--preemptMoves', action='store_true', dest='preemptMoves',
+                      help='With -c, interrupt an agent when its move runs out of time (uses SIGALRM)', default=False)
+    parser.add_option('--stream', action='store_true', dest='stream',
+                      help='Summarize games as they finish instead of keeping them (see gameStatistics.py)', default=False)
+    parser.add_option('--summaryFile', dest='summaryFile',
+                      help='Write a summary of every game to this .csv or .jsonl file (implies --stream)', default=None)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
         raise Exception('Command line input not understood: ' + str(otherjunk))
     args = dict()
 
-    # Fix the random seed
-    if options.fixRandomSeed: random.seed('cs188')
+    # Seed the run, so that a recording tells how to play its games again
+    if options.seed == None:
+        options.seed = 'cs188' if options.fixRandomSeed else '%08x' % random.getrandbits(32)
+    random.seed(options.seed)
 
     # Choose a layout
     args['layout'] = layout.getLayout( options.layout )
@@ -568,18 +723,30 @@ def readCommand( argv ):
         args['display'] = graphicsDisplay.PacmanGraphics(options.zoom, frameTime = options.frameTime)
     args['numGames'] = options.numGames
     args['record'] = options.record
+    args['recordFile'] = options.recordFile
+    args['seed'] = options.seed
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['preemptMoves'] = options.preemptMoves
+    if options.stream or options.summaryFile != None:
+        args['aggregators'] = gameStatistics.defaultAggregators(options.summaryFile)
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
+        import gameRecording
+        if gameRecording.isRecording(options.gameToReplay):
+            for i, recorded in enumerate(gameRecording.readRecording(options.gameToReplay)):
+                if options.replayIndex != None and i != options.replayIndex: continue
+                print 'Replaying game %d of %s: %s.' % (i, options.gameToReplay, recorded)
+                replayGame(display = args['display'], startMove = options.replayFrom, **recorded.replayArguments())
+            sys.exit(0)
         print 'Replaying recorded game %s.' % options.gameToReplay
         import cPickle
         f = open(options.gameToReplay)
         try: recorded = cPickle.load(f)
         finally: f.close()
         recorded['display'] = args['display']
-        replayGame(**recorded)
+        replayGame(startMove = options.replayFrom, **recorded)
         sys.exit(0)
 
     return args
@@ -607,12 +774,18 @@ def loadAgent(pacman, nographics):
                 return getattr(module, pacman)
     raise Exception('The agent ' + pacman + ' is not specified in any *Agents.py.')
 
-def replayGame( layout, actions, display ):
+def replayGame( layout, actions, display, numGhosts = None, startMove = 0 ):
     import pacmanAgents, ghostAgents
     rules = ClassicGameRules()
-    agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(layout.getNumGhosts())]
+    if numGhosts == None: numGhosts = layout.getNumGhosts()
+    agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1) for i in range(numGhosts)]
     game = rules.newGame( layout, agents[0], agents[1:], display )
     state = game.state
+    if startMove > 0:
+        # Jump to the first move shown without drawing the ones before it
+        import gameReplay
+        state = gameReplay.IndexedReplay(layout, actions, numGhosts).seek(startMove)
+        actions = actions[startMove:]
     display.initialize(state.data)
 
     for action in actions:
@@ -625,12 +798,34 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30,
+              recordFile = None, seed = None, aggregators = None, preemptMoves = False ):
+    """
+    Plays numGames games, of which the first numTraining quietly, and returns
+    the others.  Given a seed, game i is played with random seeded by
+    '<seed>-<i>', which the recording stores with the game.  Given a list of
+    aggregators (see gameStatistics.py) it keeps no game: each one shown is
+    summarized and passed to every aggregator as it finishes, and the
+    aggregators are closed, reported and returned.  The states the streamed
+    games explore are not kept either; GameState.explored is left as it was
+    before the run.  With preemptMoves, agents are interrupted when a move
+    runs out of time instead of only checking the deadline themselves.
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
-    rules = ClassicGameRules(timeout)
+    rules = ClassicGameRules(timeout, preemptMoves)
     games = []
+    if record:
+        import time, gameRecording
+        if recordFile == None:
+            recordFile = 'recorded-games-' + '-'.join([str(t) for t in time.localtime()[1:6]]) + '.rec'
+        recording = gameRecording.RecordingWriter(recordFile, seed)
+
+    if aggregators != None:
+        # The streamed games explore into sets of their own, dropped with them
+        explored = GameState.explored
+        GameState.explored = set()
 
     for i in range( numGames ):
         beQuiet = i < numTraining
@@ -642,17 +837,35 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         else:
             gameDisplay = display
             rules.quiet = False
+        gameSeed = None
+        if seed != None:
+            gameSeed = '%s-%d' % (seed, i)
+            random.seed(gameSeed)
         game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions)
         game.run()
-        if not beQuiet: games.append(game)
+        if not beQuiet:
+            if aggregators == None:
+                games.append(game)
+            else:
+                summary = gameStatistics.GameSummary.fromGame(game, i - numTraining)
+                for aggregator in aggregators: aggregator.add(summary)
+                GameState.explored = set() # Nor the states it explored
 
         if record:
-            import time, cPickle
-            fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            cPickle.dump(components, f)
-            f.close()
+            recording.writeGame(game, gameSeed)
+
+    if aggregators != None:
+        GameState.explored = explored
+
+    if record:
+        recording.close()
+        print 'Recorded %d games in %s (seed %s)' % (recording.numGames, recordFile, seed)
+
+    if aggregators != None:
+        for aggregator in aggregators:
+            aggregator.close()
+            aggregator.report()
+        return aggregators
 
     if (numGames-numTraining) > 0:
         scores = [game.state.getScore() for game in games]
@@ -662,9 +875,23 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         print 'Scores:       ', ', '.join([str(score) for score in scores])
         print 'Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate)
         print 'Record:       ', ', '.join([ ['Loss', 'Win'][int(w)] for w in wins])
+        gameStatistics.printLatencyReport(latencySummary(games))
 
     return games
 
+def latencySummary(games):
+    """
+    A list with, for each agent of the games, a dictionary of how long its
+    moves took: 'moves', a util.LatencyHistogram of every move of every game;
+    'slowMoves', the number over rules.getMoveWarningTime; and 'peakTotal',
+    the most time it used in a single game, against 'maxTotal', the time
+    rules.getMaxTotalTime allows per game.
+    """
+    latency = gameStatistics.LatencyAggregator()
+    for i, game in enumerate(games):
+        latency.add(gameStatistics.GameSummary.fromGame(game, i))
+    return latency.summary()
+
 if __name__ == '__main__':
     """
     The main function called when pacman.py is run
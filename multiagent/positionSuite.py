@@ -0,0 +1,173 @@
+# positionSuite.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Runs the search agents on a fixed suite of mid-game positions, in the
+spirit of the EPD test suites of chess engines, to tell whether ordering or
+pruning work actually helps.
+
+Each position is a FixedPositionTest (multiagentTestClasses.py) stored in
+test_cases/positions: a .test file with the position, and a .solution file
+with, for each algorithm and depth, the best action and the number of
+states the reference search explored.  For every position, algorithm and
+depth the runner reports whether the agent found the best action, how
+many states it explored against the baseline, and how long it took, then
+totals for the whole suite.
+
+    python positionSuite.py                       # run the suite
+    python positionSuite.py --algs AlphaBetaAgent --depths 3,4
+    python positionSuite.py --create              # new positions from every layout
+    python positionSuite.py --generate            # new baselines from the current agents
+
+The positions can also be graded like any other question:
+
+    python autograder.py -q positions
+"""
+
+import optparse
+import os
+import random
+import re
+import sys
+
+import ghostAgents
+import layout
+import multiAgents
+import multiagentTestClasses
+import pacmanAgents
+import testParser
+from pacman import GameState
+
+SUITE_DIRECTORY = os.path.join('test_cases', 'positions')
+
+# Pacman moves after which a position is recorded, in each layout's game
+POSITION_MOVES = [5, 15, 30]
+
+def createPositions(directory, seed = 0):
+    """
+    Plays one game per layout, GreedyAgent against two DirectionalGhosts,
+    and writes a .test file for the position after each of POSITION_MOVES
+    Pacman moves.  Games that end early give fewer positions.
+    """
+    names = sorted([f[:-4] for f in os.listdir('layouts') if f.endswith('.lay')])
+    for name in names:
+        random.seed(seed)
+        state = GameState()
+        state.initialize(layout.getLayout(name), 2)
+        agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.DirectionalGhost(i + 1) for i in range(state.getNumAgents() - 1)]
+        for move in range(1, max(POSITION_MOVES) + 1):
+            for agentIndex, agent in enumerate(agents):
+                state = state.generateSuccessor(agentIndex, agent.getAction(state))
+                if state.isWin() or state.isLose(): break
+            if state.isWin() or state.isLose(): break
+            if move in POSITION_MOVES:
+                writePosition(os.path.join(directory, '%s-%d.test' % (name, move)), name, state, seed)
+
+def writePosition(path, layoutName, state, seed):
+    board, agents, score = multiagentTestClasses.stateToPosition(state)
+    with open(path, 'w') as handle:
+        handle.write('class: "FixedPositionTest"\n')
+        handle.write('layoutName: "%s"\n' % layoutName)
+        handle.write('seed: "%d"\n' % seed)
+        handle.write('score: "%s"\n' % score)
+        handle.write('algs: "MinimaxAgent AlphaBetaAgent ExpectimaxAgent"\n')
+        handle.write('depths: "1 2 3 4"\n')
+        handle.write('\n# Walls, food and capsules; the agents are listed below\n')
+        handle.write('board: """\n%s\n"""\n' % '\n'.join(board))
+        handle.write('\n# One agent per line, Pacman first: x y direction scaredTimer startX startY\n')
+        handle.write('agents: """\n%s\n"""\n' % '\n'.join(['%s %s %s %d %s %s' % agent for agent in agents]))
+
+def loadPositions(directory, pattern = None):
+    "Returns the suite's FixedPositionTests with their solution dictionaries"
+    positions = []
+    for fileName in sorted(os.listdir(directory)):
+        if not fileName.endswith('.test'): continue
+        name = fileName[:-len('.test')]
+        if pattern != None and not re.search(pattern, name): continue
+        testDict = testParser.TestParser(os.path.join(directory, fileName)).parse()
+        solutionPath = os.path.join(directory, name + '.solution')
+        solutionDict = {}
+        if os.path.exists(solutionPath):
+            solutionDict = testParser.TestParser(solutionPath).parse()
+        positions.append((name, multiagentTestClasses.FixedPositionTest(None, testDict), solutionDict))
+    return positions
+
+def runSuite(positions, algs, depths):
+    """
+    Searches every position with every algorithm and depth, printing one line
+    each, and returns {(alg, depth): [correct, searched, nodes, baseline nodes, seconds]}.
+    """
+    totals = {}
+    print '%-24s %-16s %5s %-6s %-6s %10s %10s %9s' % \
+        ('Position', 'Algorithm', 'Depth', 'Move', 'Best', 'States', 'Baseline', 'Time')
+    for name, test, solutionDict in positions:
+        baseline = test.parseSolution(solutionDict)
+        for alg in algs:
+            for depth in depths:
+                if (alg, depth) not in baseline: continue
+                goldAction, goldNodes = baseline[(alg, depth)]
+                action, nodes, seconds = test.search(multiAgents, alg, depth)
+                total = totals.setdefault((alg, depth), [0, 0, 0, 0, 0.0])
+                total[0] += int(action == goldAction)
+                total[1] += 1
+                total[2] += nodes
+                total[3] += goldNodes
+                total[4] += seconds
+                print '%-24s %-16s %5d %-6s %-6s %10d %10d %8.3fs%s' % \
+                    (name, alg, depth, action, goldAction, nodes, goldNodes, seconds,
+                     '' if action == goldAction else '  WRONG')
+                sys.stdout.flush()
+    return totals
+
+def printTotals(totals):
+    print
+    print '%-16s %5s %9s %12s %12s %7s %10s' % ('Algorithm', 'Depth', 'Correct', 'States', 'Baseline', 'Ratio', 'Time')
+    for (alg, depth) in sorted(totals):
+        correct, searched, nodes, goldNodes, seconds = totals[(alg, depth)]
+        print '%-16s %5d %4d/%-4d %12d %12d %7.3f %9.2fs' % \
+            (alg, depth, correct, searched, nodes, goldNodes, nodes / float(max(1, goldNodes)), seconds)
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Run the search agents on a fixed suite of positions')
+    parser.add_option('--suite', default = SUITE_DIRECTORY,
+                      help = 'Directory of the position suite (default %default)')
+    parser.add_option('--algs', default = 'MinimaxAgent,AlphaBetaAgent,ExpectimaxAgent',
+                      help = 'Comma separated algorithms to run (default %default)')
+    parser.add_option('--depths', default = '1,2,3,4',
+                      help = 'Comma separated search depths to run (default %default)')
+    parser.add_option('--filter', '-k', dest = 'pattern', default = None,
+                      help = 'Only use positions whose name matches this regular expression')
+    parser.add_option('--create', action = 'store_true', default = False,
+                      help = 'Write new positions, one game per layout, then stop')
+    parser.add_option('--generate', action = 'store_true', default = False,
+                      help = 'Write new baselines from the current agents, then stop')
+    parser.add_option('--seed', type = 'int', default = 0,
+                      help = 'Seed of the games positions are taken from (default %default)')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    if options.create:
+        createPositions(options.suite, options.seed)
+        sys.exit(0)
+    positions = loadPositions(options.suite, options.pattern)
+    if options.generate:
+        for name, test, solutionDict in positions:
+            test.writeSolution({'multiAgents': multiAgents}, os.path.join(options.suite, name + '.solution'))
+        sys.exit(0)
+    totals = runSuite(positions, options.algs.split(','), [int(d) for d in options.depths.split(',')])
+    printTotals(totals)
@@ -0,0 +1,188 @@
+# scalingBenchmark.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Measures how the engine and the agents scale with the size of the maze.
+
+Every agent plays a capped game on generated mazes (see mazeGenerator.py)
+of growing size, and for each run the benchmark reports:
+
+  successors/s  GameState.generateSuccessor calls per second of Pacman
+                thinking time
+  move latency  mean and maximum time of Pacman's getAction
+  peak memory   the largest resident size of the process that played it
+
+Each run is played in a fresh worker process, so peak memory is that of one
+game and not of everything measured before it.
+
+    python scalingBenchmark.py --sizes 20x11,40x21,80x41,160x81 \\
+        --agents ReflexAgent,MinimaxAgent,ExpectimaxAgent --depth 2 --moves 30
+"""
+
+import multiprocessing
+import optparse
+import random
+import sys
+import time
+
+try:
+    import resource
+    _RESOURCE_ENABLED = True
+except ImportError:
+    _RESOURCE_ENABLED = False
+
+import ghostAgents
+import mazeGenerator
+import multiAgents
+import pacman
+import textDisplay
+
+def peakMemory():
+    "Peak resident size of this process in megabytes, or None where unknown"
+    if not _RESOURCE_ENABLED:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, Mac OS X bytes
+    if sys.platform == 'darwin':
+        return peak / (1024.0 * 1024)
+    return peak / 1024.0
+
+class TimedAgent:
+    """
+    Wraps an agent and records how long each of its getAction calls takes
+    and how many successors it generates.  Ghosts call generateSuccessor
+    too, but outside Pacman's getAction, so they are not counted.
+    """
+    def __init__(self, agent):
+        self.agent = agent
+        self.index = agent.index
+        self.moveTimes = []
+        self.successors = 0
+
+    def registerInitialState(self, state):
+        if hasattr(self.agent, 'registerInitialState'):
+            self.agent.registerInitialState(state)
+
+    def getAction(self, state):
+        stateClass = state.__class__
+        generateSuccessor = stateClass.generateSuccessor
+        def countingGenerateSuccessor(state, agentIndex, action):
+            self.successors += 1
+            return generateSuccessor(state, agentIndex, action)
+        stateClass.generateSuccessor = countingGenerateSuccessor
+        start = time.time()
+        try:
+            action = self.agent.getAction(state)
+        finally:
+            self.moveTimes.append(time.time() - start)
+            stateClass.generateSuccessor = generateSuccessor
+        return action
+
+def runScenario(task):
+    """
+    Plays one capped game and returns its measurements as a dictionary.
+    task is (agentName, depth, width, height, mazeOptions, seed, maxMoves).
+    """
+    agentName, depth, width, height, mazeOptions, seed, maxMoves = task
+    lay = mazeGenerator.generateLayout(width, height, seed = seed, **mazeOptions)
+    random.seed(seed)
+    agentType = getattr(multiAgents, agentName)
+    if issubclass(agentType, multiAgents.MultiAgentSearchAgent):
+        agent = agentType(depth = depth)
+    else:
+        agent = agentType()
+    timedAgent = TimedAgent(agent)
+    ghosts = [ghostAgents.RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+    rules = pacman.CappedGameRules(maxMoves)
+    game = rules.newGame(lay, timedAgent, ghosts, textDisplay.NullGraphics(), quiet = True, catchExceptions = True)
+    game.muteAgents = True
+    game.run()
+
+    moveTimes = timedAgent.moveTimes
+    thinking = sum(moveTimes)
+    return {'agent': agentName, 'size': '%dx%d' % (width, height),
+            'cells': width * height, 'food': lay.food.count(),
+            'moves': len(moveTimes), 'successors': timedAgent.successors,
+            'successorsPerSecond': timedAgent.successors / thinking if thinking > 0 else 0.0,
+            'meanLatency': thinking / len(moveTimes) if moveTimes else 0.0,
+            'maxLatency': max(moveTimes) if moveTimes else 0.0,
+            'peakMemory': peakMemory()}
+
+def runBenchmark(agents, sizes, depth, mazeOptions, seed, maxMoves):
+    "Runs every agent on every size and returns the list of measurements"
+    results = []
+    for width, height in sizes:
+        for agentName in agents:
+            task = (agentName, depth, width, height, mazeOptions, seed, maxMoves)
+            pool = multiprocessing.Pool(1)
+            try:
+                result = pool.apply(runScenario, (task,))
+            finally:
+                pool.close()
+                pool.join()
+            printResult(result)
+            results.append(result)
+    return results
+
+def printHeader():
+    print '%-16s %9s %6s %6s %12s %12s %12s %10s' % \
+        ('Agent', 'Size', 'Food', 'Moves', 'Successors/s', 'Mean move', 'Max move', 'Peak MB')
+
+def printResult(result):
+    memory = 'n/a' if result['peakMemory'] == None else '%.1f' % result['peakMemory']
+    print '%-16s %9s %6d %6d %12.0f %10.1fms %10.1fms %10s' % \
+        (result['agent'], result['size'], result['food'], result['moves'], result['successorsPerSecond'],
+         1000 * result['meanLatency'], 1000 * result['maxLatency'], memory)
+    sys.stdout.flush()
+
+def parseSizes(text):
+    "'20x11,40x21' -> [(20, 11), (40, 21)]"
+    sizes = []
+    for size in text.split(','):
+        width, height = size.lower().split('x')
+        sizes.append((int(width), int(height)))
+    return sizes
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Benchmark agents on mazes of growing size')
+    parser.add_option('--sizes', default = '20x11,40x21,80x41,160x81',
+                      help = 'Comma separated WIDTHxHEIGHT maze sizes (default %default)')
+    parser.add_option('--agents', default = 'ReflexAgent,MinimaxAgent,AlphaBetaAgent,ExpectimaxAgent',
+                      help = 'Comma separated agents from multiAgents.py (default %default)')
+    parser.add_option('--depth', default = '2',
+                      help = 'Search depth of the multi-agent searchers (default %default)')
+    parser.add_option('--moves', dest = 'maxMoves', type = 'int', default = 30,
+                      help = 'Stop each game after this many moves, Pacman\'s and the ghosts\' (default %default)')
+    parser.add_option('--wall-density', dest = 'wallDensity', type = 'float', default = 0.3,
+                      help = 'Fraction of each maze that is wall (default %default)')
+    parser.add_option('--food-density', dest = 'foodDensity', type = 'float', default = 0.5,
+                      help = 'Fraction of the open cells with food (default %default)')
+    parser.add_option('--capsules', dest = 'numCapsules', type = 'int', default = 4,
+                      help = 'Capsules per maze (default %default)')
+    parser.add_option('--ghosts', dest = 'numGhosts', type = 'int', default = 2,
+                      help = 'Ghosts per maze (default %default)')
+    parser.add_option('--seed', type = 'int', default = 1,
+                      help = 'Seed of the mazes and the games (default %default)')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    mazeOptions = {'wallDensity': options.wallDensity, 'foodDensity': options.foodDensity,
+                   'numCapsules': options.numCapsules, 'numGhosts': options.numGhosts}
+    printHeader()
+    runBenchmark(options.agents.split(','), parseSizes(options.sizes), options.depth,
+                 mazeOptions, options.seed, options.maxMoves)
@@ -0,0 +1,375 @@
+# tournament.py
+# -------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Compares agent configurations with as few games as the comparison needs.
+
+Every pair of contenders is compared on every layout against every ghost
+type.  Game k of a layout and ghost type is played with the same seed by
+every contender (common random numbers): each ghost draws its moves from a
+stream of its own seeded by the game (by the alias method, see
+GhostAgent.aliasSampling), and the agent from random seeded the same way.  A ghost's k-th move then uses the same random number in both
+games of a pair; the moves still differ once the agents lead the games
+apart, so the pairing reduces the noise of the comparison rather than
+removing it.  Each pairing stops as soon as a sequential test decides it:
+
+  score  A confidence interval of the mean score difference of the pairs,
+         checked after every pair: the pairing is decided when it excludes
+         zero, or called a draw when it fits within +/- --margin.
+  sprt   A sequential probability ratio test on the pairs one agent won and
+         the other did not, of H1: A wins such a pair with probability
+         0.5 + --delta against H0: 0.5 - --delta, with error rates --alpha
+         and --beta, as chess engines are tested.
+
+Pairings still undecided after --maxGames pairs are draws.  A contender's
+game on a seed is played once and shared by all its pairings.  Games run on
+a process pool, a round of --batch pairs per pairing at a time.
+
+    python tournament.py -c AlphaBetaAgent:depth=2 -c ExpectimaxAgent:depth=2 \\
+        --layouts smallClassic,mediumClassic --ghosts RandomGhost,DirectionalGhost
+
+The report gives each pairing's decision, ranks the contenders by the
+pairings they won (a draw counts half) then by their average score, and
+counts the games the tests saved over playing --maxGames of each.
+"""
+
+import math
+import multiprocessing
+import optparse
+import sys
+
+import gameStatistics
+import ghostAgents
+import layout
+import pacman
+import textDisplay
+from pacman import GameState
+
+A, B, DRAW = 'A', 'B', 'draw'
+
+#########
+# Games #
+#########
+
+def parseContender(spec):
+    "Splits 'AgentType:opt1=val1,opt2' into the agent type and its keyword arguments"
+    if ':' in spec:
+        agentName, agentArgs = spec.split(':', 1)
+    else:
+        agentName, agentArgs = spec, None
+    return agentName, pacman.parseAgentArgs(agentArgs)
+
+def gameSeed(seed, layoutName, ghostName, gameIndex):
+    "The seed of game gameIndex on a layout against a ghost type, the same for every contender"
+    return '%s-%s-%s-%d' % (seed, layoutName, ghostName, gameIndex)
+
+def playGame(task):
+    """
+    Plays one quiet game and returns its gameStatistics.GameSummary.  task is
+    a tuple of (contender, layoutName, ghostName, seed, gameIndex, maxMoves,
+    timeout); it is a plain tuple so that it can be sent to pool workers.
+    """
+    contender, layoutName, ghostName, seed, gameIndex, maxMoves, timeout = task
+    import random
+    seed = gameSeed(seed, layoutName, ghostName, gameIndex)
+    random.seed(seed)
+    agentName, agentArgs = parseContender(contender)
+    agent = pacman.loadAgent(agentName, True)(**agentArgs)
+    lay = layout.getLayout(layoutName)
+    ghostType = getattr(ghostAgents, ghostName)
+    ghosts = [ghostType(i + 1) for i in range(lay.getNumGhosts())]
+    for ghost in ghosts:
+        ghost.rng = random.Random('%s-ghost%d' % (seed, ghost.index))
+        ghost.aliasSampling = True
+    rules = pacman.CappedGameRules(maxMoves, timeout)
+    game = rules.newGame(lay, agent, ghosts, textDisplay.NullGraphics(), quiet = True, catchExceptions = True)
+    game.muteAgents = True
+    explored = GameState.explored
+    GameState.explored = set() # The states the game explores are dropped with it
+    game.run()
+    GameState.explored = explored
+    return gameStatistics.GameSummary.fromGame(game, gameIndex)
+
+#####################
+# Sequential tests  #
+#####################
+#
+# A test is given the pairs of games of a pairing one at a time by add(a, b),
+# a and b being the GameSummaries of contenders A and B on the same seed,
+# and decision() is then A, B, DRAW, or None to go on.
+
+class ScoreDifferenceTest:
+    """
+    Decides when the z confidence interval of the mean score difference
+    excludes zero, or lies within +/- margin, after at least minGames pairs.
+    Looking after every pair makes the interval less sure than its z says,
+    hence the 99% default.
+    """
+    def __init__(self, z = 2.576, margin = 0.0, minGames = 10):
+        self.z = z
+        self.margin = margin
+        self.minGames = minGames
+        self.differences = gameStatistics.ScoreStatistics()
+
+    def add(self, a, b):
+        self.differences.addScore(a.score - b.score)
+
+    def interval(self):
+        return self.differences.confidenceInterval(self.z)
+
+    def decision(self):
+        if self.differences.count < self.minGames: return None
+        low, high = self.interval()
+        if low > 0: return A
+        if high < 0: return B
+        if -self.margin < low and high < self.margin: return DRAW
+        return None
+
+    def __str__(self):
+        low, high = self.interval()
+        return 'score difference %+.1f (%.1f to %.1f)' % (self.differences.mean(), low, high)
+
+class WinRateSPRT:
+    """
+    A sequential probability ratio test on the pairs of games exactly one
+    contender won: of H1, A wins them with probability 0.5 + delta, against
+    H0, with 0.5 - delta.  Accepting H1 decides for A and H0 for B; alpha and
+    beta are the chances of deciding for A and for B wrongly.
+    """
+    def __init__(self, delta = 0.1, alpha = 0.05, beta = 0.05):
+        p0, p1 = 0.5 - delta, 0.5 + delta
+        self.winWeight = math.log(p1 / p0)
+        self.lossWeight = math.log((1 - p1) / (1 - p0))
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+        self.llr = 0.0
+        self.wins = 0
+        self.losses = 0
+
+    def add(self, a, b):
+        if a.win and not b.win:
+            self.wins += 1
+            self.llr += self.winWeight
+        elif b.win and not a.win:
+            self.losses += 1
+            self.llr += self.lossWeight
+
+    def decision(self):
+        if self.llr >= self.upper: return A
+        if self.llr <= self.lower: return B
+        return None
+
+    def __str__(self):
+        return 'won %d-%d, LLR %.2f in (%.2f, %.2f)' % (self.wins, self.losses, self.llr, self.lower, self.upper)
+
+TESTS = {'score': ScoreDifferenceTest, 'sprt': WinRateSPRT}
+
+##############
+# Tournament #
+##############
+
+class Pairing:
+    "Contenders a and b, by index, on a condition (layout name, ghost type)"
+    def __init__(self, a, b, condition, test):
+        self.a = a
+        self.b = b
+        self.condition = condition
+        self.test = test
+        self.games = 0 # Pairs of games given to the test
+        self.result = None
+
+    def winner(self):
+        "The index of the contender who won the pairing, None for a draw"
+        if self.result == A: return self.a
+        if self.result == B: return self.b
+        return None
+
+class Tournament:
+    """
+    Plays the pairings of a list of contenders on every (layout, ghost type)
+    condition until each is decided.  makeTest returns a new sequential test.
+    """
+    def __init__(self, contenders, layouts, ghosts, makeTest, maxGames = 200, batch = 10,
+                 seed = 0, maxMoves = 2000, timeout = 30, processes = None):
+        self.contenders = contenders
+        self.conditions = [(l, g) for l in layouts for g in ghosts]
+        self.maxGames = maxGames
+        self.batch = batch
+        self.seed = seed
+        self.maxMoves = maxMoves
+        self.timeout = timeout
+        self.pairings = [Pairing(a, b, condition, makeTest())
+                         for condition in self.conditions
+                         for a in range(len(contenders)) for b in range(a + 1, len(contenders))]
+        self.results = {} # (contender index, condition) -> GameSummaries in seed order
+        for condition in self.conditions:
+            for c in range(len(contenders)):
+                self.results[(c, condition)] = []
+        if processes == None: processes = multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(processes) if processes > 1 else None
+
+    def run(self, verbose = True):
+        "Plays rounds until every pairing is decided or has had maxGames pairs"
+        active = list(self.pairings)
+        while active:
+            self.playRound(active)
+            for pairing in active:
+                self.feed(pairing)
+                if verbose and pairing.result != None:
+                    self.printPairing(pairing)
+            active = [pairing for pairing in active if pairing.result == None]
+            sys.stdout.flush()
+        if self.pool != None:
+            self.pool.close()
+            self.pool.join()
+
+    def playRound(self, active):
+        "Plays the next batch games of each contender in an active pairing"
+        targets = {}
+        for pairing in active:
+            target = min(self.maxGames, pairing.games + self.batch)
+            for c in (pairing.a, pairing.b):
+                key = (c, pairing.condition)
+                targets[key] = max(targets.get(key, 0), target)
+        keys, tasks = [], []
+        for (c, condition), target in sorted(targets.items()):
+            layoutName, ghostName = condition
+            for gameIndex in range(len(self.results[(c, condition)]), target):
+                keys.append((c, condition))
+                tasks.append((self.contenders[c], layoutName, ghostName, self.seed, gameIndex, self.maxMoves, self.timeout))
+        if self.pool != None:
+            summaries = self.pool.map(playGame, tasks, chunksize = 1)
+        else:
+            summaries = map(playGame, tasks)
+        for key, summary in zip(keys, summaries):
+            self.results[key].append(summary)
+
+    def feed(self, pairing):
+        "Gives the test the pairs played since it was last fed, stopping at a decision"
+        gamesA = self.results[(pairing.a, pairing.condition)]
+        gamesB = self.results[(pairing.b, pairing.condition)]
+        while pairing.games < min(len(gamesA), len(gamesB)):
+            pairing.test.add(gamesA[pairing.games], gamesB[pairing.games])
+            pairing.games += 1
+            pairing.result = pairing.test.decision()
+            if pairing.result != None: return
+        if pairing.games >= self.maxGames:
+            pairing.result = DRAW
+
+    def gamesPlayed(self):
+        return sum([len(games) for games in self.results.values()])
+
+    def fixedBudget(self):
+        "The games maxGames per contender and condition would take"
+        return self.maxGames * len(self.contenders) * len(self.conditions)
+
+    def printPairing(self, pairing):
+        layoutName, ghostName = pairing.condition
+        if pairing.result == DRAW:
+            outcome = 'draw'
+        else:
+            outcome = '%s wins' % self.contenders[pairing.winner()]
+        print '%-16s %-16s %s vs %s: %s after %d games (%s)' % \
+            (layoutName, ghostName, self.contenders[pairing.a], self.contenders[pairing.b],
+             outcome, pairing.games, pairing.test)
+
+    def ranking(self):
+        """
+        A list of (points, average score, win rate, games, contender index),
+        best first: a pairing won is worth one point and a draw half.
+        """
+        points = [0.0] * len(self.contenders)
+        for pairing in self.pairings:
+            winner = pairing.winner()
+            if winner == None:
+                points[pairing.a] += 0.5
+                points[pairing.b] += 0.5
+            else:
+                points[winner] += 1
+        ranking = []
+        for c in range(len(self.contenders)):
+            scores, outcomes = gameStatistics.ScoreStatistics(), gameStatistics.OutcomeCounter()
+            for condition in self.conditions:
+                for summary in self.results[(c, condition)]:
+                    scores.add(summary)
+                    outcomes.add(summary)
+            ranking.append((points[c], scores.mean(), outcomes.winRate(), outcomes.games, c))
+        ranking.sort(reverse = True)
+        return ranking
+
+    def printReport(self):
+        print
+        print '%4s  %-32s %7s %11s %8s %7s' % ('Rank', 'Contender', 'Points', 'Avg score', 'Win rate', 'Games')
+        for rank, (points, averageScore, winRate, games, c) in enumerate(self.ranking()):
+            print '%4d  %-32s %7.1f %11.1f %8.2f %7d' % (rank + 1, self.contenders[c], points, averageScore, winRate, games)
+        played, budget = self.gamesPlayed(), self.fixedBudget()
+        print
+        print 'Played %d games instead of %d: %d saved (%.0f%%)' % \
+            (played, budget, budget - played, 100.0 * (budget - played) / max(1, budget))
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Compare agent configurations with sequential tests')
+    parser.add_option('--contender', '-c', dest = 'contenders', action = 'append', default = [],
+                      help = 'An agent and its arguments, e.g. AlphaBetaAgent:depth=3; give at least two')
+    parser.add_option('--layouts', default = 'smallClassic',
+                      help = 'Comma separated layouts (default %default)')
+    parser.add_option('--ghosts', default = 'RandomGhost,DirectionalGhost',
+                      help = 'Comma separated ghost types from ghostAgents.py (default %default)')
+    parser.add_option('--test', default = 'score',
+                      help = 'Sequential test: score or sprt (default %default)')
+    parser.add_option('--confidence', type = 'float', default = 2.576,
+                      help = 'z of the score difference interval (default %default, i.e. 99%)')
+    parser.add_option('--margin', type = 'float', default = 0.0,
+                      help = 'Score difference within which a pairing is a draw (default %default)')
+    parser.add_option('--minGames', type = 'int', default = 10,
+                      help = 'Pairs before the score test may decide (default %default)')
+    parser.add_option('--delta', type = 'float', default = 0.1,
+                      help = 'Win probability over 0.5 the SPRT tells apart (default %default)')
+    parser.add_option('--alpha', type = 'float', default = 0.05,
+                      help = 'SPRT chance of wrongly deciding for the first contender (default %default)')
+    parser.add_option('--beta', type = 'float', default = 0.05,
+                      help = 'SPRT chance of wrongly deciding for the second contender (default %default)')
+    parser.add_option('--maxGames', type = 'int', default = 200,
+                      help = 'Pairs after which an undecided pairing is a draw (default %default)')
+    parser.add_option('--batch', type = 'int', default = 10,
+                      help = 'Pairs played per pairing between looks at the tests (default %default)')
+    parser.add_option('--maxMoves', type = 'int', default = 2000,
+                      help = 'Agent moves after which a game is stopped (default %default)')
+    parser.add_option('--timeout', type = 'float', default = 30,
+                      help = 'Seconds an agent may spend in a game (default %default)')
+    parser.add_option('--seed', default = '0',
+                      help = 'Seed the game seeds are made from (default %default)')
+    parser.add_option('--processes', type = 'int', default = None,
+                      help = 'Processes playing games [Default: one per core]')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    if len(options.contenders) < 2:
+        parser.error('Give at least two contenders with -c')
+    if options.test not in TESTS:
+        parser.error('Unknown test %s: use one of %s' % (options.test, ', '.join(sorted(TESTS))))
+    return options
+
+def testFactory(options):
+    if options.test == 'sprt':
+        return lambda: WinRateSPRT(options.delta, options.alpha, options.beta)
+    return lambda: ScoreDifferenceTest(options.confidence, options.margin, options.minGames)
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    tournament = Tournament(options.contenders, options.layouts.split(','), options.ghosts.split(','),
+                            testFactory(options), options.maxGames, options.batch, options.seed,
+                            options.maxMoves, options.timeout, options.processes)
+    tournament.run()
+    tournament.printReport()
@@ -0,0 +1,96 @@
+# treeBenchmark.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Times and node-counts the search agents on large synthetic game trees (see
+SyntheticTreeProblem in multiagentTestClasses.py).
+
+For every algorithm and ordering the benchmark reports the action chosen
+(and, for minimax and alpha-beta, whether it is the minimax action), the
+nodes generated, the leaves evaluated, the time taken and the nodes
+generated per second.
+
+    python treeBenchmark.py --branching 4 --depth 4 --agents 2 \\
+        --orderings best,random,worst --distribution normal --seed 3
+"""
+
+import optparse
+import sys
+import time
+
+import multiAgents
+from multiagentTestClasses import SyntheticTreeProblem
+
+# Algorithms whose answer must be the minimax action
+EXACT_ALGORITHMS = ['MinimaxAgent', 'AlphaBetaAgent']
+
+def searchTree(problem, alg):
+    """
+    Runs alg on the tree and returns (action, nodes generated, leaves
+    evaluated, seconds).
+    """
+    agent = getattr(multiAgents, alg)(depth = str(problem.depth))
+    problem.reset()
+    start = time.time()
+    action = agent.getAction(problem.startState)
+    seconds = time.time() - start
+    return action, problem.generatedCount, problem.evaluatedCount, seconds
+
+def runBenchmark(algs, orderings, branching, depth, numAgents, distribution, spread, seed):
+    print 'Trees: branching %d, depth %d, %d agents, %d leaves, %s values' % \
+        (branching, depth, numAgents, branching ** (depth * numAgents), distribution)
+    print '%-8s %-16s %-6s %-7s %12s %12s %9s %12s' % \
+        ('Ordering', 'Algorithm', 'Action', 'Correct', 'Nodes', 'Leaves', 'Time', 'Nodes/s')
+    results = []
+    for ordering in orderings:
+        problem = SyntheticTreeProblem(branching, depth, numAgents, ordering, distribution, spread, seed)
+        for alg in algs:
+            action, nodes, leaves, seconds = searchTree(problem, alg)
+            if alg in EXACT_ALGORITHMS:
+                correct = 'yes' if action == problem.getBestAction() else 'NO'
+            else:
+                correct = '-'
+            print '%-8s %-16s %-6s %-7s %12d %12d %8.2fs %12.0f' % \
+                (ordering, alg, action, correct, nodes, leaves, seconds, nodes / max(seconds, 1e-9))
+            sys.stdout.flush()
+            results.append((ordering, alg, action, nodes, leaves, seconds))
+    return results
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Benchmark the search agents on synthetic game trees')
+    parser.add_option('--algs', default = 'MinimaxAgent,AlphaBetaAgent,ExpectimaxAgent',
+                      help = 'Comma separated agents from multiAgents.py (default %default)')
+    parser.add_option('--orderings', default = 'best,random,worst',
+                      help = 'Comma separated child orderings: best, random, worst (default %default)')
+    parser.add_option('--branching', '-b', type = 'int', default = 3,
+                      help = 'Children per node (default %default)')
+    parser.add_option('--depth', '-d', type = 'int', default = 4,
+                      help = 'Search depth, counted as the agents count it (default %default)')
+    parser.add_option('--agents', dest = 'numAgents', type = 'int', default = 2,
+                      help = 'Agents moving in turn, the first maximizing (default %default)')
+    parser.add_option('--distribution', default = 'uniform',
+                      help = 'Distribution of value differences: uniform, exponential, normal (default %default)')
+    parser.add_option('--spread', type = 'float', default = 100.0,
+                      help = 'Scale of the value differences (default %default)')
+    parser.add_option('--seed', type = 'int', default = 0,
+                      help = 'Seed of the trees (default %default)')
+    options, otherjunk = parser.parse_args(argv)
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+    return options
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    runBenchmark(options.algs.split(','), options.orderings.split(','), options.branching, options.depth,
+                 options.numAgents, options.distribution, options.spread, options.seed)
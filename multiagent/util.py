@@ -14,8 +14,15 @@
 
 import sys
 import inspect
-import heapq, random
+import bisect, heapq, math, random
 import cStringIO
+import collections
+
+try:
+    import numpy
+    _NUMPY_ENABLED = True
+except ImportError:
+    _NUMPY_ENABLED = False
 
 
 class FixedRandom:
@@ -201,6 +208,100 @@ class PriorityQueueWithFunction(PriorityQueue):
         "Adds an item to the queue with priority from the priority function"
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
+class IndexedPriorityQueue:
+    """
+      A binary min-heap holding each item at most once.  It remembers where
+      every item sits in the heap, so the priority of a queued item can be
+      changed in place (decrease-key) instead of pushing a duplicate entry
+      as one would with PriorityQueue.  Items must be hashable.  Ties are
+      broken by insertion order, like PriorityQueue.
+    """
+    def __init__(self):
+        self.heap = []      # entries [priority, count, item]; counts are unique, so
+                            # comparing entries never reaches the items
+        self.position = {}  # item -> index of its entry in self.heap
+        self.count = 0
+
+    def push(self, item, priority):
+        "Queues item, or changes its priority if it is already queued"
+        if item in self.position:
+            self.update(item, priority)
+            return
+        entry = [priority, self.count, item]
+        self.count += 1
+        self.heap.append(entry)
+        self.position[item] = len(self.heap) - 1
+        self._siftUp(len(self.heap) - 1)
+
+    def update(self, item, priority):
+        "Changes the priority of a queued item"
+        index = self.position[item]
+        oldPriority = self.heap[index][0]
+        self.heap[index][0] = priority
+        if priority < oldPriority:
+            self._siftUp(index)
+        else:
+            self._siftDown(index)
+
+    def decreaseKey(self, item, priority):
+        "Lowers the priority of a queued item; higher priorities are ignored"
+        if priority < self.heap[self.position[item]][0]:
+            self.update(item, priority)
+
+    def pop(self):
+        "Removes and returns the item with the lowest priority"
+        last = self.heap.pop()
+        if not self.heap:
+            del self.position[last[2]]
+            return last[2]
+        top = self.heap[0]
+        self.heap[0] = last
+        self.position[last[2]] = 0
+        del self.position[top[2]]
+        self._siftDown(0)
+        return top[2]
+
+    def getPriority(self, item):
+        return self.heap[self.position[item]][0]
+
+    def isEmpty(self):
+        return len(self.heap) == 0
+
+    def __contains__(self, item):
+        return item in self.position
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.position[heap[i][2]] = i
+        self.position[heap[j][2]] = j
+
+    def _siftUp(self, index):
+        heap = self.heap
+        while index > 0:
+            parent = (index - 1) >> 1
+            if heap[index] < heap[parent]:
+                self._swap(index, parent)
+                index = parent
+            else:
+                break
+
+    def _siftDown(self, index):
+        heap = self.heap
+        size = len(heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and heap[child] < heap[smallest]:
+                    smallest = child
+            if smallest == index:
+                break
+            self._swap(index, smallest)
+            index = smallest
+
 
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"
@@ -425,6 +526,320 @@ class Counter(dict):
             addend[key] = -1 * y[key]
         return addend
 
+class Vocabulary:
+    """
+    A shared numbering of keys, for ArrayCounters: each key gets the next
+    free index the first time it is seen, and keeps it.
+
+    >>> v = Vocabulary(['a', 'b'])
+    >>> v.index('b'), v.index('c'), len(v)
+    (1, 2, 3)
+    """
+    def __init__(self, keys = ()):
+        self.keys = []
+        self.indices = {}
+        for key in keys:
+            self.index(key)
+
+    def index(self, key):
+        "The index of key, adding it to the vocabulary if new"
+        index = self.indices.get(key)
+        if index == None:
+            index = self.indices[key] = len(self.keys)
+            self.keys.append(key)
+        return index
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.indices
+
+class ArrayCounter:
+    """
+    A Counter whose values are stored in a NumPy array, indexed through a
+    Vocabulary that many counters can share.  It has the methods of Counter,
+    with the arithmetic done on whole arrays: adding, subtracting or taking
+    the dot product of two counters sharing a vocabulary costs a few array
+    operations whatever their size.  Keys not in the counter read as 0, and
+    reading a key adds it, as with Counter.
+
+    Counters with different vocabularies, and plain Counters, can be
+    combined too, at the cost of converting one of them.  fromCounter and
+    toCounter convert between the two kinds.
+
+    >>> v = Vocabulary()
+    >>> a = ArrayCounter.fromCounter({'first': -2, 'second': 4}, v)
+    >>> b = ArrayCounter.fromCounter({'first': 3, 'third': 1}, v)
+    >>> (a + b)['first'], a * b, sorted((a - b).toCounter().items())
+    (1.0, -6.0, [('first', -5.0), ('second', 4.0), ('third', -1.0)])
+    """
+    def __init__(self, vocabulary = None):
+        if not _NUMPY_ENABLED:
+            raise Exception('ArrayCounter requires NumPy, which is not installed')
+        if vocabulary == None:
+            vocabulary = Vocabulary()
+        self.vocabulary = vocabulary
+        self.array = numpy.zeros(len(vocabulary))
+        self.present = numpy.zeros(len(vocabulary), dtype = bool)
+
+    def fromCounter(counter, vocabulary = None):
+        "An ArrayCounter with the entries of a Counter or dictionary"
+        result = ArrayCounter(vocabulary)
+        indices = [result.vocabulary.index(key) for key in counter]
+        result._grow()
+        result.array[indices] = [counter[key] for key in counter]
+        result.present[indices] = True
+        return result
+    fromCounter = staticmethod(fromCounter)
+
+    def toCounter(self):
+        "A Counter with the entries of this counter"
+        counter = Counter()
+        for key, value in self.items():
+            counter[key] = value
+        return counter
+
+    def _grow(self):
+        # Make room for keys added to the vocabulary since the arrays were made
+        missing = len(self.vocabulary) - len(self.array)
+        if missing > 0:
+            self.array = numpy.concatenate([self.array, numpy.zeros(missing)])
+            self.present = numpy.concatenate([self.present, numpy.zeros(missing, dtype = bool)])
+
+    def _aligned(self, other):
+        "other's values and keys as arrays indexed like self.array"
+        if not isinstance(other, ArrayCounter) or other.vocabulary is not self.vocabulary:
+            other = ArrayCounter.fromCounter(dict(other.items()), self.vocabulary)
+        self._grow()
+        other._grow()
+        return other.array, other.present
+
+    def _new(self, array, present):
+        result = ArrayCounter(self.vocabulary)
+        result.array = array
+        result.present = present
+        return result
+
+    def __getitem__(self, key):
+        index = self.vocabulary.index(key)
+        self._grow()
+        self.present[index] = True
+        return self.array[index]
+
+    def __setitem__(self, key, value):
+        index = self.vocabulary.index(key)
+        self._grow()
+        self.present[index] = True
+        self.array[index] = value
+
+    def __delitem__(self, key):
+        if key not in self: raise KeyError(key)
+        index = self.vocabulary.indices[key]
+        self.present[index] = False
+        self.array[index] = 0
+
+    def __contains__(self, key):
+        index = self.vocabulary.indices.get(key)
+        return index != None and index < len(self.present) and bool(self.present[index])
+
+    def __len__(self):
+        return int(self.present.sum())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        keys = self.vocabulary.keys
+        return [keys[i] for i in numpy.flatnonzero(self.present)]
+
+    def values(self):
+        return list(self.array[self.present])
+
+    def items(self):
+        keys = self.vocabulary.keys
+        return [(keys[i], self.array[i]) for i in numpy.flatnonzero(self.present)]
+
+    def incrementAll(self, keys, count):
+        "Increments all elements of keys by the same count"
+        indices = [self.vocabulary.index(key) for key in keys]
+        self._grow()
+        numpy.add.at(self.array, indices, count)
+        self.present[indices] = True
+
+    def argMax(self):
+        "Returns the key with the highest value"
+        if not self.present.any(): return None
+        return self.vocabulary.keys[numpy.argmax(numpy.where(self.present, self.array, -numpy.inf))]
+
+    def sortedKeys(self):
+        "Returns a list of keys sorted by their values, highest first"
+        indices = numpy.flatnonzero(self.present)
+        order = indices[numpy.argsort(-self.array[indices], kind = 'mergesort')]
+        return [self.vocabulary.keys[i] for i in order]
+
+    def totalCount(self):
+        "Returns the sum of counts for all keys"
+        return self.array.sum()
+
+    def normalize(self):
+        "Edits the counter such that the total count of all keys sums to 1"
+        total = self.totalCount()
+        if total == 0: return
+        self.array = self.array / total
+
+    def divideAll(self, divisor):
+        "Divides all counts by divisor"
+        self.array = self.array / float(divisor)
+
+    def copy(self):
+        return self._new(self.array.copy(), self.present.copy())
+
+    def __mul__(self, y):
+        "The dot product of the two counters' vectors"
+        array, present = self._aligned(y)
+        return self.array.dot(array)
+
+    def __radd__(self, y):
+        "Increments this counter by the values of y"
+        array, present = self._aligned(y)
+        self.array = self.array + array
+        self.present = self.present | present
+
+    def __add__(self, y):
+        array, present = self._aligned(y)
+        return self._new(self.array + array, self.present | present)
+
+    def __sub__(self, y):
+        array, present = self._aligned(y)
+        return self._new(self.array - array, self.present | present)
+
+class LRUCache:
+    """
+    A dictionary holding at most maxSize entries.  When it is full, storing
+    a new key evicts the least recently used one.  Lookups are counted so the
+    caller can report how well the cache works.
+
+    >>> c = LRUCache(2)
+    >>> c.put('a', 1)
+    >>> c.put('b', 2)
+    >>> c.get('a')
+    1
+    >>> c.put('c', 3)
+    >>> 'b' in c
+    False
+    >>> c.hits, c.misses
+    (1, 0)
+    """
+    def __init__(self, maxSize):
+        if maxSize < 1: raise ValueError, "LRUCache needs room for at least one entry"
+        self.maxSize = maxSize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        "Returns the value stored for key (marking it recently used), or default"
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        value = self.entries.pop(key)
+        self.entries[key] = value
+        return value
+
+    def put(self, key, value):
+        "Stores value under key, evicting the least recently used entry if full"
+        if key in self.entries:
+            del self.entries[key]
+        elif len(self.entries) >= self.maxSize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = value
+
+    def clear(self):
+        self.entries.clear()
+
+    def hitRate(self):
+        "Fraction of lookups answered from the cache (0.0 before any lookup)"
+        lookups = self.hits + self.misses
+        if lookups == 0: return 0.0
+        return float(self.hits) / lookups
+
+    def __str__(self):
+        return "%d hits, %d misses (%.1f%% hit rate), %d evictions, %d/%d entries" % \
+            (self.hits, self.misses, 100 * self.hitRate(), self.evictions, len(self.entries), self.maxSize)
+
+class MemoizedFunction:
+    """
+    Wraps a pure function of one argument in an LRUCache.  keyFunction maps
+    the argument to the cache key; by default the argument itself is the key.
+    The wrapper is called exactly like the function it wraps, and its cache
+    attribute exposes the hit and miss counters.
+
+    If the function has a batch version (a batch attribute taking a list of
+    arguments and returning their values), so does the wrapper; it passes
+    only the arguments missing from the cache on to the function's batch.
+
+    >>> square = lambda x: x * x
+    >>> square.batch = lambda xs: [x * x for x in xs]
+    >>> memoized = MemoizedFunction(square, 10)
+    >>> memoized(3)
+    9
+    >>> memoized.batch([2, 3, 2])
+    [4, 9, 4]
+    >>> memoized.cache.hits, memoized.cache.misses
+    (1, 2)
+    """
+    def __init__(self, function, maxSize, keyFunction=None):
+        self.function = function
+        self.keyFunction = keyFunction
+        self.cache = LRUCache(maxSize)
+        self.__name__ = getattr(function, '__name__', 'memoized')
+        if hasattr(function, 'batch'):
+            self.batch = self._batch
+
+    def _key(self, argument):
+        if self.keyFunction == None:
+            return argument
+        return self.keyFunction(argument)
+
+    def _batch(self, arguments):
+        values = []
+        missing = collections.OrderedDict() # Key -> (argument, indices of values)
+        for i, argument in enumerate(arguments):
+            key = self._key(argument)
+            value = _MISSING
+            if key not in missing:
+                value = self.cache.get(key, _MISSING)
+            if value is _MISSING:
+                missing.setdefault(key, (argument, []))[1].append(i)
+            values.append(value)
+        if missing:
+            computed = self.function.batch([argument for argument, indices in missing.values()])
+            for (key, (argument, indices)), value in zip(missing.items(), computed):
+                self.cache.put(key, value)
+                for i in indices:
+                    values[i] = value
+        return values
+
+    def __call__(self, argument):
+        key = self._key(argument)
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.function(argument)
+            self.cache.put(key, value)
+        return value
+
+_MISSING = object()
+
 def raiseNotDefined():
     fileName = inspect.stack()[1][1]
     line = inspect.stack()[1][2]
@@ -452,30 +867,102 @@ def normalize(vectorOrCounter):
         if s == 0: return vector
         return [el / s for el in vector]
 
+class AliasSampler:
+    """
+    Draws from a fixed discrete distribution in constant time per draw, by
+    Walker's alias method: the distribution is split into n equally likely
+    columns, each holding at most two values, so a draw picks a column and
+    then one of its two values.  Building the sampler takes O(n).
+
+    The distribution is given as for sample: a Counter, or a list of weights
+    and a list of values.  Draws use the random module, so they follow
+    random.seed, unless a seed is given, in which case the sampler has its
+    own random stream.  sampleArray draws many values at once with NumPy.
+
+    >>> s = AliasSampler([1, 3], ['a', 'b'], seed = 0)
+    >>> sorted(set(s.sampleMany(100)))
+    ['a', 'b']
+    """
+    def __init__(self, distribution, values = None, seed = None):
+        if isinstance(distribution, dict):
+            items = sorted(distribution.items())
+            distribution = [prob for value, prob in items]
+            values = [value for value, prob in items]
+        if values == None:
+            values = range(len(distribution))
+        if len(distribution) == 0 or len(distribution) != len(values):
+            raise ValueError, "AliasSampler needs as many weights as values, and at least one"
+        total = float(sum(distribution))
+        if total <= 0 or min(distribution) < 0:
+            raise ValueError, "AliasSampler needs non-negative weights with a positive sum"
+        n = len(distribution)
+        self.values = list(values)
+        # Probability of keeping each column's own value, and the value it
+        # is topped up with otherwise
+        self.keep = [1.0] * n
+        self.alias = range(n)
+        scaled = [n * weight / total for weight in distribution]
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.keep[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0: small.append(more)
+            else: large.append(more)
+        # Whatever is left is 1 up to rounding errors
+        self.random = random if seed == None else random.Random(seed)
+        self.seed = seed
+        self._numpyRandom = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def sampleIndex(self, rng = None):
+        "The index of a drawn value, from one random number of rng (the sampler's own stream by default)"
+        if rng == None: rng = self.random
+        u = rng.random() * len(self.keep)
+        column = int(u)
+        if u - column < self.keep[column]:
+            return column
+        return self.alias[column]
+
+    def sample(self, rng = None):
+        return self.values[self.sampleIndex(rng)]
+
+    def sampleMany(self, n):
+        "A list of n independent draws"
+        return [self.values[self.sampleIndex()] for i in xrange(n)]
+
+    def sampleArray(self, n):
+        """
+        A NumPy array of the indices of n independent draws.  The NumPy
+        random stream is seeded from the sampler's own, so it is reproducible
+        under the same seed.
+        """
+        if not _NUMPY_ENABLED:
+            raise Exception('AliasSampler.sampleArray requires NumPy, which is not installed')
+        if self._numpyRandom == None:
+            self._numpyRandom = numpy.random.RandomState(self.random.randint(0, 2 ** 31 - 1))
+            self._keepArray = numpy.array(self.keep)
+            self._aliasArray = numpy.array(self.alias)
+        u = self._numpyRandom.random_sample(n) * len(self.keep)
+        columns = u.astype(int)
+        return numpy.where(u - columns < self._keepArray[columns], columns, self._aliasArray[columns])
+
 def nSample(distribution, values, n):
-    if sum(distribution) != 1:
-        distribution = normalize(distribution)
-    rand = [random.random() for i in range(n)]
-    rand.sort()
-    samples = []
-    samplePos, distPos, cdf = 0,0, distribution[0]
-    while samplePos < n:
-        if rand[samplePos] < cdf:
-            samplePos += 1
-            samples.append(values[distPos])
-        else:
-            distPos += 1
-            cdf += distribution[distPos]
-    return samples
+    "A list of n independent draws from the distribution (see AliasSampler)"
+    return AliasSampler(distribution, values).sampleMany(n)
 
-def sample(distribution, values = None):
+def sample(distribution, values = None, rng = random):
     if type(distribution) == Counter:
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
         values = [i[0] for i in items]
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    choice = random.random()
+    choice = rng.random()
     i, total= 0, distribution[0]
     while choice > total:
         i += 1
@@ -501,11 +988,75 @@ def flipCoin( p ):
     r = random.random()
     return r < p
 
-def chooseFromDistribution( distribution ):
-    "Takes either a counter or a list of (prob, key) pairs and samples"
+class DiscreteDistribution:
+    """
+    An immutable distribution over a few values, sampled by bisecting its
+    precomputed cumulative weights.  Built from a Counter or a list of
+    (prob, value) pairs, it draws the value chooseFromDistribution would
+    draw from them with the same random number, so it can stand in for them
+    without changing any game.
+
+    >>> d = DiscreteDistribution([(0.25, 'a'), (0.75, 'b')])
+    >>> d.values, d.cumulative
+    (('a', 'b'), (0.25, 1.0))
+    """
+    def __init__(self, distribution):
+        if isinstance(distribution, dict):
+            # As sample: sorted by key and normalized
+            items = sorted(distribution.items())
+            values = [value for value, prob in items]
+            probs = [prob for value, prob in items]
+            if sum(probs) != 1:
+                probs = normalize(probs)
+        else:
+            values = [value for prob, value in distribution]
+            probs = [prob for prob, value in distribution]
+        cumulative = []
+        total = 0.0
+        for prob in probs:
+            total += prob
+            cumulative.append(total)
+        self.values = tuple(values)
+        self.probabilities = tuple(probs)
+        self.cumulative = tuple(cumulative)
+        self.sampler = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def items(self):
+        "(value, prob) pairs, as Counter.items"
+        return zip(self.values, self.probabilities)
+
+    def sample(self, rng = random):
+        "Draws a value using one rng.random()"
+        i = bisect.bisect_left(self.cumulative, rng.random())
+        return self.values[min(i, len(self.values) - 1)]
+
+    def aliasSample(self, rng = random):
+        """
+        Draws a value using one rng.random(), in constant time from an
+        AliasSampler built on the first draw.  The draws have the same
+        distribution as sample's, but not the same value for each random
+        number.
+        """
+        if self.sampler == None:
+            self.sampler = AliasSampler(self.probabilities, self.values)
+        # AliasSampler.sampleIndex, inlined
+        sampler = self.sampler
+        u = rng.random() * len(sampler.keep)
+        column = int(u)
+        if u - column < sampler.keep[column]:
+            return sampler.values[column]
+        return sampler.values[sampler.alias[column]]
+
+def chooseFromDistribution( distribution, rng = random ):
+    "Takes either a counter or a list of (prob, key) pairs and samples, with one rng.random()"
+    if isinstance(distribution, DiscreteDistribution):
+        return distribution.sample(rng)
     if type(distribution) == dict or type(distribution) == Counter:
-        return sample(distribution)
-    r = random.random()
+        return sample(distribution, rng = rng)
+    r = rng.random()
     base = 0.0
     for prob, element in distribution:
         base += prob
@@ -587,11 +1138,19 @@ def pause():
 # this have all student code so wrapped.
 #
 import signal
+import threading
 import time
 class TimeoutFunctionException(Exception):
     """Exception to raise on a timeout"""
     pass
 
+class DeadlineExceeded(TimeoutFunctionException):
+    """
+    Raised when a Deadline passes, by Deadline.check or callWithDeadline, as
+    opposed to the timeout of an enclosing TimeoutFunction
+    """
+    pass
+
 
 class TimeoutFunction:
     def __init__(self, function, timeout):
@@ -605,22 +1164,216 @@ class TimeoutFunction:
         # If we have SIGALRM signal, use it to cause an exception if and
         # when this function runs too long.  Otherwise check the time taken
         # after the method has returned, and throw an exception then.
-        if hasattr(signal, 'SIGALRM'):
+        # Signals are only delivered to the main thread.
+        if hasattr(signal, 'SIGALRM') and isinstance(threading.current_thread(), threading._MainThread):
             old = signal.signal(signal.SIGALRM, self.handle_timeout)
-            signal.alarm(self.timeout)
+            startTime = monotonicTime()
+            outer = signal.alarm(self.timeout)
             try:
                 result = self.function(*args, **keyArgs)
             finally:
+                signal.alarm(0)
                 signal.signal(signal.SIGALRM, old)
-            signal.alarm(0)
+                if outer:
+                    # Put back the alarm of an enclosing TimeoutFunction
+                    signal.alarm(max(1, int(round(outer - (monotonicTime() - startTime)))))
         else:
-            startTime = time.time()
+            startTime = monotonicTime()
             result = self.function(*args, **keyArgs)
-            timeElapsed = time.time() - startTime
+            timeElapsed = monotonicTime() - startTime
             if timeElapsed >= self.timeout:
                 self.handle_timeout(None, None)
         return result
 
+# clock_gettime's id of the monotonic clock, by sys.platform prefix
+CLOCK_MONOTONIC_IDS = {'linux': 1, 'darwin': 6, 'freebsd': 4}
+
+def _monotonicClock():
+    """
+    A clock that never goes back, as time.time does when the system clock is
+    set back.  time.monotonic is new in Python 3.3; before it the C library's
+    clock_gettime(CLOCK_MONOTONIC) is called through ctypes, and time.time is
+    used only where that fails.
+    """
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+    try:
+        import ctypes, ctypes.util
+        clockId = [i for prefix, i in CLOCK_MONOTONIC_IDS.items() if sys.platform.startswith(prefix)][0]
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+        # Older C libraries keep clock_gettime in librt
+        libraries = [ctypes.CDLL(None)]
+        if ctypes.util.find_library('rt'):
+            libraries.append(ctypes.CDLL(ctypes.util.find_library('rt')))
+        clock_gettime = [l.clock_gettime for l in libraries if hasattr(l, 'clock_gettime')][0]
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        spec = timespec()
+        def monotonic():
+            if clock_gettime(clockId, ctypes.byref(spec)) != 0:
+                raise OSError('clock_gettime failed')
+            return spec.tv_sec + spec.tv_nsec * 1e-9
+        monotonic()
+        return monotonic
+    except Exception:
+        return time.time
+
+monotonicTime = _monotonicClock()
+
+def callWithDeadline(deadline, function, *args):
+    """
+    Calls function, interrupting it with DeadlineExceeded when the deadline
+    passes.  Interrupting needs SIGALRM, so it only happens in the main
+    thread of systems that have it; elsewhere the function runs to its end
+    and the caller checks the deadline after it.
+
+    If the timer of an enclosing TimeoutFunction or callWithDeadline comes
+    due first, its own handler runs, so its timeout is not mistaken for this
+    deadline's.  Otherwise that timer is put back afterwards, and fires at
+    once if it came due meanwhile.
+    """
+    if not hasattr(signal, 'setitimer') or not isinstance(threading.current_thread(), threading._MainThread):
+        return function(*args)
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    startTime = monotonicTime()
+    outerFired = []
+    def handleTimeout(signum, frame):
+        if not outer or deadline.expired() or not callable(old):
+            raise DeadlineExceeded()
+        # The enclosing timer: keep watching the deadline, and hand over
+        outerFired.append(True)
+        signal.setitimer(signal.ITIMER_REAL, max(1e-3, deadline.remaining()))
+        old(signum, frame)
+    old = signal.signal(signal.SIGALRM, handleTimeout)
+    outer = signal.setitimer(signal.ITIMER_REAL, remaining)[0]
+    if outer and outer < remaining:
+        signal.setitimer(signal.ITIMER_REAL, outer)
+    try:
+        return function(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old)
+        if outer and not outerFired:
+            signal.setitimer(signal.ITIMER_REAL, max(1e-3, outer - (monotonicTime() - startTime)))
+
+class Deadline:
+    """
+    A time by which some work must be done, checked by the work itself or
+    enforced by callWithDeadline.  Unlike TimeoutFunction it needs no signal
+    to be checked, so it works in any thread and to a fraction of a second,
+    and deadlines nest: within() gives a deadline that is never later than
+    the one it is taken from.  A Deadline does not change once made, so
+    threads can share it freely.
+
+    >>> d = Deadline(60)
+    >>> d.expired(), 59 < d.remaining() <= 60, d.within(1).remaining() <= 1
+    (False, True, True)
+    """
+    def __init__(self, seconds, start = None):
+        if start == None: start = monotonicTime()
+        self.seconds = seconds
+        self.start = start
+        self.end = start + seconds
+
+    def elapsed(self):
+        "Seconds since the deadline was set"
+        return monotonicTime() - self.start
+
+    def remaining(self):
+        "Seconds left, negative once expired"
+        return self.end - monotonicTime()
+
+    def expired(self):
+        return monotonicTime() >= self.end
+
+    def check(self):
+        "Raises DeadlineExceeded if the deadline has passed"
+        if self.expired():
+            raise DeadlineExceeded()
+
+    def within(self, seconds):
+        "A deadline seconds from now, or this one if it comes first"
+        now = monotonicTime()
+        return Deadline(min(seconds, self.end - now), now)
+
+    def __str__(self):
+        return '%.3fs of %.3fs left' % (self.remaining(), self.seconds)
+
+class LatencyHistogram:
+    """
+    Counts durations in logarithmic buckets, BUCKETS_PER_DOUBLING of them
+    for every doubling of the duration, so it takes little memory however
+    many durations it counts, and a percentile is read to within about 4%.
+    The count, total and maximum are exact.
+
+    >>> h = LatencyHistogram()
+    >>> for ms in range(1, 101): h.add(ms / 1000.0)
+    >>> h.count, round(h.percentile(50), 3), h.percentile(100)
+    (100, 0.051, 0.1)
+    """
+    BUCKETS_PER_DOUBLING = 16
+    MIN_SECONDS = 1e-6 # Durations up to this all go in the first bucket
+
+    def __init__(self):
+        self.counts = {} # bucket -> number of durations in it
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= self.MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = int(math.ceil(math.log(seconds / self.MIN_SECONDS, 2) * self.BUCKETS_PER_DOUBLING))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        "Adds the durations counted by another histogram to this one, and returns it"
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, p):
+        "The duration below which p percent of the durations fall (0.0 if none were added)"
+        if self.count == 0: return 0.0
+        rank = max(1, int(math.ceil(p / 100.0 * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.max, self.MIN_SECONDS * 2 ** (bucket / float(self.BUCKETS_PER_DOUBLING)))
+        return self.max
+
+    def mean(self):
+        if self.count == 0: return 0.0
+        return self.total / self.count
+
+    def __str__(self):
+        return '%d durations, p50 %.4fs, p95 %.4fs, p99 %.4fs, max %.4fs' % \
+            (self.count, self.percentile(50), self.percentile(95), self.percentile(99), self.max)
+
+_moveDeadlines = threading.local()
+
+def getMoveDeadline():
+    """
+    The Deadline of the move this thread's agent is computing, set by
+    game.Game around each call to an agent when it enforces time limits, or
+    None otherwise.  Agents that search check it to stop in time (see
+    MultiAgentSearchAgent.successor in multiAgents.py).
+    """
+    return getattr(_moveDeadlines, 'deadline', None)
+
+def setMoveDeadline(deadline):
+    _moveDeadlines.deadline = deadline
+
 
 
 _ORIGINAL_STDOUT = None